@@ -6,16 +6,116 @@ load_dotenv()
 # Paths
 PDF_PATH = "app/docs/MAGIC_RULES.pdf"
 PPTX_PATH = "app/docs/PRESENTATION.pptx"
-CACHE_PATH_PDF = "app/docs/pdf_embeddings.pkl"
-CACHE_PATH_PPTX = "app/docs/pptx_embeddings.pkl"
+CACHE_PATH_PDF = "app/docs/pdf_index"  # diretório do índice em disco (ver utils/index_store.py)
+CACHE_PATH_PPTX = "app/docs/pptx_index"
 CHUNK_SIZE = 350
 
+# Diretórios monitorados (opcional): quando definidos, o corpus vem de todos os
+# PDFs/PPTX do diretório, com reindexação incremental (ver services/corpus_registry.py)
+PDF_DIR = os.getenv("PDF_DIR")
+PPTX_DIR = os.getenv("PPTX_DIR")
+REGISTRY_INDEX_DIR = "app/docs/registry"
+REGISTRY_POLL_INTERVAL = 30  # segundos entre varreduras do diretório
+REGISTRY_COMPACT_MIN_DEAD = 1000  # só compacta com pelo menos esse nº de linhas mortas
+REGISTRY_ENCODE_BATCH = 2048  # chunks codificados e gravados por vez durante a reindexação
+
+# Retrieval
+TOP_K = 3  # quantidade de chunks usados como contexto no prompt
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")  # "flat", "ivf", "sharded" ou "auto"
+IVF_MIN_VECTORS = 50_000  # no modo "auto", corpora menores usam busca exata
+IVF_NLIST = None  # None = 4 * sqrt(n_chunks)
+IVF_NPROBE = 8
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "none")  # "none", "float16", "int8" ou "binary"
+QUANT_RESCORE = 10  # re-ranqueia os k * QUANT_RESCORE melhores em float32 (0 = desliga)
+# Embeddings quantizados que não vêm de um memmap float32 (ex.: linhas vivas do registry)
+# têm a cópia float32 do rescoring gravada num arquivo temporário mapeado neste diretório,
+# para sair da RAM; precisa ser disco (não tmpfs), senão não economiza nada
+QUANT_SPILL_DIR = os.getenv("QUANT_SPILL_DIR", "app/docs")
+# INDEX_TYPE="sharded": busca exata dividida entre processos (scatter-gather)
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", str(min(4, os.cpu_count() or 1))))
+SHARD_THREADS = 1  # threads de BLAS por shard (o paralelismo vem dos processos)
+SHARD_BLOCK_ROWS = 65_536  # linhas pontuadas por vez em cada shard
+SHARD_TIMEOUT = 30.0  # segundos esperando os shards responderem
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "dense" ou "hybrid" (denso + BM25)
+HYBRID_CANDIDATES = 50  # candidatos de cada ranking antes da fusão
+RRF_K = 60  # constante do reciprocal rank fusion
+
+# Montagem do contexto do prompt (ver services/context_builder.py)
+CONTEXT_CANDIDATES = 8  # chunks recuperados antes de deduplicar/juntar
+CONTEXT_NEIGHBORS = 1  # chunks vizinhos (mesma página/slide) incluídos ao redor de cada hit
+CONTEXT_DEDUP_THRESHOLD = 0.95  # cosseno acima disso = chunk quase duplicado, descartado
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))  # tokens de contexto no prompt
+CONTEXT_TOKENIZER = "cl100k_base"  # encoding do tiktoken usado para contar tokens
+
+# Semantic answer cache (respostas reaproveitadas para perguntas parecidas)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # cosseno mínimo
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL = 3600  # segundos
+
+# Exact-match caches (texto normalizado + rota + modelo + temperatura)
+EMBEDDING_CACHE_MAX_ENTRIES = 10_000
+EMBEDDING_CACHE_TTL = 24 * 3600  # segundos
+RESPONSE_CACHE_MAX_ENTRIES = 5_000
+RESPONSE_CACHE_TTL = 24 * 3600
+RESPONSE_CACHE_SQLITE_PATH = os.getenv("RESPONSE_CACHE_SQLITE_PATH")  # ex.: app/docs/response_cache.db
+
+# Query embedding micro-batching (perguntas concorrentes num único forward do modelo)
+QUERY_BATCHING_ENABLED = os.getenv("QUERY_BATCHING_ENABLED", "true").lower() == "true"
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "2"))  # espera máxima para encher o lote
+
+# Ingestion
+EMBED_BATCH_SIZE = 64
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))  # > 1 usa um pool de processos na CPU
+EMBED_STREAM_WINDOW = 1024  # chunks em memória por vez durante a ingestão
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_EXTRACT_MIN_PAGES_FOR_POOL = 200  # PDFs menores são extraídos no próprio processo
+PDF_EXTRACT_PAGES_PER_TASK = 16
+
+# Batch endpoints (/query/batch, /text-to-mongo/batch)
+BATCH_MAX_QUERIES = 1000
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))  # chamadas ao LLM em paralelo por lote
+
+# /text-to-mongo local (regras + templates aprendidos do LLM, antes de chamar o LLM)
+MONGO_LOCAL_ENABLED = os.getenv("MONGO_LOCAL_ENABLED", "true").lower() == "true"
+MONGO_TEMPLATE_MAX_ENTRIES = 2_000
+# Campo usado quando a pergunta traz datas sem campo ("orders after 2024-01-01"); vazio desliga
+MONGO_DATE_FIELD = os.getenv("MONGO_DATE_FIELD", "date")
+
+# Controle de admissão (por worker): rota -> (em andamento, tamanho da fila, espera máxima na fila em s)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_LIMITS = {
+    "/query": (32, 128, 5.0),
+    "/ppt-search": (32, 128, 5.0),
+    "/text-to-mongo": (64, 256, 2.0),
+    "/query/batch": (2, 4, 1.0),
+    "/text-to-mongo/batch": (2, 4, 1.0),
+}
+ADMISSION_PRIORITIES = {"high": 0, "normal": 1, "low": 2}  # header X-Priority
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))  # por cliente; 0 desliga
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_CLIENTS = 10_000
+# Só atrás de um proxy confiável: senão o cliente escolhe o próprio X-Forwarded-For
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+
+# Observabilidade
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Rotas /admin (profiler) exigem o header X-Admin-Token; sem token configurado ficam desligadas
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILER_MAX_SECONDS = 60  # duração máxima de uma amostragem
+PROFILER_DEFAULT_HZ = 100  # amostras por segundo de cada thread
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "20"))  # perfis de requisição guardados (X-Profile)
+
+# Startup
+READY_RETRY_AFTER = 10  # segundos sugeridos no Retry-After enquanto os índices carregam
+
 # APIs
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-OPENAI_URL = "https://api.openai.com/v1/chat/completions"
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+OPENAI_URL = os.getenv("OPENAI_URL", "https://api.openai.com/v1/chat/completions")
+GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
 
 OPENAI_HEADERS = {
     "Authorization": f"Bearer {OPENAI_API_KEY}",
@@ -26,6 +126,47 @@ GROQ_HEADERS = {
     "Content-Type": "application/json"
 }
 
+# LLM HTTP client
+LLM_TIMEOUT = 60.0  # segundos
+LLM_CONNECT_TIMEOUT = 5.0
+LLM_MAX_CONNECTIONS = 100
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 0.5  # segundos
+LLM_BACKOFF_MAX = 8.0
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "16"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+
+# Roteamento entre provedores (hedge + failover + circuit breaker)
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "true").lower() == "true"
+HEDGE_PERCENTILE = 95  # o hedge sai quando o principal passa do p95 da própria latência
+HEDGE_MIN_SAMPLES = 20  # abaixo disso usa HEDGE_DEFAULT_DELAY
+HEDGE_DEFAULT_DELAY = 3.0  # segundos
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MAX_DELAY = 15.0
+LATENCY_WINDOW = 200  # últimas latências consideradas por provedor
+CIRCUIT_FAILURE_THRESHOLD = 5  # falhas seguidas para abrir o circuito
+CIRCUIT_OPEN_SECONDS = 30.0  # tempo aberto antes de deixar uma chamada de teste passar
+
 # Models
+EMBEDDING_MODEL = "paraphrase-multilingual-mpnet-base-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" ou "onnx" (onnxruntime na CPU)
+# Quantização int8 dinâmica do modelo ONNX: "none", "avx2", "avx512", "avx512_vnni" ou "arm64"
+EMBEDDING_ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "none")
+EMBEDDING_ONNX_DIR = "app/docs/onnx"  # modelos exportados ficam aqui (exportação só na 1ª vez)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = padrão do runtime
+# Servidor de embeddings compartilhado (python -m app.services.embedding_server): com o
+# socket definido, os workers do uvicorn não carregam modelo nem índices, só conversam com ele
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET")  # ex.: /tmp/rag-embeddings.sock
+EMBEDDING_SERVER_CONNECTIONS = 8  # conexões abertas por worker
+EMBEDDING_SERVER_TIMEOUT = 60.0  # segundos por chamada
+REMOTE_DOCUMENT_CACHE = 4096  # chunks guardados por worker (o texto vem do servidor)
+REMOTE_POLL_INTERVAL = 2  # segundos entre consultas de versão dos índices ao servidor
 OPENAI_MODEL = "gpt-4o-mini"
 GROQ_MODEL = "llama-3.3-70b-versatile"
+
+# Provedor/modelo por rota: o primeiro é o principal, o segundo recebe hedge e failover
+LLM_ROUTES = {
+    "/query": [("groq", GROQ_MODEL), ("openai", OPENAI_MODEL)],
+    "/ppt-search": [("openai", "gpt-4o-mini"), ("groq", GROQ_MODEL)],
+    "/text-to-mongo": [("openai", "gpt-3.5-turbo"), ("groq", GROQ_MODEL)],
+}
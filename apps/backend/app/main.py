@@ -1,16 +1,41 @@
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import query_routes
+from app.routes import admin_routes, corpus_routes, health_routes, metrics_routes, query_routes
+from app.services import admission, corpora, llm_client, profiler, tracing
 
-app = FastAPI()
+tracing.configure_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Modelo e índices carregam em segundo plano; /readyz indica quando terminou
+    corpora.start_background_loading()
+    yield
+    # Fecha o pool de conexões com os provedores de LLM
+    await llm_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Mais interno: o cProfile por requisição (X-Profile) mede só a aplicação
+app.add_middleware(profiler.ProfileMiddleware)
+# Antes do CORS: as respostas 429 também recebem os headers de CORS
+app.add_middleware(admission.AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Cache", "X-Request-ID", "X-Translator", "Retry-After", "X-Profile-ID"],
 )
+# Por último = mais externo: o tempo medido inclui os outros middlewares
+app.add_middleware(tracing.TraceMiddleware)
 
+app.include_router(health_routes.router)
 app.include_router(query_routes.router)
+app.include_router(corpus_routes.router)
+app.include_router(metrics_routes.router)
+app.include_router(admin_routes.router)
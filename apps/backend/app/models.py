@@ -1,4 +1,10 @@
-from pydantic import BaseModel
+from typing import List
+from pydantic import BaseModel, Field
+from app import config
 
 class QueryRequest(BaseModel):
     query: str
+    stream: bool = False  # True = resposta em Server-Sent Events (text/event-stream)
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=config.BATCH_MAX_QUERIES)
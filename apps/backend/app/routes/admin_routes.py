@@ -0,0 +1,58 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from app import config
+from app.services import profiler
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    # Sem ADMIN_TOKEN configurado as rotas nem aparecem (404)
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiler.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)], include_in_schema=False)
+
+
+@router.get("/profile")
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0, le=config.PROFILER_MAX_SECONDS),
+    hz: int = Query(config.PROFILER_DEFAULT_HZ, ge=1, le=1000),
+    format: Literal["collapsed", "svg"] = "svg",
+    idle: bool = False,
+):
+    # Amostra todas as threads (inclusive o event loop, que segue atendendo) por `seconds`
+    try:
+        counts = await run_in_threadpool(profiler.sample, seconds, 1 / hz, idle)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed(counts))
+    title = f"{sum(counts.values())} amostras em {seconds:g}s a {hz} Hz"
+    return Response(profiler.flamegraph_svg(counts, title), media_type="image/svg+xml")
+
+
+@router.get("/profiles")
+async def list_profiles():
+    return profiler.profiles.list()
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: int,
+    format: Literal["text", "pstats"] = "text",
+    sort: Literal["cumulative", "tottime", "calls"] = "cumulative",
+    limit: int = Query(50, ge=1, le=1000),
+):
+    entry = profiler.profiles.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found (ring buffer keeps the last "
+                                                    f"{config.PROFILE_RING_SIZE}).")
+    if format == "pstats":
+        # Mesmo formato de cProfile.dump_stats: abre com pstats, snakeviz, etc.
+        return Response(entry["stats"], media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'})
+    return PlainTextResponse(profiler.ProfileStore.report(entry, sort, limit))
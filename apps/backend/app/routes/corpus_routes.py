@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.services import corpora
+
+router = APIRouter()
+
+
+@router.get("/corpora")
+async def list_corpora():
+    return await run_in_threadpool(corpora.status)
+
+
+@router.post("/corpora/{name}/reindex", dependencies=[Depends(corpora.require_ready)])
+async def reindex_corpus(name: str):
+    # Reindexa agora, sem esperar a próxima varredura do watcher.
+    if not corpora.is_registry(name):
+        raise HTTPException(status_code=404, detail=f"Corpus '{name}' is not backed by a watched directory.")
+    changed = await run_in_threadpool(corpora.reindex, name)
+    return {"corpus": name, "changed": changed, **(await run_in_threadpool(corpora.status))["registries"][name]}
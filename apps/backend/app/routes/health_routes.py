@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from app import config
+from app.services import corpora
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz():
+    # Liveness: o processo está de pé e respondendo.
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    # Readiness: modelo e índices carregados, pronto para receber tráfego.
+    # Fora do event loop: o status não pode atrasar as outras rotas (nem o /healthz)
+    status = await run_in_threadpool(corpora.status)
+    if corpora.is_ready():
+        return status
+    return JSONResponse(
+        status,
+        status_code=503,
+        headers={"Retry-After": str(config.READY_RETRY_AFTER)},
+    )
@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services import corpora, metrics
+from app.services.embedding_batcher import query_batcher
+from app.services.exact_cache import embedding_cache, response_cache
+from app.services.provider_router import router as provider_router
+from app.services.semantic_cache import answer_cache
+
+router = APIRouter()
+
+CACHES = {"semantic": answer_cache, "embeddings": embedding_cache, "responses": response_cache}
+
+
+def _cache_stat(field: str):
+    return lambda: {(name,): cache.stats()[field] for name, cache in CACHES.items()}
+
+
+metrics.Callback("rag_cache_hits_total", "Hits de cada cache.", _cache_stat("hits"), ("cache",), kind="counter")
+metrics.Callback("rag_cache_misses_total", "Misses de cada cache.", _cache_stat("misses"), ("cache",), kind="counter")
+metrics.Callback("rag_cache_hit_ratio", "Taxa de acerto de cada cache.", _cache_stat("hit_rate"), ("cache",))
+metrics.Callback("rag_cache_entries", "Entradas em memória de cada cache.", _cache_stat("entries"), ("cache",))
+metrics.Callback("rag_query_batch_queued", "Perguntas aguardando o próximo lote de embeddings.",
+                 lambda: {(): query_batcher.stats()["queued"]})
+metrics.Callback("rag_query_batch_avg_size", "Tamanho médio dos lotes de embeddings de perguntas.",
+                 lambda: {(): query_batcher.stats()["avg_batch"]})
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.Callback("rag_router_circuit_state", "Circuito de cada provedor: 0 fechado, 1 meio-aberto, 2 aberto.",
+                 lambda: {(provider,): CIRCUIT_STATES[breaker.state]
+                          for provider, breaker in provider_router.breakers.items()}, ("provider",))
+metrics.Callback("rag_router_hedge_delay_seconds", "Espera atual antes do hedge, por provedor principal.",
+                 lambda: {(provider,): provider_router.hedge_delay(tracker)
+                          for provider, tracker in provider_router.latency.items()}, ("provider",))
+metrics.Callback("rag_ready", "1 quando modelo e índices estão carregados.", lambda: {(): int(corpora.is_ready())})
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/providers/stats")
+async def provider_stats():
+    return provider_router.stats()
@@ -1,21 +1,75 @@
-from fastapi import APIRouter, HTTPException
-from app.models import QueryRequest
-from app.utils.text_processing import load_or_create_embeddings
+import asyncio
+import json
+import logging
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from app import config
-from app.services import query_service
+from app.models import BatchQueryRequest, QueryRequest
+from app.services import corpora, query_service, tracing
+from app.services.semantic_cache import answer_cache
+from app.services.exact_cache import embedding_cache, response_cache, make_key
+from app.services.embedding_batcher import query_batcher
+from app.services.mongo_translator import REFUSAL, mongo_translator
 
 router = APIRouter()
+logger = logging.getLogger("app.routes")
 
-pdf_docs, pdf_embeddings = load_or_create_embeddings(config.PDF_PATH, config.CACHE_PATH_PDF, "pdf")
-ppt_docs, ppt_embeddings = load_or_create_embeddings(config.PPTX_PATH, config.CACHE_PATH_PPTX, "pptx")
 
-@router.post("/query")
-async def query(request: QueryRequest):
-    best_doc = query_service.search_best_document(request.query, pdf_docs, pdf_embeddings)
-    if not best_doc:
-        raise HTTPException(status_code=404, detail="No relevant document found.")
+def route_models(route: str) -> str:
+    # Todos os provedores/modelos que podem responder pela rota (principal, hedge e
+    # failover) entram na chave do cache: mudar o roteamento invalida as respostas antigas
+    return ",".join(f"{provider}:{model}" for provider, model in config.LLM_ROUTES[route])
+
+
+def sse_response(deltas, headers=None):
+    # Repassa os deltas do LLM como Server-Sent Events: "data: {"delta": ...}" por token,
+    # "event: done" no fim e "event: error" se o provedor falhar no meio do stream.
+    async def events():
+        try:
+            async for delta in deltas:
+                yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})},
+    )
+
+
+def ndjson_response(jobs, concurrency: int = None):
+    # Executa os jobs (funções sem argumentos que criam a corrotina que devolve um dict)
+    # com no máximo `concurrency` em paralelo e devolve cada resultado como uma linha JSON
+    # assim que fica pronto. "index" é a posição da pergunta no lote (a ordem das linhas é
+    # a de conclusão). A corrotina só é criada com a vaga do semáforo: se o cliente
+    # desconectar, os jobs que nem começaram não deixam corrotinas nunca aguardadas.
+    semaphore = asyncio.Semaphore(concurrency or config.BATCH_LLM_CONCURRENCY)
+
+    async def run(index, job):
+        async with semaphore:
+            try:
+                return {"index": index, **await job()}
+            except Exception as e:
+                return {"index": index, "error": str(e)}
+
+    async def lines():
+        tasks = [asyncio.ensure_future(run(index, job)) for index, job in enumerate(jobs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done, ensure_ascii=False) + "\n"
+        finally:
+            for task in tasks:  # cliente desconectou: não gasta mais chamadas ao LLM
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-    messages = [
+
+def query_messages(context, question):
+    return [
         {
             "role": "system",
             "content": (
@@ -32,32 +86,17 @@ async def query(request: QueryRequest):
         {
             "role": "user",
             "content": f"""
-            {best_doc['text']}
+            {context}
 
             Question:
-            {request.query}
+            {question}
             """
         }
     ]
 
-    try:
-        response = query_service.call_groq(messages)
-        return {"response": response["choices"][0]["message"]["content"]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-
-
-@router.post("/ppt-search")
-async def query_pptx(request: QueryRequest):
-    best_doc = query_service.search_best_document(request.query, ppt_docs, ppt_embeddings)
-    if not best_doc:
-        raise HTTPException(status_code=404, detail="No relevant document found.")
-    
-    print(f"Best document: {best_doc['text']}")  # Debugging line to see the best document
 
-    messages = [
+def ppt_messages(context, question):
+    return [
         {
             "role": "system",
             "content": (
@@ -87,27 +126,17 @@ async def query_pptx(request: QueryRequest):
         {
             "role": "user",
             "content": f"""
-            {best_doc['text']}
+            {context}
 
             Question:
-            {request.query}
+            {question}
             """
         }
     ]
 
-    try:
-        response = query_service.call_openai(messages, model="gpt-4o-mini", temperature=0.4)
-        # response = query_service.call_groq(messages)
-        return {"response": response["choices"][0]["message"]["content"]}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-
-@router.post("/text-to-mongo")
-async def text_to_mongo(request: QueryRequest):
 
-    messages = [
+def mongo_messages(question):
+    return [
         {
             "role": "system",
             "content": (
@@ -124,17 +153,176 @@ async def text_to_mongo(request: QueryRequest):
             "role": "user",
             "content": (
                 f'Convert the following request into a valid MongoDB query. '
-                f'Input: "{request.query}"\n\n'
+                f'Input: "{question}"\n\n'
                 "Answer:"
             )
         }
     ]
 
+
+@router.post("/query", dependencies=[Depends(corpora.require_ready)])
+async def query(request: QueryRequest, response: Response):
+    pdf_docs, pdf_index = corpora.get("pdf")
+    query_embedding = await query_service.aencode_query(request.query)
+    cache_namespace = ("pdf", "/query", pdf_docs.version)
+    cached = query_service.cached_answer(cache_namespace, query_embedding)
+    if cached is not None:
+        if request.stream:
+            return sse_response(query_service.replay(cached), headers={"X-Cache": "HIT-SEMANTIC"})
+        response.headers["X-Cache"] = "HIT-SEMANTIC"
+        return {"response": cached}
+    response.headers["X-Cache"] = "MISS"
+
+    context, passages = await query_service.aassemble_context(request.query, pdf_docs, pdf_index, query_embedding=query_embedding)
+    if not passages:
+        raise HTTPException(status_code=404, detail="No relevant document found.")
+
+    messages = query_messages(context, request.query)
+
+    if request.stream:
+        return sse_response(query_service.remember_stream(
+            query_service.stream_llm("/query", messages, temperature=0.2), cache_namespace, query_embedding
+        ), headers={"X-Cache": "MISS"})
+
     try:
-        # response = query_service.call_groq(messages)
-        response = query_service.call_openai(messages, model="gpt-3.5-turbo", temperature=0.0)
-        mongo_query = response['choices'][0]['message']['content'].strip()
+        completion = await query_service.call_llm("/query", messages, temperature=0.2)
+        answer = completion["choices"][0]["message"]["content"]
+        query_service.remember_answer(cache_namespace, query_embedding, answer)
+        return {"response": answer}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+
+
+@router.post("/ppt-search", dependencies=[Depends(corpora.require_ready)])
+async def query_pptx(request: QueryRequest, response: Response):
+    ppt_docs, ppt_index = corpora.get("pptx")
+    query_embedding = await query_service.aencode_query(request.query)
+    cache_namespace = ("pptx", "/ppt-search", ppt_docs.version)
+    cached = query_service.cached_answer(cache_namespace, query_embedding)
+    if cached is not None:
+        if request.stream:
+            return sse_response(query_service.replay(cached), headers={"X-Cache": "HIT-SEMANTIC"})
+        response.headers["X-Cache"] = "HIT-SEMANTIC"
+        return {"response": cached}
+    response.headers["X-Cache"] = "MISS"
+
+    context, passages = await query_service.aassemble_context(request.query, ppt_docs, ppt_index, query_embedding=query_embedding)
+    if not passages:
+        raise HTTPException(status_code=404, detail="No relevant document found.")
+    
+    logger.debug("Best passage: %s", passages[0]["text"])
+
+    messages = ppt_messages(context, request.query)
+
+    if request.stream:
+        return sse_response(query_service.remember_stream(
+            query_service.stream_llm("/ppt-search", messages, temperature=0.4), cache_namespace, query_embedding
+        ), headers={"X-Cache": "MISS"})
+
+    try:
+        completion = await query_service.call_llm("/ppt-search", messages, temperature=0.4)
+        answer = completion["choices"][0]["message"]["content"]
+        query_service.remember_answer(cache_namespace, query_embedding, answer)
+        return {"response": answer}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+
+@router.post("/text-to-mongo")
+async def text_to_mongo(request: QueryRequest, response: Response):
+    # temperature 0.0 é determinístico: a mesma entrada pode vir direto do cache
+    cache_key = make_key("/text-to-mongo", request.query, route_models("/text-to-mongo"), 0.0)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        mongo_query, age = cached
+        response.headers["X-Cache"] = "HIT"
+        response.headers["Age"] = str(int(age))
         return {"response": mongo_query}
+    local = local_mongo_query(request.query)
+    if local is not None:
+        mongo_query, source = local
+        response.headers["X-Cache"] = "LOCAL"
+        response.headers["X-Translator"] = source
+        return {"response": mongo_query}
+    response.headers["X-Cache"] = "MISS"
 
+    try:
+        return {"response": await generate_mongo_query(request.query, cache_key)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def local_mongo_query(question):
+    # Regras/templates locais: (query, "rule" | "template") ou None para ir ao LLM
+    if not config.MONGO_LOCAL_ENABLED:
+        return None
+    with tracing.stage("translate_local"):
+        return mongo_translator.translate_local(question)
+
+
+async def generate_mongo_query(question, cache_key):
+    messages = mongo_messages(question)
+    completion = await query_service.call_llm("/text-to-mongo", messages, temperature=0.0)
+    mongo_query = completion['choices'][0]['message']['content'].strip()
+    valid, reason = mongo_translator.accept_llm(question, mongo_query)
+    if not valid:
+        # Saída inválida não chega ao cliente nem fica no cache
+        logger.warning("Invalid MongoDB query from LLM (%s): %r", reason, mongo_query)
+        return REFUSAL
+    response_cache.set(cache_key, mongo_query)
+    return mongo_query
+
+
+@router.post("/query/batch", dependencies=[Depends(corpora.require_ready)])
+async def query_batch(request: BatchQueryRequest):
+    # Avaliação/pré-aquecimento: um encode e uma multiplicação de matrizes para o lote
+    # inteiro; as chamadas ao LLM saem em paralelo limitado, respostas em NDJSON.
+    pdf_docs, pdf_index = corpora.get("pdf")
+    queries = request.queries
+    embeddings = await query_service.aencode_queries(queries)
+    hits = await query_service.aretrieve_batch(queries, pdf_index, config.CONTEXT_CANDIDATES, embeddings)
+    cache_namespace = ("pdf", "/query", pdf_docs.version)
+
+    async def answer(question, query_embedding, question_hits):
+        cached = query_service.cached_answer(cache_namespace, query_embedding)
+        if cached is not None:
+            return {"query": question, "response": cached, "cache": "HIT-SEMANTIC"}
+        context, passages = await query_service.aassemble_context(question, pdf_docs, pdf_index, hits=question_hits)
+        if not passages:
+            return {"query": question, "error": "No relevant document found."}
+        completion = await query_service.call_llm("/query", query_messages(context, question), temperature=0.2)
+        response = completion["choices"][0]["message"]["content"]
+        query_service.remember_answer(cache_namespace, query_embedding, response)
+        return {"query": question, "response": response, "cache": "MISS"}
+
+    return ndjson_response([partial(answer, *job) for job in zip(queries, embeddings, hits)])
+
+
+@router.post("/text-to-mongo/batch")
+async def text_to_mongo_batch(request: BatchQueryRequest):
+    async def translate(question):
+        cache_key = make_key("/text-to-mongo", question, route_models("/text-to-mongo"), 0.0)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return {"query": question, "response": cached[0], "cache": "HIT"}
+        local = local_mongo_query(question)
+        if local is not None:
+            return {"query": question, "response": local[0], "cache": "LOCAL"}
+        return {"query": question, "response": await generate_mongo_query(question, cache_key), "cache": "MISS"}
+
+    return ndjson_response([partial(translate, question) for question in request.queries])
+
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {
+        "semantic": answer_cache.stats(),
+        "embeddings": embedding_cache.stats(),
+        "responses": response_cache.stats(),
+        "query_batching": query_batcher.stats(),
+        "text_to_mongo": mongo_translator.stats(),
+    }
@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from collections import OrderedDict
+from app import config
+from app.services import metrics, tracing
+
+# Controle de admissão das rotas caras (encode + LLM), por worker:
+#   - no máximo N requisições em andamento por rota; as demais esperam numa fila com prioridade
+#   - quem esperaria mais que o limite da rota (estimado pelo tempo médio de atendimento)
+#     ou encontra a fila cheia recebe 429 + Retry-After na hora, sem ocupar nada
+#   - token bucket por cliente (X-API-Key ou IP)
+
+REJECTIONS = metrics.Counter("rag_admission_rejections_total",
+                             "Requisições recusadas: queue_full, slo, timeout, rate_limited.", ("route", "reason"))
+QUEUE_WAIT = metrics.Histogram("rag_admission_queue_seconds", "Tempo de espera na fila de admissão.", ("route",))
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limite de concorrência de uma rota com fila por prioridade e prazo de espera."""
+
+    def __init__(self, route: str, max_in_flight: int, max_queue: int, max_wait: float):
+        self.route = route
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = None  # média móvel (EWMA) do tempo em que um slot fica ocupado
+        self._heap = []  # (prioridade, ordem de chegada, future)
+        self._order = itertools.count()
+
+    def estimated_wait(self, ahead: int) -> float:
+        # Com todos os slots ocupados, cada slot libera em média a cada `service_time`
+        if self.service_time is None:
+            return 0.0
+        return (ahead + 1) / self.max_in_flight * self.service_time
+
+    async def acquire(self, priority: int):
+        if self.in_flight < self.max_in_flight and not self.waiting:
+            self.in_flight += 1
+            return
+        ahead = sum(1 for p, _, future in self._heap if p <= priority and not future.done())
+        estimate = self.estimated_wait(ahead)
+        if self.waiting >= self.max_queue:
+            raise Rejected("queue_full", estimate)
+        if estimate > self.max_wait:
+            raise Rejected("slo", estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._order), future))
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if not (future.done() and not future.cancelled()):
+                raise Rejected("timeout", self.estimated_wait(self.waiting))
+            # O slot chegou junto com o timeout: a requisição segue
+        except BaseException:
+            # Cliente desconectou na fila; se o slot já tinha sido entregue, devolve
+            if future.done() and not future.cancelled():
+                self.release(None)
+            raise
+        finally:
+            self.waiting -= 1
+
+    def release(self, elapsed):
+        if elapsed is not None:
+            self.service_time = elapsed if self.service_time is None else 0.8 * self.service_time + 0.2 * elapsed
+        # O slot passa direto para o próximo da fila (quem desistiu é descartado)
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "service_time": self.service_time,
+        }
+
+
+class TokenBuckets:
+    """Token bucket por cliente: `rate` requisições/s com rajadas de até `burst`."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.clock = clock
+        self._buckets = OrderedDict()  # cliente -> [tokens, última atualização]
+
+    def take(self, client: str) -> float:
+        # 0 se a requisição pode passar; senão, segundos até o próximo token
+        now = self.clock()
+        bucket = self._buckets.pop(client, None) or [float(self.burst), now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        self._buckets[client] = bucket
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)  # clientes inativos há mais tempo
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+
+controllers = {
+    route: AdmissionController(route, max_in_flight, max_queue, max_wait)
+    for route, (max_in_flight, max_queue, max_wait) in config.ADMISSION_LIMITS.items()
+}
+buckets = TokenBuckets(config.RATE_LIMIT_PER_SECOND, config.RATE_LIMIT_BURST, config.RATE_LIMIT_MAX_CLIENTS)
+
+metrics.Callback("rag_admission_in_flight", "Requisições admitidas em andamento, por rota.",
+                 lambda: {(route,): c.in_flight for route, c in controllers.items()}, ("route",))
+metrics.Callback("rag_admission_queue_depth", "Requisições na fila de admissão, por rota.",
+                 lambda: {(route,): c.waiting for route, c in controllers.items()}, ("route",))
+
+
+def client_key(scope, headers: dict) -> str:
+    api_key = headers.get(b"x-api-key")
+    if api_key:
+        return "key:" + api_key.decode("latin-1")
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and config.RATE_LIMIT_TRUST_FORWARDED:
+        return "ip:" + forwarded.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI: aplica o rate limit e a admissão às rotas de config.ADMISSION_LIMITS.
+    O slot só é liberado quando o último byte da resposta sai (vale para streams)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        controller = controllers.get(scope["path"]) if scope["type"] == "http" else None
+        if controller is None or not config.ADMISSION_ENABLED or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        if buckets.rate > 0:
+            retry_after = buckets.take(client_key(scope, headers))
+            if retry_after > 0:
+                REJECTIONS.inc(route=controller.route, reason="rate_limited")
+                return await _reject(send, 429, "Rate limit exceeded.", retry_after)
+
+        priority = config.ADMISSION_PRIORITIES.get(headers.get(b"x-priority", b"normal").decode("latin-1").lower(),
+                                                   config.ADMISSION_PRIORITIES["normal"])
+        start = time.perf_counter()
+        try:
+            await controller.acquire(priority)
+        except Rejected as e:
+            REJECTIONS.inc(route=controller.route, reason=e.reason)
+            tracing.annotate(admission=e.reason)
+            return await _reject(send, 429, "Server busy, try again later.", e.retry_after)
+        waited = time.perf_counter() - start
+        QUEUE_WAIT.observe(waited, route=controller.route)
+        tracing.record("queue", waited)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(time.perf_counter() - started)
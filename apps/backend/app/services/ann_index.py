@@ -0,0 +1,103 @@
+import numpy as np
+from app.services.vector_index import normalize_rows, top_k
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray, batch_size: int = 16384) -> np.ndarray:
+    # Atribui cada vetor ao centróide mais próximo (em lotes para limitar memória).
+    labels = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], batch_size):
+        block = matrix[start:start + batch_size]
+        labels[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_kmeans(matrix: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    # K-means esférico: vetores e centróides normalizados, similaridade por produto interno.
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(matrix.shape[0], n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = _assign(matrix, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, matrix)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        # Clusters vazios são reiniciados com pontos aleatórios
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = matrix[rng.choice(matrix.shape[0], int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+class IVFIndex:
+    """Índice aproximado (inverted file): os vetores são agrupados por k-means e a
+    busca só varre as `nprobe` listas cujos centróides são mais próximos da query.
+
+    Mais `nprobe` = mais recall e mais latência; nprobe == nlist equivale à busca exata.
+    """
+
+    def __init__(self, embeddings, nlist: int = None, nprobe: int = 8, normalized: bool = False,
+                 n_iter: int = 10, train_size: int = None, seed: int = 0):
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("Embeddings precisam ser uma matriz 2D (n_chunks, dim)")
+        if not normalized:
+            matrix = normalize_rows(matrix)
+
+        n = matrix.shape[0]
+        self.nprobe = nprobe
+        if n == 0:
+            # Corpus vazio: sem listas para treinar; a busca devolve vazio, como no FlatIndex
+            self.nlist = 0
+            self.centroids = np.empty((0, matrix.shape[1]), dtype=np.float32)
+            self.ids = self.positions = np.empty(0, dtype=np.int64)
+            self.vectors = matrix
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+        self.nlist = max(1, min(nlist or int(4 * np.sqrt(n)), n))
+
+        # Treina os centróides numa amostra do corpus
+        rng = np.random.default_rng(seed)
+        train_size = min(n, train_size or self.nlist * 64)
+        sample = matrix if train_size == n else matrix[np.sort(rng.choice(n, train_size, replace=False))]
+        self.centroids = train_kmeans(sample, self.nlist, n_iter=n_iter, seed=seed)
+
+        # Listas invertidas em formato CSR: vetores reordenados por lista, contíguos na memória
+        labels = _assign(matrix, self.centroids)
+        order = np.argsort(labels, kind="stable")
+        self.ids = order.astype(np.int64)
+        self.vectors = matrix[order]
+        self.positions = np.empty_like(self.ids)  # id do chunk -> linha em self.vectors
+        self.positions[self.ids] = np.arange(n)
+        self.offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=self.nlist), out=self.offsets[1:])
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def search(self, query_embedding, k: int = 1, nprobe: int = None):
+        if len(self) == 0:
+            return top_k(np.empty(0, dtype=np.float32), k)
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        probes, _ = top_k(self.centroids @ query, nprobe)
+        ranges = [(self.offsets[p], self.offsets[p + 1]) for p in probes.tolist()]
+        ranges = [(start, end) for start, end in ranges if end > start]
+        if not ranges:
+            return top_k(np.empty(0, dtype=np.float32), k)
+
+        # Cada lista é um bloco contíguo: um produto matriz-vetor por lista, sem cópias
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([self.vectors[start:end] @ query for start, end in ranges])
+        best, best_scores = top_k(scores, k)
+        return self.ids[rows[best]], best_scores
+
+    def reconstruct(self, ids) -> np.ndarray:
+        return self.vectors[self.positions[np.asarray(ids)]]
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import re
+from array import array
+import numpy as np
+from app.services.vector_index import top_k
+
+# Tokens com pontos/hífens internos ficam inteiros: "702.19b", "first-strike"
+TOKEN_RE = re.compile(r"\w+(?:[.\-]\w+)*")
+BM25_FILE = "bm25.npz"
+VOCAB_FILE = "bm25_vocab.json"
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Builder:
+    """Acumula os chunks em streaming (mesma ordem do índice denso) e gera o BM25Index."""
+
+    def __init__(self):
+        self.vocab = {}
+        self._terms = array("i")
+        self._docs = array("i")
+        self._tfs = array("H")
+        self._doc_lens = array("i")
+
+    def add(self, texts):
+        for text in texts:
+            doc_id = len(self._doc_lens)
+            counts = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                term = self.vocab.setdefault(token, len(self.vocab))
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                self._terms.append(term)
+                self._docs.append(doc_id)
+                self._tfs.append(min(tf, 65535))
+            self._doc_lens.append(len(tokens))
+
+    def build(self, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        terms = np.frombuffer(self._terms, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")  # agrupa por termo; doc_ids continuam crescentes
+        term_offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=term_offsets[1:])
+        return BM25Index(
+            vocab=self.vocab,
+            term_offsets=term_offsets,
+            postings_docs=np.frombuffer(self._docs, dtype=np.int32)[order],
+            postings_tfs=np.frombuffer(self._tfs, dtype=np.uint16)[order],
+            doc_lens=np.frombuffer(self._doc_lens, dtype=np.int32).copy(),
+            k1=k1,
+            b=b,
+        )
+
+
+class BM25Index:
+    """Índice invertido BM25 com listas de postings em arrays contíguos (formato CSR):
+    os postings do termo t estão em postings_docs[term_offsets[t]:term_offsets[t + 1]]."""
+
+    def __init__(self, vocab, term_offsets, postings_docs, postings_tfs, doc_lens, k1=1.5, b=0.75):
+        self.vocab = vocab
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(doc_lens)
+        doc_freq = np.diff(term_offsets).astype(np.float32)
+        self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        avg_len = float(doc_lens.mean()) if n_docs else 0.0
+        # Parte do denominador que só depende do documento, pré-calculada
+        self._norm = (k1 * (1 - b + b * doc_lens / avg_len)).astype(np.float32) if avg_len else \
+            np.full(n_docs, k1, dtype=np.float32)
+
+    @classmethod
+    def from_texts(cls, texts) -> "BM25Index":
+        builder = BM25Builder()
+        builder.add(texts)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    def search(self, query: str, k: int = 10):
+        scores = np.zeros(len(self), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocab.get(token)
+            if term is None:
+                continue
+            start, end = self.term_offsets[term], self.term_offsets[term + 1]
+            docs = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end].astype(np.float32)
+            scores[docs] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+
+        matched = np.flatnonzero(scores)
+        best, best_scores = top_k(scores[matched], k)
+        return matched[best], best_scores
+
+    def save(self, index_dir: str):
+        np.savez(
+            os.path.join(index_dir, BM25_FILE),
+            term_offsets=self.term_offsets,
+            postings_docs=self.postings_docs,
+            postings_tfs=self.postings_tfs,
+            doc_lens=self.doc_lens,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+        )
+        with open(os.path.join(index_dir, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir: str):
+        path = os.path.join(index_dir, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(os.path.join(index_dir, VOCAB_FILE), encoding="utf-8") as f:
+            vocab = json.load(f)
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            return cls(vocab, data["term_offsets"], data["postings_docs"], data["postings_tfs"],
+                       data["doc_lens"], k1=k1, b=b)
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    # RRF: score(d) = soma de 1 / (k + posição de d em cada ranking). Não depende da
+    # escala dos scores, então mistura cosseno e BM25 sem calibração.
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking.tolist(), start=1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank)
+    if not fused:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    docs = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+    scores = np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+    best, best_scores = top_k(scores, len(scores))
+    return docs[best], best_scores
+
+
+class HybridIndex:
+    """Índice denso + BM25 combinados por reciprocal rank fusion."""
+
+    def __init__(self, dense, lexical: BM25Index, candidates: int = 50, rrf_k: int = 60):
+        self.dense = dense
+        self.lexical = lexical
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def __len__(self):
+        return len(self.dense)
+
+    @property
+    def dim(self) -> int:
+        return self.dense.dim
+
+    def reconstruct(self, ids) -> np.ndarray:
+        return self.dense.reconstruct(ids)
+
+    def search_batch(self, query_embeddings, k: int = 1, query_texts=None):
+        # Lista de (indices, scores) por query; a parte densa num único produto de
+        # matrizes quando o índice denso suporta
+        n = max(k, self.candidates)
+        if hasattr(self.dense, "search_batch"):
+            dense_results = list(zip(*self.dense.search_batch(query_embeddings, n)))
+        else:
+            dense_results = [self.dense.search(q, n) for q in query_embeddings]
+        return self._fuse(dense_results, k, query_texts)
+
+    async def asearch_batch(self, query_embeddings, k: int = 1, query_texts=None):
+        # Para índices densos com busca assíncrona (ShardedIndex): a espera pelos shards
+        # não ocupa thread; só o BM25 e a fusão rodam numa
+        n = max(k, self.candidates)
+        dense_results = list(zip(*await self.dense.asearch_batch(query_embeddings, n)))
+        return await asyncio.to_thread(self._fuse, dense_results, k, query_texts)
+
+    def _fuse(self, dense_results, k: int, query_texts):
+        n = max(k, self.candidates)
+        results = []
+        for i, (dense_ids, dense_scores) in enumerate(dense_results):
+            if not query_texts or not query_texts[i]:
+                results.append((dense_ids[:k], dense_scores[:k]))
+                continue
+            lexical_ids, _ = self.lexical.search(query_texts[i], n)
+            docs, scores = reciprocal_rank_fusion([dense_ids, lexical_ids], self.rrf_k)
+            results.append((docs[:k], scores[:k]))
+        return results
+
+    def search(self, query_embedding, k: int = 1, query_text: str = None):
+        if not query_text:
+            return self.dense.search(query_embedding, k)
+        dense_ids, _ = self.dense.search(query_embedding, max(k, self.candidates))
+        lexical_ids, _ = self.lexical.search(query_text, max(k, self.candidates))
+        docs, scores = reciprocal_rank_fusion([dense_ids, lexical_ids], self.rrf_k)
+        return docs[:k], scores[:k]
@@ -0,0 +1,125 @@
+import logging
+import threading
+import numpy as np
+from app import config
+
+logger = logging.getLogger("app.context")
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    # Tokenizador BPE local do tiktoken (o arquivo do encoding é baixado só na 1ª vez).
+    # Sem ele (ex.: servidor offline), a contagem cai para uma estimativa de ~4 caracteres/token.
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(config.CONTEXT_TOKENIZER)
+                except Exception as e:
+                    logger.warning("tiktoken indisponível (%s); estimando tokens por caracteres", e)
+                    _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def deduplicate(indices, scores, vectors, threshold: float):
+    # Guloso, em ordem de score: descarta o chunk se ele for quase igual a um já mantido
+    kept = []
+    for row in range(len(indices)):
+        if kept and float(np.max(vectors[kept] @ vectors[row])) >= threshold:
+            continue
+        kept.append(row)
+    return indices[kept], scores[kept]
+
+
+def _location(doc: dict):
+    return doc.get("source", ""), doc.get("page")
+
+
+def merge_neighbors(documents, indices, scores, neighbors: int):
+    """Expande cada hit com até `neighbors` chunks vizinhos da mesma página/slide e junta
+    trechos que se encostam ou se sobrepõem numa única passagem (texto contínuo)."""
+    spans = []  # [início, fim, score, posições dos hits]
+    for i, score in zip(indices.tolist(), scores.tolist()):
+        location = _location(documents[i])
+        start = end = i
+        while start > 0 and i - start < neighbors and _location(documents[start - 1]) == location:
+            start -= 1
+        while end + 1 < len(documents) and end - i < neighbors and _location(documents[end + 1]) == location:
+            end += 1
+        spans.append([start, end, score, [i]])
+
+    spans.sort(key=lambda span: span[0])
+    merged = []
+    for span in spans:
+        last = merged[-1] if merged else None
+        if last and span[0] <= last[1] + 1 and _location(documents[span[0]]) == _location(documents[last[1]]):
+            last[1], last[2] = max(last[1], span[1]), max(last[2], span[2])
+            last[3].extend(span[3])
+        else:
+            merged.append(span)
+
+    passages = []
+    for start, end, score, hits in merged:
+        chunks = [documents[i] for i in range(start, end + 1)]
+        passages.append({
+            "ids": [chunk["id"] for chunk in chunks],
+            "hits": sorted(hits),
+            "page": chunks[0].get("page"),
+            "source": chunks[0].get("source"),
+            "text": " ".join(chunk["text"] for chunk in chunks),
+            "score": score,
+        })
+    passages.sort(key=lambda passage: passage["score"], reverse=True)
+    return passages
+
+
+def pack(passages, budget: int):
+    # Passagens em ordem de relevância enquanto couberem no orçamento; a primeira é
+    # truncada se sozinha já passar dele, para o prompt nunca ficar sem contexto.
+    packed, used = [], 0
+    for passage in passages:
+        tokens = count_tokens(passage["text"])
+        if used + tokens > budget:
+            if packed:
+                continue
+            passage = {**passage, "text": truncate_tokens(passage["text"], budget), "truncated": True}
+            tokens = budget
+        packed.append({**passage, "tokens": tokens})
+        used += tokens
+    return packed
+
+
+def assemble(documents, index, indices, scores, neighbors: int = None, dedup_threshold: float = None,
+             budget: int = None):
+    """Da lista de hits da busca (posições + scores) ao contexto do prompt.
+    Retorna (texto do contexto, passagens usadas)."""
+    neighbors = config.CONTEXT_NEIGHBORS if neighbors is None else neighbors
+    dedup_threshold = config.CONTEXT_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    if len(indices) == 0:
+        return "", []
+
+    if dedup_threshold < 1.0 and hasattr(index, "reconstruct"):
+        indices, scores = deduplicate(indices, scores, index.reconstruct(indices), dedup_threshold)
+    if hasattr(documents, "prefetch"):
+        # Chunks remotos (servidor de embeddings): hits e vizinhos numa única ida ao servidor
+        documents.prefetch(i + offset for i in indices.tolist() for offset in range(-neighbors, neighbors + 1))
+    passages = pack(merge_neighbors(documents, indices, scores, neighbors), budget)
+    return "\n\n".join(passage["text"] for passage in passages), passages
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+import traceback
+from fastapi import HTTPException
+from app import config
+from app.services import embedding_client
+from app.services.bm25 import BM25Builder, BM25Index
+from app.services.corpus_registry import CorpusRegistry
+from app.services.semantic_cache import answer_cache
+from app.services.vector_index import build_index
+from app.utils import index_store
+from app.utils.file_loaders import iter_pages
+from app.utils.text_processing import embedding_backend, encode_chunks, get_model, iter_chunks, iter_windows
+
+# Corpora servidos pela API: nome -> (arquivo de origem, diretório do índice, tipo, diretório monitorado)
+# Com diretório monitorado, o corpus vem do CorpusRegistry em vez do arquivo único.
+CORPORA = {
+    "pdf": (config.PDF_PATH, config.CACHE_PATH_PDF, "pdf", config.PDF_DIR),
+    "pptx": (config.PPTX_PATH, config.CACHE_PATH_PPTX, "pptx", config.PPTX_DIR),
+}
+
+_loaded = {}  # nome -> (documents, index)
+_registries = {}  # nome -> CorpusRegistry
+_ready = threading.Event()
+_state = {"status": "idle", "error": None, "started_at": None, "ready_at": None}
+_remote = {"registries": {}}  # último status do servidor de embeddings (modo remoto)
+
+
+def _load_lexical(cache_path: str, documents):
+    # Índice BM25 salvo junto com os embeddings (recriado se faltar).
+    if config.RETRIEVAL_MODE != "hybrid":
+        return None
+    lexical = BM25Index.load(cache_path)
+    if lexical is None or len(lexical) != len(documents):
+        lexical = BM25Index.from_texts(doc["text"] for doc in documents)
+        lexical.save(cache_path)
+    return lexical
+
+
+def load_or_create_embeddings(file_path: str, cache_path: str, source_type: str):
+    # Abre o índice em disco (memmap) ou recria se não existir ou estiver desatualizado.
+    header = index_store.read_header(cache_path)
+    if not index_store.is_stale(header, config.EMBEDDING_MODEL, config.CHUNK_SIZE, *embedding_backend()):
+        documents, embeddings = index_store.open_index(cache_path, header)
+        return documents, build_index(embeddings, normalized=True, lexical=_load_lexical(cache_path, documents))
+    if header is not None:
+        print(f"Índice desatualizado em {cache_path}, recriando...")
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
+
+    # Extração -> limpeza -> chunking -> embeddings em janelas, gravando direto no disco:
+    # a memória usada não depende do tamanho do arquivo
+    # Slides são unidades independentes: o texto de um não continua no seguinte
+    chunks = iter_chunks(iter_pages(file_path, source_type), config.CHUNK_SIZE, join_pages=source_type == "pdf")
+    writer = index_store.IndexWriter(cache_path)
+    lexical = BM25Builder()
+    pool = get_model().start_multi_process_pool(["cpu"] * config.EMBED_WORKERS) if config.EMBED_WORKERS > 1 else None
+    try:
+        for window in iter_windows(chunks, config.EMBED_STREAM_WINDOW):
+            texts = [chunk["text"] for chunk in window]
+            writer.add(texts, encode_chunks(texts, pool=pool), [chunk["page"] for chunk in window])
+            lexical.add(texts)
+        if writer.count == 0:
+            raise ValueError(f"Nenhum texto extraído de: {file_path}")
+
+        # Índice em disco para evitar processamento repetido
+        header = index_store.build_header(
+            config.EMBEDDING_MODEL, writer.dim, config.CHUNK_SIZE,
+            writer.count, file_path, source_type, *embedding_backend()
+        )
+        lexical.build().save(writer.tmp_dir)
+        writer.commit(header)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if pool is not None:
+            get_model().stop_multi_process_pool(pool)
+    answer_cache.invalidate(source_type)  # respostas antigas citam o índice anterior
+
+    documents, embeddings = index_store.open_index(cache_path, header)
+    return documents, build_index(embeddings, normalized=True, lexical=_load_lexical(cache_path, documents))
+
+
+def _remote_mode() -> bool:
+    return bool(config.EMBEDDING_SERVER_SOCKET)
+
+
+def _apply_remote(server_status: dict):
+    # Troca o corpus servido quando a versão no servidor mudou (reindexação)
+    client = embedding_client.get_client()
+    for name, info in server_status["versions"].items():
+        current = _loaded.get(name)
+        if current is not None and current[0].version == info["version"]:
+            continue
+        _loaded[name] = (
+            embedding_client.RemoteDocuments(client, name, info["version"], info["count"]),
+            embedding_client.RemoteIndex(client, name, info["version"]),
+        )
+        if current is not None:
+            answer_cache.invalidate(name)
+    _remote["registries"] = server_status.get("registries", {})
+
+
+def _load_remote():
+    # Worker sem modelo nem índices: espera o servidor de embeddings ficar pronto
+    client = embedding_client.get_client()
+    while True:
+        try:
+            server_status = client.status()
+        except OSError:
+            server_status = None
+        if server_status and server_status["status"] == "ready":
+            break
+        if server_status and server_status["status"] == "failed":
+            raise RuntimeError(f"Servidor de embeddings falhou: {server_status['error']}")
+        time.sleep(1)
+    _apply_remote(server_status)
+    _state.update(status="ready", ready_at=time.time())
+    _ready.set()
+    threading.Thread(target=_watch_remote, name="corpus-watcher", daemon=True).start()
+
+
+def _watch_remote():
+    while True:
+        time.sleep(config.REMOTE_POLL_INTERVAL)
+        try:
+            _apply_remote(embedding_client.get_client().status())
+        except Exception:
+            traceback.print_exc()
+
+
+def _load_all():
+    _state.update(status="loading", started_at=time.time())
+    if _remote_mode():
+        try:
+            _load_remote()
+        except Exception as e:
+            traceback.print_exc()
+            _state.update(status="failed", error=str(e))
+        return
+    try:
+        get_model()
+        for name, (file_path, cache_path, source_type, source_dir) in CORPORA.items():
+            if source_dir:
+                registry = CorpusRegistry(name, source_dir, os.path.join(config.REGISTRY_INDEX_DIR, name))
+                registry.sync()
+                _registries[name] = registry
+                _loaded[name] = registry.snapshot()
+            else:
+                _loaded[name] = load_or_create_embeddings(file_path, cache_path, source_type)
+    except Exception as e:
+        traceback.print_exc()
+        _state.update(status="failed", error=str(e))
+        return
+    _state.update(status="ready", ready_at=time.time())
+    _ready.set()
+    if _registries:
+        threading.Thread(target=_watch, name="corpus-watcher", daemon=True).start()
+
+
+def reindex(name: str) -> bool:
+    # Sincroniza o diretório de um corpus; troca o índice servido se algo mudou.
+    if _remote_mode():
+        client = embedding_client.get_client()
+        changed = client.reindex(name)["changed"]
+        _apply_remote(client.status())
+        return changed
+    registry = _registries[name]
+    changed = registry.sync()
+    if changed:
+        _loaded[name] = registry.snapshot()
+        answer_cache.invalidate(name)
+    return changed
+
+
+def _watch():
+    while True:
+        time.sleep(config.REGISTRY_POLL_INTERVAL)
+        for name in list(_registries):
+            try:
+                reindex(name)
+            except Exception:
+                traceback.print_exc()
+
+
+def start_background_loading():
+    # Carrega modelo e índices numa thread: o servidor já responde /healthz enquanto isso.
+    if _state["status"] in ("loading", "ready"):
+        return
+    threading.Thread(target=_load_all, name="corpus-loader", daemon=True).start()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def status() -> dict:
+    return {
+        **_state,
+        "corpora": {name: len(docs) for name, (docs, _) in _loaded.items()},
+        "registries": _remote["registries"] if _remote_mode() else
+        {name: registry.status() for name, registry in _registries.items()},
+    }
+
+
+def get(name: str):
+    return _loaded[name]
+
+
+def is_registry(name: str) -> bool:
+    return name in (_remote["registries"] if _remote_mode() else _registries)
+
+
+def require_ready():
+    # Dependência das rotas que precisam do modelo/índices: 503 até estarem prontos.
+    if not is_ready():
+        detail = "Index loading failed." if _state["status"] == "failed" else "Indexes are still loading."
+        raise HTTPException(
+            status_code=503,
+            detail=detail,
+            headers={"Retry-After": str(config.READY_RETRY_AFTER)},
+        )
@@ -0,0 +1,332 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from app import config
+from app.services.vector_index import build_index
+from app.services.bm25 import BM25Index
+from app.utils import index_store
+from app.utils.file_loaders import iter_pdf_pages, iter_pptx_slides
+from app.utils.text_processing import clean_text, chunk_text, embedding_backend, encode_chunks, get_model
+
+# Registro incremental de um diretório de PDFs/PPTX.
+#
+# Layout em disco (index_dir):
+#   manifest.json          -> header do índice + arquivos, hash de cada página e as linhas dela
+#   vectors-<seg>.f32      -> embeddings float32 (append-only)
+#   texts-<seg>.bin        -> texto dos chunks em UTF-8 (append-only)
+#   rows-<seg>.bin         -> ROW_DTYPE por linha: início/fim do texto, arquivo, página
+#
+# Uma página alterada ganha linhas novas no fim dos arquivos; as antigas deixam de ser
+# referenciadas pelo manifest (tombstone). Quando há mais linhas mortas que vivas, a
+# compactação reescreve tudo num novo segmento e troca o manifest de uma vez.
+MANIFEST_FILE = "manifest.json"
+SUPPORTED_EXTENSIONS = {".pdf": iter_pdf_pages, ".pptx": iter_pptx_slides}
+ROW_DTYPE = np.dtype([("text_start", "<i8"), ("text_end", "<i8"), ("file_id", "<i4"), ("page", "<i4")])
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RegistryChunks:
+    """Visão somente-leitura das linhas vivas do registro (mesma interface do ChunkStore)."""
+
+    def __init__(self, texts, rows, live: np.ndarray, file_names: dict, id_prefix: str, version: str):
+        self.texts = texts
+        self.rows = rows
+        self.live = live
+        self.file_names = file_names
+        self.id_prefix = id_prefix
+        self.version = version
+
+    def __len__(self):
+        return len(self.live)
+
+    def __getitem__(self, i: int) -> dict:
+        row_id = int(self.live[i])
+        row = self.rows[row_id]
+        text = self.texts[int(row["text_start"]):int(row["text_end"])].tobytes().decode("utf-8")
+        return {
+            "id": f"{self.id_prefix}_{row_id}",
+            "text": text,
+            "source": self.file_names.get(int(row["file_id"]), ""),
+            "page": int(row["page"]),
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class CorpusRegistry:
+    def __init__(self, name: str, source_dir: str, index_dir: str):
+        self.name = name
+        self.source_dir = source_dir
+        self.index_dir = index_dir
+        self._lock = threading.Lock()  # manifest/snapshot
+        self._sync_lock = threading.Lock()  # uma reindexação por vez
+        self._snapshot = None
+        os.makedirs(index_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    # ---- manifest / arquivos de dados ----
+
+    def _path(self, kind: str, segment: int = None) -> str:
+        segment = self.manifest["segment"] if segment is None else segment
+        extension = {"vectors": "f32", "texts": "bin", "rows": "bin"}[kind]
+        return os.path.join(self.index_dir, f"{kind}-{segment}.{extension}")
+
+    def _empty_manifest(self) -> dict:
+        dim = get_model().get_sentence_embedding_dimension()
+        header = index_store.build_header(config.EMBEDDING_MODEL, dim, config.CHUNK_SIZE, 0, self.source_dir, self.name,
+                                          *embedding_backend())
+        return {"header": header, "segment": 0, "generation": 0, "rows": 0, "text_bytes": 0,
+                "next_file_id": 0, "files": {}}
+
+    def _read_manifest(self) -> dict:
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        manifest = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if index_store.is_stale(manifest["header"], config.EMBEDDING_MODEL, config.CHUNK_SIZE, *embedding_backend()):
+                print(f"Registro desatualizado em {self.index_dir}, recriando...")
+                manifest = None
+
+        if manifest is None:
+            self.manifest = self._empty_manifest()
+            for kind in ("vectors", "texts", "rows"):
+                open(self._path(kind), "wb").close()
+            self._write_manifest()
+            return self.manifest
+
+        # Descarta linhas gravadas depois do último manifest (ex.: processo morto no meio do append)
+        self.manifest = manifest
+        dim = manifest["header"]["dim"]
+        for kind, size in (("vectors", manifest["rows"] * dim * 4),
+                           ("texts", manifest["text_bytes"]),
+                           ("rows", manifest["rows"] * ROW_DTYPE.itemsize)):
+            with open(self._path(kind), "ab") as f:
+                f.truncate(size)
+        return manifest
+
+    def _write_manifest(self, manifest: dict = None):
+        path = os.path.join(self.index_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest or self.manifest, f)
+        os.replace(tmp_path, path)
+
+    def _append(self, manifest: dict, chunks, embeddings: np.ndarray, file_id: int, page: int):
+        # Grava os chunks de uma página no fim dos arquivos e devolve o intervalo de linhas.
+        encoded = [chunk.encode("utf-8") for chunk in chunks]
+        rows = np.zeros(len(encoded), dtype=ROW_DTYPE)
+        offset = manifest["text_bytes"]
+        for i, b in enumerate(encoded):
+            rows[i] = (offset, offset + len(b), file_id, page)
+            offset += len(b)
+
+        segment = manifest["segment"]
+        with open(self._path("texts", segment), "ab") as f:
+            f.write(b"".join(encoded))
+        with open(self._path("vectors", segment), "ab") as f:
+            f.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        with open(self._path("rows", segment), "ab") as f:
+            f.write(rows.tobytes())
+
+        start = manifest["rows"]
+        manifest["rows"] += len(encoded)
+        manifest["text_bytes"] = offset
+        return [start, manifest["rows"]]
+
+    def _flush(self, manifest: dict, pending: list):
+        # Embeddings das páginas acumuladas num único passo em lotes, gravados em seguida
+        all_chunks = [chunk for *_, chunks in pending for chunk in chunks]
+        dim = manifest["header"]["dim"]
+        embeddings = encode_chunks(all_chunks) if all_chunks else np.empty((0, dim), dtype=np.float32)
+        position = 0
+        for page, file_id, page_no, chunks in pending:
+            page["rows"] = self._append(manifest, chunks, embeddings[position:position + len(chunks)], file_id, page_no)
+            position += len(chunks)
+        pending.clear()
+
+    def _open_data(self, manifest: dict = None):
+        manifest = manifest or self.manifest
+        dim = manifest["header"]["dim"]
+        n_rows = manifest["rows"]
+        if n_rows == 0:
+            return (np.empty(0, dtype=np.uint8), np.empty(0, dtype=ROW_DTYPE),
+                    np.empty((0, dim), dtype=np.float32))
+        segment = manifest["segment"]
+        texts = np.memmap(self._path("texts", segment), dtype=np.uint8, mode="r", shape=(manifest["text_bytes"],)) \
+            if manifest["text_bytes"] else np.empty(0, dtype=np.uint8)
+        rows = np.memmap(self._path("rows", segment), dtype=ROW_DTYPE, mode="r", shape=(n_rows,))
+        vectors = np.memmap(self._path("vectors", segment), dtype=np.float32, mode="r", shape=(n_rows, dim))
+        return texts, rows, vectors
+
+    @staticmethod
+    def _live_rows(manifest: dict) -> np.ndarray:
+        ranges = [
+            page["rows"]
+            for entry in manifest["files"].values()
+            for page in entry["pages"].values()
+            if page["rows"][1] > page["rows"][0]
+        ]
+        ranges.sort()
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, end, dtype=np.int64) for start, end in ranges])
+
+    def _discover(self):
+        for root, _, files in os.walk(self.source_dir):
+            for file_name in sorted(files):
+                if os.path.splitext(file_name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    path = os.path.join(root, file_name)
+                    yield os.path.relpath(path, self.source_dir), path
+
+    # ---- operações públicas ----
+
+    def sync(self) -> bool:
+        """Reindexa só o que mudou no diretório. Retorna True se o corpus mudou.
+
+        O trabalho é feito numa cópia do manifest, sem segurar o lock do snapshot;
+        a cópia só é trocada no fim. Os chunks são codificados e gravados a cada
+        REGISTRY_ENCODE_BATCH, então a memória não cresce com o tamanho do diretório."""
+        with self._sync_lock:
+            manifest = copy.deepcopy(self.manifest)
+            old_files = manifest["files"]
+            files, pending, buffered, changed = {}, [], 0, False
+
+            for rel_path, path in sorted(self._discover()):
+                stat = os.stat(path)
+                entry = old_files.get(rel_path)
+                if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    files[rel_path] = entry
+                    continue
+
+                sha = file_sha256(path)
+                if entry and entry["sha256"] == sha:
+                    files[rel_path] = {**entry, "size": stat.st_size, "mtime": stat.st_mtime}
+                    continue
+
+                changed = True
+                if entry:
+                    file_id = entry["id"]
+                else:
+                    file_id = manifest["next_file_id"]
+                    manifest["next_file_id"] += 1
+                old_pages = entry["pages"] if entry else {}
+
+                # Só páginas cujo texto mudou são re-chunkadas e re-embedadas
+                pages = {}
+                iter_pages = SUPPORTED_EXTENSIONS[os.path.splitext(path)[1].lower()]
+                for page_no, text in iter_pages(path):
+                    key, digest = str(page_no), text_hash(text)
+                    if key in old_pages and old_pages[key]["hash"] == digest:
+                        pages[key] = old_pages[key]
+                        continue
+                    pages[key] = {"hash": digest, "rows": None}
+                    chunks = chunk_text(clean_text(text), config.CHUNK_SIZE)
+                    pending.append((pages[key], file_id, page_no, chunks))
+                    buffered += len(chunks)
+                    if buffered >= config.REGISTRY_ENCODE_BATCH:
+                        self._flush(manifest, pending)
+                        buffered = 0
+
+                files[rel_path] = {"id": file_id, "size": stat.st_size, "mtime": stat.st_mtime,
+                                   "sha256": sha, "pages": pages}
+
+            self._flush(manifest, pending)
+            if set(old_files) - set(files):
+                changed = True
+
+            manifest["files"] = files
+            if changed:
+                manifest["generation"] += 1
+            live = len(self._live_rows(manifest))
+            manifest["header"]["count"] = live
+            self._write_manifest(manifest)
+
+            old_segment = None
+            if manifest["rows"] - live > max(live, config.REGISTRY_COMPACT_MIN_DEAD):
+                old_segment = self._compact(manifest)
+
+            # Só a troca do manifest (e do snapshot) passa pelo lock
+            with self._lock:
+                self.manifest = manifest
+                if changed:
+                    self._snapshot = None
+            if old_segment is not None:
+                # Snapshots antigos mantêm o mmap válido mesmo com o arquivo removido
+                for kind in ("vectors", "texts", "rows"):
+                    os.remove(self._path(kind, old_segment))
+            return changed
+
+    def _compact(self, manifest: dict) -> int:
+        # Reescreve só as linhas vivas num novo segmento e grava o manifest; devolve o
+        # segmento antigo, removido depois da troca
+        texts, rows, vectors = self._open_data(manifest)
+        old_segment = manifest["segment"]
+        new_segment = old_segment + 1
+        row_count, text_bytes = 0, 0
+
+        with open(self._path("texts", new_segment), "wb") as f_texts, \
+                open(self._path("vectors", new_segment), "wb") as f_vectors, \
+                open(self._path("rows", new_segment), "wb") as f_rows:
+            for entry in manifest["files"].values():
+                for page in entry["pages"].values():
+                    start, end = page["rows"]
+                    page_rows = np.array(rows[start:end])
+                    for i, row in enumerate(page_rows):
+                        chunk = texts[int(row["text_start"]):int(row["text_end"])].tobytes()
+                        f_texts.write(chunk)
+                        page_rows[i]["text_start"], page_rows[i]["text_end"] = text_bytes, text_bytes + len(chunk)
+                        text_bytes += len(chunk)
+                    f_vectors.write(np.ascontiguousarray(vectors[start:end]).tobytes())
+                    f_rows.write(page_rows.tobytes())
+                    page["rows"] = [row_count, row_count + (end - start)]
+                    row_count += end - start
+
+        manifest.update(segment=new_segment, rows=row_count, text_bytes=text_bytes)
+        self._write_manifest(manifest)
+        return old_segment
+
+    def snapshot(self):
+        """(documents, index) com as linhas vivas; reconstruído só quando o corpus muda."""
+        with self._lock:
+            if self._snapshot is None:
+                texts, rows, vectors = self._open_data()
+                live = self._live_rows(self.manifest)
+                # Sem tombstones as linhas vivas são contíguas: usa o memmap direto, sem cópia
+                if len(live) == len(vectors):
+                    embeddings = vectors
+                else:
+                    embeddings = vectors[live]
+                file_names = {entry["id"]: rel_path for rel_path, entry in self.manifest["files"].items()}
+                documents = RegistryChunks(texts, rows, live, file_names, self.name, str(self.manifest["generation"]))
+                lexical = BM25Index.from_texts(doc["text"] for doc in documents) \
+                    if config.RETRIEVAL_MODE == "hybrid" else None
+                self._snapshot = (documents, build_index(embeddings, normalized=True, lexical=lexical))
+            return self._snapshot
+
+    def status(self) -> dict:
+        # Sem lock: o manifest nunca é alterado no lugar depois da troca em sync()
+        manifest = self.manifest
+        return {
+            "source_dir": self.source_dir,
+            "files": len(manifest["files"]),
+            "rows": manifest["rows"],
+            "live_rows": manifest["header"]["count"],
+            "generation": manifest["generation"],
+        }
@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app import config
+
+
+def encode_queries(texts):
+    if config.EMBEDDING_SERVER_SOCKET:
+        # Modelo carregado só no servidor de embeddings, compartilhado pelos workers
+        from app.services.embedding_client import get_client
+        return get_client().encode(texts)
+    from app.utils.text_processing import get_model
+    return get_model().encode(
+        texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True
+    )
+
+
+class EmbeddingBatcher:
+    """Agrupa perguntas concorrentes e codifica todas num único forward do modelo.
+
+    Uma thread dedicada pega o primeiro item da fila, espera até `max_wait` segundos
+    (ou `max_batch` itens) por outros e resolve o Future de cada um. Enquanto um lote
+    está no modelo, os próximos pedidos se acumulam na fila e formam o lote seguinte.
+    """
+
+    def __init__(self, encode=encode_queries, max_batch: int = 32, max_wait: float = 0.002):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = self.items = self.largest_batch = 0
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Pedidos cancelados (cliente desconectou) não entram no lote
+            batch = [(text, future) for text, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            # Textos repetidos no mesmo lote são codificados uma vez só
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.encode(unique)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            by_text = dict(zip(unique, embeddings))
+            for text, future in batch:
+                future.set_result(by_text[text])
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queued": self._queue.qsize(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+query_batcher = EmbeddingBatcher(
+    max_batch=config.QUERY_BATCH_MAX_SIZE,
+    max_wait=config.QUERY_BATCH_MAX_WAIT_MS / 1000,
+)
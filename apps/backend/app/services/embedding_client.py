@@ -0,0 +1,197 @@
+import json
+import queue
+import socket
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+from app import config
+
+# Protocolo do servidor de embeddings (socket Unix, uma requisição por vez por conexão):
+#   frame = FRAME (tamanho do JSON, tamanho do binário) + JSON + arrays numpy concatenados
+# O JSON descreve os arrays em "arrays": [{"dtype", "shape"}, ...], na ordem do binário.
+FRAME = struct.Struct("!II")
+
+
+class EmbeddingServerError(RuntimeError):
+    pass
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    buffer = bytearray(size)
+    view, received = memoryview(buffer), 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("conexão fechada pelo outro lado")
+        received += n
+    return bytes(buffer)
+
+
+def send_message(sock, header: dict, arrays=()):
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    header = {**header, "arrays": [{"dtype": array.dtype.str, "shape": list(array.shape)} for array in arrays]}
+    body = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    payload = b"".join(array.tobytes() for array in arrays)
+    sock.sendall(FRAME.pack(len(body), len(payload)) + body + payload)
+
+
+def recv_message(sock):
+    body_size, payload_size = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    header = json.loads(_recv_exact(sock, body_size))
+    payload = _recv_exact(sock, payload_size) if payload_size else b""
+    arrays, offset = [], 0
+    for spec in header.pop("arrays", []):
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays.append(np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(spec["shape"]))
+        offset += count * dtype.itemsize
+    return header, arrays
+
+
+def pack_hits(hits):
+    # Lista de (posições, scores) de tamanhos variáveis -> três arrays
+    lengths = np.array([len(ids) for ids, _ in hits], dtype=np.int64)
+    ids = np.concatenate([np.asarray(ids, dtype=np.int64) for ids, _ in hits]) if hits else np.empty(0, np.int64)
+    scores = np.concatenate([np.asarray(s, dtype=np.float32) for _, s in hits]) if hits else np.empty(0, np.float32)
+    return lengths, ids, scores
+
+
+def unpack_hits(lengths, ids, scores):
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [(ids[start:end], scores[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+class EmbeddingClient:
+    """Cliente thread-safe do servidor de embeddings, com um pool de conexões."""
+
+    def __init__(self, path: str, connections: int, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(connections)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        return sock
+
+    def call(self, op: str, arrays=(), **fields):
+        with self._slots:
+            try:
+                sock = self._idle.get_nowait()
+            except queue.Empty:
+                sock = self._connect()
+            try:
+                send_message(sock, {"op": op, **fields}, arrays)
+                header, result = recv_message(sock)
+            except BaseException:
+                sock.close()  # estado do stream desconhecido: não volta para o pool
+                raise
+            self._idle.put(sock)
+        if "exception" in header:
+            raise EmbeddingServerError(header["exception"])
+        return header, result
+
+    def encode(self, texts) -> np.ndarray:
+        return self.call("encode", texts=list(texts))[1][0]
+
+    def search(self, corpus: str, version: str, embeddings, k: int, texts=None):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        _, arrays = self.call("search", [embeddings], corpus=corpus, version=version, k=k, texts=texts)
+        return unpack_hits(*arrays)
+
+    def reconstruct(self, corpus: str, version: str, positions) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        return self.call("reconstruct", [positions], corpus=corpus, version=version)[1][0]
+
+    def documents(self, corpus: str, version: str, positions):
+        return self.call("documents", corpus=corpus, version=version, positions=[int(i) for i in positions])[0]["documents"]
+
+    def status(self) -> dict:
+        return self.call("status")[0]
+
+    def reindex(self, corpus: str) -> dict:
+        return self.call("reindex", corpus=corpus)[0]
+
+
+class RemoteIndex:
+    """Índice servido pelo servidor de embeddings (mesma interface dos índices locais)."""
+
+    def __init__(self, client: EmbeddingClient, corpus: str, version: str):
+        self.client = client
+        self.corpus = corpus
+        self.version = version
+
+    def search(self, query_embedding, k: int, query_text: str = None):
+        return self.search_batch(np.asarray(query_embedding)[None, :], k, [query_text])[0]
+
+    def search_batch(self, query_embeddings, k: int, query_texts=None):
+        return self.client.search(self.corpus, self.version, query_embeddings, k, query_texts)
+
+    def reconstruct(self, indices) -> np.ndarray:
+        return self.client.reconstruct(self.corpus, self.version, indices)
+
+
+class RemoteDocuments:
+    """Chunks de um corpus do servidor, buscados sob demanda e guardados num LRU."""
+
+    def __init__(self, client: EmbeddingClient, corpus: str, version: str, count: int,
+                 cache_size: int = config.REMOTE_DOCUMENT_CACHE):
+        self.client = client
+        self.corpus = corpus
+        self.version = version
+        self.count = count
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def prefetch(self, positions):
+        # Uma ida ao servidor para todos os chunks que ainda não estão no cache
+        with self._lock:
+            missing = sorted({int(i) for i in positions if 0 <= int(i) < self.count} - set(self._cache))
+        if not missing:
+            return
+        documents = self.client.documents(self.corpus, self.version, missing)
+        with self._lock:
+            for i, doc in zip(missing, documents):
+                self._cache[i] = doc
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        with self._lock:
+            doc = self._cache.get(i)
+            if doc is not None:
+                self._cache.move_to_end(i)
+                return doc
+        self.prefetch([i])
+        with self._lock:
+            doc = self._cache.get(i)
+        return doc if doc is not None else self.client.documents(self.corpus, self.version, [i])[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> EmbeddingClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = EmbeddingClient(config.EMBEDDING_SERVER_SOCKET, config.EMBEDDING_SERVER_CONNECTIONS,
+                                          config.EMBEDDING_SERVER_TIMEOUT)
+    return _client
@@ -0,0 +1,132 @@
+"""Servidor de embeddings e busca compartilhado pelos workers do uvicorn.
+
+Carrega o modelo e os índices uma única vez e atende os workers por um socket Unix.
+Pedidos de encode de uma pergunta só passam pelo EmbeddingBatcher, então perguntas
+de workers diferentes que chegam juntas viram um único forward do modelo.
+
+Uso (a partir de apps/backend):
+    python -m app.services.embedding_server --socket /tmp/rag-embeddings.sock
+    EMBEDDING_SERVER_SOCKET=/tmp/rag-embeddings.sock uvicorn app.main:app --workers 4
+"""
+import argparse
+import logging
+import os
+import socketserver
+import threading
+from collections import OrderedDict
+import numpy as np
+from app import config
+from app.services import corpora, query_service, tracing
+from app.services.embedding_batcher import encode_queries, query_batcher
+from app.services.embedding_client import pack_hits, recv_message, send_message
+
+logger = logging.getLogger("app.embedding_server")
+SNAPSHOT_HISTORY = 3  # versões antigas mantidas até os workers perceberem a troca do índice
+
+_snapshots = {}  # corpus -> OrderedDict(versão -> (documents, index))
+_snapshots_lock = threading.Lock()
+
+
+def _snapshot(corpus: str, version: str = None):
+    documents, index = corpora.get(corpus)
+    with _snapshots_lock:
+        history = _snapshots.setdefault(corpus, OrderedDict())
+        history[documents.version] = (documents, index)
+        history.move_to_end(documents.version)
+        while len(history) > SNAPSHOT_HISTORY:
+            history.popitem(last=False)
+        if version is None or version == documents.version:
+            return documents, index
+        if version not in history:
+            raise LookupError(f"versão {version} do corpus '{corpus}' não está mais disponível")
+        return history[version]
+
+
+def _versions() -> dict:
+    if not corpora.is_ready():
+        return {}
+    return {name: {"version": corpora.get(name)[0].version, "count": len(corpora.get(name)[0])}
+            for name in corpora.CORPORA}
+
+
+def _encode(texts):
+    if len(texts) == 1:
+        # Pergunta avulsa: entra no lote com as dos outros workers
+        return query_batcher.submit(texts[0]).result()[None, :]
+    return encode_queries(texts)
+
+
+def handle(request: dict, arrays):
+    """Executa uma operação do protocolo; devolve (header, arrays) da resposta."""
+    op = request["op"]
+    if op == "status":
+        return {**corpora.status(), "versions": _versions(), "query_batching": query_batcher.stats()}, []
+    if op == "encode":
+        return {}, [np.asarray(_encode(request["texts"]), dtype=np.float32)]
+
+    if not corpora.is_ready():
+        raise RuntimeError("Indexes are still loading.")
+    corpus = request["corpus"]
+    if op == "reindex":
+        return {"changed": corpora.reindex(corpus)}, []
+
+    documents, index = _snapshot(corpus, request.get("version"))
+    if op == "search":
+        embeddings = arrays[0]
+        texts = request.get("texts") or [""] * len(embeddings)
+        return {}, list(pack_hits(query_service.retrieve_batch(texts, index, request["k"], embeddings)))
+    if op == "reconstruct":
+        return {}, [np.asarray(index.reconstruct(arrays[0]), dtype=np.float32)]
+    if op == "documents":
+        return {"documents": [documents[i] for i in request["positions"]]}, []
+    raise ValueError(f"operação desconhecida: {op}")
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # Uma conexão por thread; o worker reaproveita a conexão para várias chamadas
+        while True:
+            try:
+                request, arrays = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                header, result = handle(request, arrays)
+            except Exception as e:
+                if not isinstance(e, (LookupError, RuntimeError)):
+                    logger.exception("Erro em %s", request.get("op"))
+                header, result = {"exception": f"{type(e).__name__}: {e}"}, []
+            send_message(self.request, header, result)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: str):
+    if os.path.exists(path):
+        os.remove(path)  # socket de uma execução anterior
+    server = EmbeddingServer(path, RequestHandler)
+    os.chmod(path, 0o660)
+    logger.warning("Servidor de embeddings ouvindo em %s", path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=config.EMBEDDING_SERVER_SOCKET or "/tmp/rag-embeddings.sock")
+    args = parser.parse_args()
+    # Este processo é o servidor: modelo e índices locais, mesmo com a variável de ambiente definida
+    config.EMBEDDING_SERVER_SOCKET = None
+    tracing.configure_logging()
+    corpora.start_background_loading()
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
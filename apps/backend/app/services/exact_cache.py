@@ -0,0 +1,104 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from app import config
+
+
+def normalize_text(text: str) -> str:
+    # Mesma pergunta com espaços/quebras diferentes vira a mesma chave.
+    # Não altera maiúsculas: nomes de campos e cartas são sensíveis a caixa.
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_key(route: str, text: str, model: str, temperature: float = None) -> str:
+    raw = json.dumps([route, normalize_text(text), model, temperature], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExactCache:
+    """LRU em memória, com uma camada opcional em SQLite (compartilhada entre
+    workers e reinícios). Valores da camada SQLite precisam ser serializáveis em JSON."""
+
+    def __init__(self, max_entries: int, ttl: float, sqlite_path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str):
+        # Retorna (valor, idade em segundos) ou None.
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], now - entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    value = json.loads(row[0])
+                    self._put(key, value, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value, now - row[1]
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._put(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now),
+                )
+                self._db.commit()
+
+    def _put(self, key: str, value, created_at: float):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Embeddings de perguntas repetidas (só memória: numpy não vai para o SQLite)
+embedding_cache = ExactCache(config.EMBEDDING_CACHE_MAX_ENTRIES, ttl=config.EMBEDDING_CACHE_TTL)
+
+# Respostas determinísticas do LLM (ex.: /text-to-mongo com temperature 0.0)
+response_cache = ExactCache(
+    config.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=config.RESPONSE_CACHE_TTL,
+    sqlite_path=config.RESPONSE_CACHE_SQLITE_PATH,
+)
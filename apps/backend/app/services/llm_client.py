@@ -0,0 +1,160 @@
+import asyncio
+import json
+import random
+import time
+import httpx
+from app import config
+from app.services import metrics, tracing
+
+# Cliente HTTP assíncrono compartilhado: um pool de conexões keep-alive para todos os
+# provedores, com limite de concorrência por provedor e retry com backoff.
+PROVIDERS = {
+    "groq": {
+        "url": config.GROQ_URL,
+        "headers": config.GROQ_HEADERS,
+        "max_concurrency": config.GROQ_MAX_CONCURRENCY,
+    },
+    "openai": {
+        "url": config.OPENAI_URL,
+        "headers": config.OPENAI_HEADERS,
+        "max_concurrency": config.OPENAI_MAX_CONCURRENCY,
+    },
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_client = None
+_semaphores = {}
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(config.LLM_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _semaphore(provider: str) -> asyncio.Semaphore:
+    if provider not in _semaphores:
+        _semaphores[provider] = asyncio.Semaphore(PROVIDERS[provider]["max_concurrency"])
+    return _semaphores[provider]
+
+
+def _backoff(attempt: int, retry_after=None) -> float:
+    # "Full jitter": espera aleatória entre 0 e base * 2^tentativa (limitada),
+    # respeitando o Retry-After do provedor quando houver.
+    delay = random.uniform(0, min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+def _record_usage(provider: str, usage):
+    # Tokens cobrados pelo provedor (campo "usage" da OpenAI/Groq)
+    if not usage:
+        return
+    prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    metrics.LLM_TOKENS.inc(prompt, provider=provider, kind="prompt")
+    metrics.LLM_TOKENS.inc(completion, provider=provider, kind="completion")
+    tracing.annotate(provider=provider, prompt_tokens=prompt, completion_tokens=completion)
+
+
+async def chat_completion(provider: str, payload: dict) -> dict:
+    settings = PROVIDERS[provider]
+    client = get_client()
+
+    with tracing.stage("llm"):
+        for attempt in range(config.LLM_MAX_RETRIES + 1):
+            retry_after = None
+            async with _semaphore(provider):
+                metrics.LLM_IN_FLIGHT.inc(provider=provider)
+                try:
+                    response = await client.post(settings["url"], headers=settings["headers"], json=payload)
+                except httpx.TransportError:
+                    metrics.LLM_REQUESTS.inc(provider=provider, outcome="transport_error")
+                    if attempt == config.LLM_MAX_RETRIES:
+                        raise
+                else:
+                    metrics.LLM_REQUESTS.inc(provider=provider, outcome=str(response.status_code))
+                    if response.status_code not in RETRY_STATUS or attempt == config.LLM_MAX_RETRIES:
+                        response.raise_for_status()
+                        data = response.json()
+                        _record_usage(provider, data.get("usage"))
+                        tracing.annotate(llm_attempts=attempt + 1)
+                        return data
+                    retry_after = response.headers.get("Retry-After")
+                finally:
+                    metrics.LLM_IN_FLIGHT.dec(provider=provider)
+
+            # Espera fora do semáforo para não segurar a vaga durante o backoff
+            await asyncio.sleep(_backoff(attempt, retry_after))
+
+
+async def stream_chat_completion(provider: str, payload: dict):
+    # Gera os deltas de texto do provedor (stream: true, formato SSE da OpenAI).
+    # O retry só acontece antes do primeiro byte; depois disso o erro sobe para o cliente.
+    settings = PROVIDERS[provider]
+    client = get_client()
+    # include_usage: o último chunk traz o "usage" (a Groq manda também em x_groq.usage)
+    payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+    started = False
+    start = time.perf_counter()
+
+    try:
+        for attempt in range(config.LLM_MAX_RETRIES + 1):
+            retry_after = None
+            async with _semaphore(provider):
+                metrics.LLM_IN_FLIGHT.inc(provider=provider)
+                try:
+                    async with client.stream("POST", settings["url"], headers=settings["headers"], json=payload) as response:
+                        metrics.LLM_REQUESTS.inc(provider=provider, outcome=str(response.status_code))
+                        if response.status_code in RETRY_STATUS and attempt < config.LLM_MAX_RETRIES:
+                            retry_after = response.headers.get("Retry-After")
+                        else:
+                            if response.is_error:
+                                await response.aread()
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    return
+                                chunk = json.loads(data)
+                                _record_usage(provider, chunk.get("usage") or chunk.get("x_groq", {}).get("usage"))
+                                choices = chunk.get("choices") or [{}]
+                                delta = choices[0].get("delta", {}).get("content")
+                                if delta:
+                                    if not started:
+                                        started = True
+                                        ttft = time.perf_counter() - start
+                                        metrics.LLM_TTFT.observe(ttft, provider=provider)
+                                        tracing.record("ttft", ttft)
+                                    yield delta
+                            return
+                except httpx.TransportError:
+                    metrics.LLM_REQUESTS.inc(provider=provider, outcome="transport_error")
+                    if started or attempt == config.LLM_MAX_RETRIES:
+                        raise
+                finally:
+                    metrics.LLM_IN_FLIGHT.dec(provider=provider)
+
+            await asyncio.sleep(_backoff(attempt, retry_after))
+    finally:
+        tracing.record("llm", time.perf_counter() - start)
@@ -0,0 +1,143 @@
+import bisect
+import math
+import threading
+
+# Métricas no formato texto do Prometheus (exposto em /metrics), sem dependências:
+# contadores, gauges e histogramas com labels, mais métricas calculadas na leitura.
+_registry = []
+_lock = threading.Lock()
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self):
+        with _lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # contagens, soma, total
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with _lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _format_labels(self.labels, key, [("le", _format_value(bound))]), cumulative
+            yield f"{self.name}_bucket", _format_labels(self.labels, key, [("le", "+Inf")]), count
+            yield f"{self.name}_sum", _format_labels(self.labels, key), total
+            yield f"{self.name}_count", _format_labels(self.labels, key), count
+
+
+class Callback(_Metric):
+    """Valores calculados na hora da leitura (ex.: estatísticas dos caches).
+    `collect` devolve {(valores dos labels): valor}."""
+
+    def __init__(self, name: str, help: str, collect, labels=(), kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect().items():
+            yield self.name, _format_labels(self.labels, key), value
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline RAG
+HTTP_REQUESTS = Counter("rag_http_requests_total", "Requisições HTTP atendidas.", ("route", "method", "status"))
+HTTP_LATENCY = Histogram("rag_http_request_seconds", "Latência total das requisições HTTP.", ("route",))
+HTTP_CACHE = Counter("rag_http_cache_total", "Resultado do cache de respostas (header X-Cache) por rota.",
+                     ("route", "result"))
+STAGE_LATENCY = Histogram("rag_stage_seconds", "Latência de cada etapa do pipeline (encode, retrieve, prompt, llm).",
+                          ("route", "stage"))
+LLM_TTFT = Histogram("rag_llm_time_to_first_token_seconds", "Tempo até o primeiro token no modo stream.",
+                     ("provider",))
+LLM_IN_FLIGHT = Gauge("rag_llm_in_flight_requests", "Chamadas ao provedor de LLM em andamento.", ("provider",))
+LLM_REQUESTS = Counter("rag_llm_requests_total", "Tentativas de chamada ao provedor de LLM.", ("provider", "outcome"))
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens informados no campo usage das respostas do provedor.",
+                     ("provider", "kind"))
@@ -0,0 +1,479 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from app import config
+from app.services import metrics
+from app.services.exact_cache import normalize_text
+
+# Tradução local de /text-to-mongo, antes do LLM:
+#   1. regras: comparações, intervalos de datas, in/nin, sort e limit viram a query direto
+#   2. templates: respostas do LLM viram moldes parametrizados; a mesma pergunta com
+#      outros números/datas/strings é respondida localmente
+# E a saída do LLM passa por um validador (JSON + operadores conhecidos, só leitura).
+
+REFUSAL = "Unable to generate a valid MongoDB query from the input."
+TRANSLATIONS = metrics.Counter("rag_mongo_translations_total",
+                               "Origem das respostas de /text-to-mongo: rule, template, llm, invalid.", ("source",))
+
+FIELD = r"[A-Za-z_][\w.]*"
+DATE = r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?Z?)?"
+NUMBER = r"-?\d+(?:\.\d+)?"
+QUOTED = r"\"[^\"]*\"|'[^']*'"
+KEYWORDS = {
+    "and", "or", "not", "is", "in", "where", "with", "whose", "having", "sorted", "sort", "order", "ordered",
+    "by", "limit", "limited", "between", "after", "before", "since", "until", "than", "to", "of", "the", "all",
+    "exists", "contains", "starts", "ends", "equal", "equals", "greater", "less", "more", "above", "below",
+    "over", "under", "least", "most", "one", "asc", "desc", "ascending", "descending", "first", "top",
+}
+BAREWORD = r"[A-Za-z_][\w\-]*"
+VALUE = rf"(?:{DATE}|{NUMBER}(?![\w-])|{QUOTED}|{BAREWORD})"
+
+WORD_OPERATORS = [
+    ("greater than or equal to", "$gte"), ("less than or equal to", "$lte"), ("not equal to", "$ne"),
+    ("greater than", "$gt"), ("more than", "$gt"), ("at least", "$gte"), ("at most", "$lte"),
+    ("less than", "$lt"), ("equal to", "$eq"), ("equals", "$eq"), ("is not", "$ne"), ("not", "$ne"),
+    ("above", "$gt"), ("over", "$gt"), ("after", "$gt"), ("since", "$gte"),
+    ("below", "$lt"), ("under", "$lt"), ("before", "$lt"), ("until", "$lte"),
+]
+SYMBOL_OPERATORS = {">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte", "!=": "$ne", "=": "$eq", "==": "$eq"}
+
+CONDITION_PATTERNS = [
+    ("between", re.compile(rf"({FIELD})\s+(?:is\s+)?(?:between|from)\s+({VALUE})\s+(?:and|to)\s+({VALUE})", re.I)),
+    ("in", re.compile(rf"({FIELD})\s+(?:is\s+)?(not\s+in|in|not\s+one\s+of|one\s+of)\s*[\(\[]([^\)\]]*)[\)\]]", re.I)),
+    ("exists", re.compile(rf"({FIELD})\s+(exists|is\s+set|does\s+not\s+exist|is\s+missing)\b", re.I)),
+    ("text", re.compile(rf"({FIELD})\s+(contains|starts\s+with|ends\s+with)\s+({QUOTED}|{BAREWORD})", re.I)),
+    ("symbol", re.compile(rf"({FIELD})\s*(>=|<=|!=|==|=|>|<)\s*({VALUE})", re.I)),
+    ("word", re.compile(
+        rf"({FIELD})\s+(?:is\s+)?({'|'.join(re.escape(w) for w, _ in WORD_OPERATORS)})\s+({VALUE})", re.I)),
+    ("is", re.compile(rf"({FIELD})\s+is\s+({VALUE})", re.I)),
+]
+SEPARATOR = re.compile(r"\s*(?:,\s*(?:and\s+)?|\s+and\s+)", re.I)
+# Intervalo de datas sem campo ("amount > 100 after 2024-01-01"): vai para config.MONGO_DATE_FIELD
+DATE_RANGE = re.compile(
+    rf"\s*(?:(between|from)\s+({DATE})\s+(?:and|to|until)\s+({DATE})|(after|before|since|until)\s+({DATE}))(?![\w-])",
+    re.I)
+
+HEAD = re.compile(
+    rf"^(?:(find|get|list|show|return|fetch|select|count)\s+)?(?:(?:all|the)\s+)?(?:(?:top|first)\s+(\d+)\s+)?"
+    rf"({BAREWORD})(?:\s+(?:(?:where|with|whose|having|that\s+have|which\s+have|that\s+has)\s+"
+    rf"|(?=(?:after|before|since|until|between|from)\s+\d))(.+?))?$", re.I)
+SORT = re.compile(rf"\s*,?\s*\b(?:sorted|sort|order|ordered)\s+by\s+({FIELD})(?:\s+(asc|ascending|desc|descending))?", re.I)
+LIMIT = re.compile(r"\s*,?\s*\b(?:limit(?:ed)?(?:\s+to)?|first|top)\s+(\d+)\s*(?:results|documents|rows|records)?\s*$", re.I)
+
+
+def _value(raw: str):
+    if re.fullmatch(DATE, raw):
+        date = raw.replace(" ", "T")
+        if "T" not in date:
+            date += "T00:00:00Z"
+        elif not date.endswith("Z"):
+            date += ":00Z" if date.count(":") == 1 else "Z"
+        return {"$date": date}
+    if re.fullmatch(NUMBER, raw):
+        return float(raw) if "." in raw else int(raw)
+    if raw[0] in "\"'":
+        return raw[1:-1]
+    lowered = raw.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    if lowered in KEYWORDS:
+        raise ValueError(raw)
+    return raw
+
+
+def _condition(kind: str, match):
+    if kind == "date":
+        if match.group(1):
+            return config.MONGO_DATE_FIELD, {"$gte": _value(match.group(2)), "$lte": _value(match.group(3))}
+        return config.MONGO_DATE_FIELD, {dict(WORD_OPERATORS)[match.group(4).lower()]: _value(match.group(5))}
+    field = match.group(1)
+    if field.lower() in KEYWORDS:
+        raise ValueError(field)
+    if kind == "between":
+        return field, {"$gte": _value(match.group(2)), "$lte": _value(match.group(3))}
+    if kind == "in":
+        items = [item.strip() for item in match.group(3).split(",") if item.strip()]
+        operator = "$nin" if match.group(2).lower().startswith("not") else "$in"
+        return field, {operator: [_value(item) for item in items]}
+    if kind == "exists":
+        return field, {"$exists": match.group(2).lower() in ("exists", "is set")}
+    if kind == "text":
+        raw = match.group(3)
+        text = re.escape(raw[1:-1] if raw[0] in "\"'" else raw)
+        mode = match.group(2).lower().split()[0]
+        pattern = {"contains": text, "starts": f"^{text}", "ends": f"{text}$"}[mode]
+        return field, {"$regex": pattern, "$options": "i"}
+    if kind == "symbol":
+        return field, {SYMBOL_OPERATORS[match.group(2)]: _value(match.group(3))}
+    if kind == "word":
+        operator = dict(WORD_OPERATORS)[re.sub(r"\s+", " ", match.group(2).lower())]
+        return field, {operator: _value(match.group(3))}
+    return field, {"$eq": _value(match.group(2))}
+
+
+def _ends_condition(text: str, end: int) -> bool:
+    # Fim do texto, separador ou um intervalo de datas sem campo logo em seguida
+    if end == len(text) or SEPARATOR.match(text, end):
+        return True
+    return bool(config.MONGO_DATE_FIELD) and text[end].isspace() and DATE_RANGE.match(text, end) is not None
+
+
+def _match_condition(text: str, position: int):
+    for kind, pattern in CONDITION_PATTERNS:
+        match = pattern.match(text, position)
+        if match and _ends_condition(text, match.end()):
+            return kind, match
+    match = DATE_RANGE.match(text, position) if config.MONGO_DATE_FIELD else None
+    if match and _ends_condition(text, match.end()):
+        return "date", match
+    raise ValueError(text[position:])
+
+
+def _parse_conditions(text: str) -> dict:
+    query, position = {}, 0
+    while position < len(text):
+        kind, match = _match_condition(text, position)
+        field, operators = _condition(kind, match)
+        current = query.setdefault(field, {})
+        if set(current) & set(operators) or ("$eq" in current) != ("$eq" in operators) and current:
+            raise ValueError(field)  # mesma comparação duas vezes ou igualdade + intervalo
+        current.update(operators)
+        position = match.end()
+        separator = SEPARATOR.match(text, position)
+        if separator:
+            position = separator.end()
+    return {field: ops["$eq"] if list(ops) == ["$eq"] else ops for field, ops in query.items()}
+
+
+def _render(collection: str, query: dict, sort=None, limit=None, count=False) -> str:
+    if count:
+        return f"db.{collection}.countDocuments({json.dumps(query, ensure_ascii=False)})"
+    rendered = f"db.{collection}.find({json.dumps(query, ensure_ascii=False)})"
+    if sort:
+        rendered += f".sort({json.dumps(sort)})"
+    if limit:
+        rendered += f".limit({limit})"
+    return rendered
+
+
+def parse_rules(question: str):
+    """Tradução por regras; None quando qualquer parte da pergunta não for reconhecida
+    (nesse caso o LLM decide: as regras nunca chutam nomes de campos)."""
+    text = normalize_text(question).rstrip(" ?.!")
+    if re.search(r"\bor\b", text, re.I):
+        return None
+    sort = limit = None
+    sort_match = SORT.search(text)
+    if sort_match:
+        direction = (sort_match.group(2) or "asc").lower()
+        sort = {sort_match.group(1): -1 if direction.startswith("desc") else 1}
+        text = text[:sort_match.start()] + text[sort_match.end():]
+    limit_match = LIMIT.search(text)
+    if limit_match:
+        limit = int(limit_match.group(1))
+        text = text[:limit_match.start()]
+
+    head = HEAD.match(text.strip())
+    if not head or not head.group(4) or head.group(3).lower() in KEYWORDS:
+        return None
+    verb, top, collection, conditions = head.groups()
+    try:
+        query = _parse_conditions(conditions.strip())
+    except ValueError:
+        return None
+    if top:
+        if limit:
+            return None
+        limit = int(top)
+    count = (verb or "").lower() == "count"
+    if count and (sort or limit):
+        return None
+    return _render(collection, query, sort, limit, count)
+
+
+# --- Templates aprendidos das respostas do LLM ---
+
+LITERAL = re.compile(rf"({QUOTED})|({DATE})|({NUMBER})(?![\w-])")
+# Número/data que sobra na resposta fora das lacunas (ex.: o ano seguinte num intervalo
+# "de 2023" -> $lt 2024-01-01): é derivado da pergunta e ficaria fixo no molde
+STRAY_LITERAL = re.compile(rf"(?<![\w.$]){DATE}|(?<![\w.$\-]){NUMBER}(?![\w])")
+STRUCTURAL = re.compile(r":\s*-?[01](?![\w.])")  # direção do sort, flags de projeção/$exists
+TIME_SUFFIX = re.compile(r"^T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?Z?")  # hora depois de uma data da pergunta
+
+
+def _literals(question: str):
+    # (esqueleto da pergunta com os literais trocados por marcadores, literais encontrados).
+    # O esqueleto vai para minúsculas (casa sem diferenciar caixa); os literais mantêm
+    # o texto original: "Mary Smith" continua "Mary Smith" na query.
+    literals = []
+
+    def replace(match):
+        quoted, date, number = match.groups()
+        if quoted:
+            literals.append(("str", quoted[1:-1]))
+            return "<str>"
+        literals.append(("date", date) if date else ("num", number))
+        return "<date>" if date else "<num>"
+
+    skeleton = LITERAL.sub(replace, normalize_text(question)).lower()
+    return skeleton, literals
+
+
+def _occurrences(answer: str, kind: str, value: str):
+    if kind == "num":
+        pattern = rf"(?<![\w.\-]){re.escape(value)}(?![\w.\-])"
+    elif kind == "date":
+        pattern = re.escape(value)
+    else:
+        pattern = re.escape(json.dumps(value, ensure_ascii=False)[1:-1])
+    return [m.span() for m in re.finditer(pattern, answer)]
+
+
+class TemplateStore:
+    """Moldes "esqueleto da pergunta -> resposta com lacunas", em LRU."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._templates = OrderedDict()  # esqueleto -> (partes fixas, (tipo, posição do literal) por lacuna)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def learn(self, question: str, answer: str) -> bool:
+        skeleton, literals = _literals(question)
+        if not literals or len({value for _, value in literals}) != len(literals):
+            return False
+        # Cada literal precisa aparecer exatamente uma vez na resposta; senão não dá
+        # para saber qual trecho da resposta veio de qual parte da pergunta
+        spans = []
+        for position, (kind, value) in enumerate(literals):
+            found = _occurrences(answer, kind, value)
+            if len(found) != 1:
+                return False
+            spans.append((found[0], kind, position))
+        spans.sort()
+        parts, slots, cursor = [], [], 0
+        for (start, end), kind, position in spans:
+            if start < cursor:
+                return False
+            parts.append(answer[cursor:start])
+            slots.append((kind, position))
+            cursor = end
+        parts.append(answer[cursor:])
+        # Todo número/data da resposta precisa vir de uma lacuna
+        for index, part in enumerate(parts):
+            if index and slots[index - 1][0] == "date":
+                part = TIME_SUFFIX.sub("", part, count=1)
+            if STRAY_LITERAL.search(STRUCTURAL.sub(":", part)):
+                return False
+        with self._lock:
+            self._templates[skeleton] = (parts, slots)
+            self._templates.move_to_end(skeleton)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+        return True
+
+    def apply(self, question: str):
+        skeleton, literals = _literals(question)
+        with self._lock:
+            template = self._templates.get(skeleton)
+            if template is not None:
+                self._templates.move_to_end(skeleton)
+        if template is None:
+            return None
+        parts, slots = template
+        pieces = [parts[0]]
+        for (kind, position), part in zip(slots, parts[1:]):
+            value = literals[position][1]
+            pieces.append(json.dumps(value, ensure_ascii=False)[1:-1] if kind == "str" else value)
+            pieces.append(part)
+        return "".join(pieces)
+
+
+# --- Validação da saída do LLM ---
+
+READ_METHODS = {"find", "findOne", "aggregate", "countDocuments", "count", "distinct", "estimatedDocumentCount"}
+CURSOR_METHODS = {"sort", "limit", "skip", "project", "count"}
+OPERATORS = {
+    # consulta
+    "$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$and", "$or", "$nor", "$not", "$exists",
+    "$type", "$regex", "$options", "$elemMatch", "$size", "$all", "$expr", "$mod", "$text", "$search",
+    "$geoWithin", "$near", "$date", "$oid", "$numberDecimal", "$numberLong",
+    # agregação
+    "$match", "$group", "$project", "$sort", "$limit", "$skip", "$unwind", "$lookup", "$count", "$addFields",
+    "$set", "$unset", "$facet", "$bucket", "$sortByCount", "$replaceRoot", "$sample",
+    "$sum", "$avg", "$min", "$max", "$first", "$last", "$push", "$addToSet", "$multiply", "$divide",
+    "$add", "$subtract", "$cond", "$ifNull", "$concat", "$toLower", "$toUpper", "$substr", "$dateToString",
+    "$year", "$month", "$dayOfMonth", "$dayOfWeek", "$hour", "$round", "$abs", "$size", "$arrayElemAt",
+    "$filter", "$map", "$dateFromString", "$toDate", "$toString", "$toInt", "$literal",
+}
+# Executam JavaScript no servidor: recusados mesmo dentro de $expr
+FORBIDDEN_OPERATORS = {"$where", "$function", "$accumulator"}
+SHELL_CALL = re.compile(r"^db\.([\w$]+)\.(\w+)\(")
+CHAINED = re.compile(r"\s*\.(\w+)\(")
+
+
+# Datas em JS que o LLM costuma escrever: new Date("2024-01-01"), ISODate(...),
+# new Date(Date.now() - 30*24*60*60*1000), new Date(new Date().setDate(new Date().getDate() - 7))
+DATE_CALL = re.compile(r"(?<![\w.$])(?:new\s+)?(?:ISODate|Date)\s*\(")
+DATE_LITERAL = re.compile(r"(?:new\s+)?(?:ISODate|Date)\(\s*[\"']([^\"']*)[\"']\s*\)")
+DATE_METHODS = {
+    "now", "getTime", "valueOf", "toISOString", "getDate", "setDate", "getMonth", "setMonth", "getFullYear",
+    "setFullYear", "getHours", "setHours", "getMinutes", "setMinutes", "getUTCDate", "setUTCDate",
+    "getUTCMonth", "setUTCMonth", "getUTCFullYear", "setUTCFullYear", "getUTCHours", "setUTCHours",
+}
+DATE_TOKEN = re.compile(r"\s*(?:\d+(?:\.\d+)?|\"[^\"]*\"|'[^']*'|[-+*/%(),]|new\b|ISODate\b|Date\b|\.(\w+))")
+
+
+def _closing(text: str, start: int) -> int:
+    # Posição logo depois do ")" que fecha o "(" aberto antes de `start`
+    depth, quote = 1, None
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if char == quote and text[i - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    raise ValueError("parênteses desbalanceados")
+
+
+def _date_expressions(text: str) -> str:
+    # new Date(...)/ISODate(...) -> {"$date": ...}. Dentro só números, strings, aritmética
+    # e métodos de data: qualquer outro JavaScript é recusado
+    pieces, position = [], 0
+    while (match := DATE_CALL.search(text, position)) is not None:
+        end = _closing(text, match.end())
+        while (method := re.match(r"\.(\w+)\(", text[end:])) and method.group(1) in DATE_METHODS:
+            end = _closing(text, end + method.end())
+        expression = text[match.start():end]
+        cursor = 0
+        while cursor < len(expression):
+            token = DATE_TOKEN.match(expression, cursor)
+            if not token or token.end() == cursor or (token.group(1) and token.group(1) not in DATE_METHODS):
+                raise ValueError(f"expressão de data não permitida: {expression}")
+            cursor = token.end()
+        literal = DATE_LITERAL.fullmatch(expression)
+        pieces += [text[position:match.start()], json.dumps({"$date": literal.group(1) if literal else expression.replace("'", '"')})]
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def _relaxed_json(text: str):
+    # Sintaxe do shell do Mongo -> JSON: chaves sem aspas, aspas simples, ObjectId
+    # (datas já convertidas por _date_expressions)
+    text = re.sub(r"ObjectId\(\s*[\"']([0-9a-fA-F]{24})[\"']\s*\)", r'{"$oid": "\1"}', text)
+    text = re.sub(r"(?<=[:\[,\s])/((?:[^/\\\n]|\\.)+)/([imxs]*)",
+                  lambda m: json.dumps({"$regex": m.group(1), "$options": m.group(2)}), text)
+    text = re.sub(r"'((?:[^'\\]|\\.)*)'", lambda m: json.dumps(m.group(1)), text)
+    text = re.sub(r"([\{,]\s*)([$A-Za-z_][\w.$]*)\s*:", r'\1"\2":', text)
+    return json.loads(f"[{text}]") if text.strip() else []
+
+
+def _check_operators(value):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise ValueError(f"operador não permitido: {key}")
+            if key.startswith("$") and key not in OPERATORS:
+                raise ValueError(f"operador desconhecido: {key}")
+            _check_operators(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_operators(item)
+
+
+def validate(output: str):
+    """(ok, motivo). Aceita JSON puro ou uma chamada de leitura do shell (db.x.find(...)...),
+    com argumentos JSON válidos e só operadores conhecidos."""
+    text = re.sub(r"^```\w*\s*|\s*```$", "", output.strip())
+    if text.strip("\"' ") == REFUSAL:
+        return True, "refusal"
+    try:
+        if text[:1] in "{[":
+            try:
+                document = json.loads(text)
+            except ValueError:
+                document = _relaxed_json(_date_expressions(text))
+            _check_operators(document)
+            return True, "json"
+        text = _date_expressions(text)
+        call = SHELL_CALL.match(text)
+        if not call:
+            return False, "formato não reconhecido"
+        method = call.group(2)
+        if method not in READ_METHODS:
+            return False, f"método não permitido: {method}"
+        # Percorre db.x.find(...).sort(...).limit(...) chamada a chamada (parênteses
+        # dentro de strings não contam)
+        name, position = method, call.end()
+        while True:
+            end = _closing(text, position)
+            if name != method and name not in CURSOR_METHODS:
+                return False, f"método não permitido: {name}"
+            _check_operators(_relaxed_json(text[position:end - 1]))
+            chained = CHAINED.match(text, end)
+            if not chained:
+                break
+            name, position = chained.group(1), chained.end()
+        if text[end:].strip() not in ("", ";"):
+            return False, "formato não reconhecido"
+        return True, "shell"
+    except ValueError as e:  # json.JSONDecodeError é subclasse de ValueError
+        return False, str(e)
+
+
+class MongoTranslator:
+    def __init__(self, max_templates: int):
+        self.templates = TemplateStore(max_templates)
+        self.counts = {"rule": 0, "template": 0, "llm": 0, "invalid": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, source: str):
+        with self._lock:
+            self.counts[source] += 1
+        TRANSLATIONS.inc(source=source)
+
+    def translate_local(self, question: str):
+        # (query, "rule" | "template") ou None
+        query = parse_rules(question)
+        if query is not None:
+            self._count("rule")
+            return query, "rule"
+        query = self.templates.apply(question)
+        if query is not None and validate(query)[0]:
+            self._count("template")
+            return query, "template"
+        return None
+
+    def accept_llm(self, question: str, answer: str):
+        # Valida a resposta do LLM; se for válida, aprende o molde. Retorna (ok, motivo).
+        ok, reason = validate(answer)
+        if not ok:
+            self._count("invalid")
+            return False, reason
+        self._count("llm")
+        if reason != "refusal":
+            self.templates.learn(question, answer)
+        return True, reason
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        local = counts["rule"] + counts["template"]
+        total = local + counts["llm"] + counts["invalid"]
+        return {**counts, "templates": len(self.templates), "local_hit_rate": local / total if total else 0.0}
+
+
+mongo_translator = MongoTranslator(config.MONGO_TEMPLATE_MAX_ENTRIES)
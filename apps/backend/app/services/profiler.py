@@ -0,0 +1,237 @@
+import cProfile
+import hmac
+import html
+import io
+import itertools
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from app import config
+from app.services import tracing
+
+# Profiling em produção, sob demanda (rotas em /admin):
+#   - amostragem estatística: a cada intervalo lê a pilha de todas as threads
+#     (sys._current_frames), sem instrumentar nada; o custo é proporcional à frequência
+#   - cProfile de uma requisição específica, pedido pelo header X-Profile, guardado
+#     num ring buffer para download depois
+
+# Folhas de threads paradas esperando algo, fora do perfil por padrão: só as esperas
+# conhecidas da biblioteca padrão, por (arquivo relativo à stdlib, função). Nomes
+# genéricos sozinhos ("get", "read") esconderiam trabalho de verdade (ex.: ExactCache.get).
+STDLIB_DIR = os.path.dirname(threading.__file__)
+IDLE_FRAMES = {
+    ("threading.py", "wait"),  # Event/Condition: filas, futures, batcher
+    ("threading.py", "_wait_for_tstate_lock"),  # Thread.join
+    ("selectors.py", "select"),  # event loop do asyncio, socketserver
+    (os.path.join("concurrent", "futures", "thread.py"), "_worker"),  # thread ociosa do pool
+    (os.path.join("multiprocessing", "connection.py"), "_recv"),  # Pipe dos shards
+    (os.path.join("multiprocessing", "connection.py"), "_poll"),
+    ("socket.py", "accept"),
+    ("socket.py", "readinto"),
+    ("ssl.py", "read"),
+}
+
+_sampling = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _is_idle(frame) -> bool:
+    filename = frame.f_code.co_filename
+    if not filename.startswith(STDLIB_DIR + os.sep):
+        return False
+    return (filename[len(STDLIB_DIR) + 1:], frame.f_code.co_name) in IDLE_FRAMES
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(seconds: float, interval: float, include_idle: bool = False) -> Counter:
+    """Pilhas colapsadas ("thread;raiz;...;folha" -> nº de amostras) de todas as threads."""
+    if not _sampling.acquire(blocking=False):
+        raise ProfilerBusy("Já existe uma amostragem em andamento.")
+    try:
+        me = threading.get_ident()
+        counts = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if not include_idle and _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+        return counts
+    finally:
+        _sampling.release()
+
+
+def collapsed(counts: Counter) -> str:
+    # Formato do flamegraph.pl / speedscope: "a;b;c 42" por linha
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+def _color(name: str) -> str:
+    h = zlib.crc32(name.encode("utf-8"))
+    return f"rgb({205 + h % 50},{(h >> 8) % 180},{(h >> 16) % 55})"
+
+
+def flamegraph_svg(counts: Counter, title: str, width: int = 1200, row_height: int = 16) -> str:
+    """Flame graph em SVG: largura de cada caixa proporcional às amostras naquela pilha."""
+    root = {"children": {}, "value": 0}
+    depth = 0
+    for stack, count in counts.items():
+        node = root
+        node["value"] += count
+        frames = stack.split(";")
+        depth = max(depth, len(frames))
+        for name in frames:
+            node = node["children"].setdefault(name, {"children": {}, "value": 0})
+            node["value"] += count
+
+    total = root["value"] or 1
+    height = (depth + 2) * row_height + 24
+    boxes = []
+
+    def layout(node, x: float, level: int):
+        for name, child in sorted(node["children"].items()):
+            w = child["value"] / total * width
+            if w >= 0.5:  # caixas menores que meio pixel não aparecem
+                y = height - (level + 1) * row_height - 4
+                label = name if len(name) * 7 < w else name[:max(0, int(w / 7) - 2)] + ".." if w > 21 else ""
+                boxes.append(
+                    f'<g><title>{html.escape(name)} ({child["value"]} amostras, {child["value"] / total:.1%})</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" fill="{_color(name)}"/>'
+                    f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{html.escape(label)}</text></g>'
+                )
+                layout(child, x, level + 1)
+            x += w
+
+    layout(root, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">'
+        f'<rect width="100%" height="100%" fill="#fff"/>'
+        f'<text x="{width / 2}" y="16" text-anchor="middle" font-size="14">{html.escape(title)}</text>'
+        + "".join(boxes) + "</svg>"
+    )
+
+
+class ProfileStore:
+    """Ring buffer com os últimos perfis (cProfile) de requisições."""
+
+    def __init__(self, size: int):
+        self._profiles = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def reserve_id(self) -> int:
+        # O id sai antes do perfil terminar, para ir no header da resposta
+        return next(self._ids)
+
+    def add(self, profile_id: int, profile: cProfile.Profile, **info):
+        profile.create_stats()
+        entry = {"id": profile_id, "created_at": round(time.time(), 3), **info,
+                 "stats": marshal.dumps(profile.stats)}
+        with self._lock:
+            self._profiles.append(entry)
+
+    def list(self):
+        with self._lock:
+            return [{k: v for k, v in entry.items() if k != "stats"} for entry in self._profiles]
+
+    def get(self, profile_id: int):
+        with self._lock:
+            return next((entry for entry in self._profiles if entry["id"] == profile_id), None)
+
+    @staticmethod
+    def report(entry: dict, sort: str = "cumulative", limit: int = 50) -> str:
+        stats = pstats.Stats(_MarshalledStats(entry["stats"]), stream=io.StringIO())
+        stats.sort_stats(sort).print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _MarshalledStats:
+    # pstats.Stats aceita qualquer objeto com create_stats() + stats
+    def __init__(self, data: bytes):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+profiles = ProfileStore(config.PROFILE_RING_SIZE)
+_request_profiling = threading.Lock()  # um cProfile por vez (sys.setprofile é único por thread)
+
+
+def is_admin(token) -> bool:
+    return bool(config.ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, config.ADMIN_TOKEN)
+
+
+class ProfileMiddleware:
+    """Middleware ASGI: com "X-Profile: 1" e o token de admin, roda a requisição sob cProfile
+    e devolve o id do perfil no header X-Profile-ID (GET /admin/profiles/{id}).
+    O cProfile mede a thread do event loop durante a requisição inteira, então inclui o
+    que outras requisições executaram nela no mesmo período; o que roda em threads
+    (encode, busca) aparece como espera."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") not in (b"1", b"true") or \
+                not is_admin(headers.get(b"x-admin-token", b"").decode("latin-1") or None):
+            return await self.app(scope, receive, send)
+
+        if not _request_profiling.acquire(blocking=False):
+            return await self.app(scope, receive, _with_header(send, b"x-profile", b"busy"))
+        profile_id = profiles.reserve_id()
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers") or [])
+                           + [(b"x-profile-id", str(profile_id).encode())]}
+            await send(message)
+
+        profile = cProfile.Profile()
+        trace = tracing.current()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.disable()
+            _request_profiling.release()
+            profiles.add(profile_id, profile, method=scope["method"], path=scope["path"], status=status,
+                         request_id=trace.request_id if trace else None,
+                         duration_ms=round((time.perf_counter() - start) * 1000, 2))
+
+
+def _with_header(send, name: bytes, value: bytes):
+    async def wrapper(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": list(message.get("headers") or []) + [(name, value)]}
+        await send(message)
+    return wrapper
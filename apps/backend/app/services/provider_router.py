@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+from collections import deque
+import numpy as np
+from app import config
+from app.services import llm_client, metrics, tracing
+
+DECISIONS = metrics.Counter("rag_router_decisions_total",
+                            "Decisões do roteador: primary, hedge, failover, circuit_skip.", ("route", "decision"))
+WINS = metrics.Counter("rag_router_wins_total", "Provedor que respondeu primeiro.", ("route", "provider"))
+FAILURES = metrics.Counter("rag_router_failures_total", "Chamadas que falharam, por provedor.", ("provider",))
+
+
+class LatencyTracker:
+    """Janela deslizante das latências de sucesso de um provedor."""
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float):
+        with self._lock:
+            samples = list(self._samples)
+        return float(np.percentile(samples, q)) if samples else None
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """closed -> open após N falhas seguidas; depois de `open_seconds`, half-open deixa
+    uma chamada de teste passar: sucesso fecha o circuito, falha reabre."""
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state, self.failures, self._trial_running = "closed", 0, False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state, self.opened_at = "open", time.monotonic()
+
+    def release(self):
+        # Chamada de teste cancelada (perdeu o hedge): não conta como sucesso nem falha
+        self._trial_running = False
+
+
+class ProviderRouter:
+    """Escolhe o provedor de cada rota, dispara um hedge no secundário quando o principal
+    passa do p95 da própria latência, faz failover em erro e isola provedores com falhas."""
+
+    def __init__(self, routes: dict):
+        self.routes = routes
+        providers = {provider for candidates in routes.values() for provider, _ in candidates}
+        self.latency = {provider: LatencyTracker(config.LATENCY_WINDOW) for provider in providers}
+        self.ttft = {provider: LatencyTracker(config.LATENCY_WINDOW) for provider in providers}
+        self.breakers = {
+            provider: CircuitBreaker(config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_OPEN_SECONDS)
+            for provider in providers
+        }
+
+    def _candidates(self, route: str):
+        # Provedores com circuito aberto ficam de fora; se todos estiverem, tenta o principal mesmo assim
+        candidates = self.routes[route]
+        allowed = [candidate for candidate in candidates if self.breakers[candidate[0]].allow()]
+        if len(allowed) < len(candidates):
+            DECISIONS.inc(route=route, decision="circuit_skip")
+        return allowed or candidates[:1]
+
+    def hedge_delay(self, tracker: LatencyTracker) -> float:
+        if len(tracker) < config.HEDGE_MIN_SAMPLES:
+            return config.HEDGE_DEFAULT_DELAY
+        p = tracker.percentile(config.HEDGE_PERCENTILE)
+        return min(config.HEDGE_MAX_DELAY, max(config.HEDGE_MIN_DELAY, p))
+
+    def _failed(self, provider: str, error: BaseException):
+        FAILURES.inc(provider=provider)
+        self.breakers[provider].record_failure()
+        tracing.annotate(**{f"{provider}_error": type(error).__name__})
+
+    async def _race(self, route: str, start_attempt, trackers, discard=None):
+        """Corrida entre provedores. `start_attempt(provider, model)` devolve uma corrotina;
+        o primeiro sucesso vence e cancela as demais. `discard` libera o resultado de uma
+        tentativa que também terminou, mas perdeu."""
+        candidates = self._candidates(route)
+        pending = {}  # task -> (provider, início)
+        remaining = list(candidates)
+        last_error = None
+
+        def launch(decision: str):
+            provider, model = remaining.pop(0)
+            DECISIONS.inc(route=route, decision=decision)
+            task = asyncio.ensure_future(start_attempt(provider, model))
+            pending[task] = (provider, time.perf_counter())
+
+        launch("primary")
+        try:
+            while pending:
+                timeout = None
+                if remaining and config.LLM_HEDGING_ENABLED:
+                    first_provider, first_start = next(iter(pending.values()))
+                    timeout = max(0.0, first_start + self.hedge_delay(trackers[first_provider]) - time.perf_counter())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch("hedge")
+                    continue
+                for task in done:
+                    provider, started = pending.pop(task)
+                    if task.exception() is None:
+                        trackers[provider].observe(time.perf_counter() - started)
+                        self.breakers[provider].record_success()
+                        WINS.inc(route=route, provider=provider)
+                        tracing.annotate(provider=provider, hedged=len(candidates) - len(remaining) > 1)
+                        return task.result()
+                    last_error = task.exception()
+                    self._failed(provider, last_error)
+                if not pending and remaining:
+                    launch("failover")
+            raise last_error
+        finally:
+            for provider, _ in remaining:
+                self.breakers[provider].release()  # reservou a chamada de teste, mas não foi usado
+            for task, (provider, _) in pending.items():
+                task.cancel()
+                self.breakers[provider].release()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                if discard is not None:
+                    for task in pending:
+                        if not task.cancelled() and task.exception() is None:
+                            await discard(task.result())
+
+    async def complete(self, route: str, messages, temperature: float) -> dict:
+        async def attempt(provider, model):
+            payload = {"model": model, "messages": messages, "temperature": temperature}
+            return await llm_client.chat_completion(provider, payload)
+
+        return await self._race(route, attempt, self.latency)
+
+    async def stream(self, route: str, messages, temperature: float):
+        # O hedge vale até o primeiro token: vence o stream que produzir o primeiro delta,
+        # e a partir daí só ele continua.
+        async def attempt(provider, model):
+            payload = {"model": model, "messages": messages, "temperature": temperature}
+            deltas = llm_client.stream_chat_completion(provider, payload)
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                return deltas, ""
+            except BaseException:
+                await deltas.aclose()
+                raise
+            return deltas, first
+
+        async def discard(result):
+            await result[0].aclose()
+
+        deltas, first = await self._race(route, attempt, self.ttft, discard)
+        try:
+            if first:
+                yield first
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
+
+    def stats(self) -> dict:
+        return {
+            provider: {
+                "circuit": breaker.state,
+                "consecutive_failures": breaker.failures,
+                "latency_p50": self.latency[provider].percentile(50),
+                "latency_p95": self.latency[provider].percentile(95),
+                "ttft_p95": self.ttft[provider].percentile(95),
+                "hedge_delay": self.hedge_delay(self.latency[provider]),
+                "samples": len(self.latency[provider]),
+            }
+            for provider, breaker in self.breakers.items()
+        }
+
+
+router = ProviderRouter(config.LLM_ROUTES)
@@ -0,0 +1,121 @@
+import os
+import tempfile
+import numpy as np
+from app import config
+from app.services.vector_index import normalize_rows, top_k
+
+MODES = ("float16", "int8", "binary")
+BLOCK_ROWS = 65536  # linhas por bloco ao quantizar
+# Na busca, blocos pequenos (cabem no cache L2) convertidos para float32, já que o
+# BLAS não tem kernels fp16/int8: com int8 a varredura fica tão rápida quanto float32
+SCAN_BLOCK_ROWS = 512
+
+
+def _blocks(matrix, block_rows: int = BLOCK_ROWS):
+    for start in range(0, matrix.shape[0], block_rows):
+        yield start, np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+
+
+def _full_precision_store(embeddings, normalized: bool, spill_dir: str = None):
+    # Matriz float32 normalizada do rescoring. Um memmap float32 já normalizado (índice em
+    # disco) é usado como está; qualquer outra entrada é copiada em blocos para um arquivo
+    # temporário mapeado, senão a RAM teria a cópia float32 *e* os códigos quantizados.
+    if normalized and isinstance(embeddings, np.memmap) and embeddings.dtype == np.float32:
+        return embeddings, None
+    n, dim = np.shape(embeddings)
+    if n == 0:
+        return np.empty((0, dim), dtype=np.float32), None
+    spill_dir = spill_dir or config.QUANT_SPILL_DIR
+    os.makedirs(spill_dir, exist_ok=True)
+    # TemporaryFile some do disco sozinho quando o índice é liberado
+    spill = tempfile.TemporaryFile(dir=spill_dir, prefix="quantized-full-")
+    store = np.memmap(spill, dtype=np.float32, mode="w+", shape=(n, dim))
+    for start, block in _blocks(embeddings):
+        store[start:start + len(block)] = block if normalized else normalize_rows(block)
+    store.flush()  # páginas gravadas podem ser descartadas pelo kernel sob pressão de memória
+    return store, spill
+
+
+class QuantizedIndex:
+    """Busca sobre uma cópia quantizada dos embeddings, com re-ranqueamento exato.
+
+    - float16: 2 bytes/dimensão (2x menos que float32)
+    - int8:    1 byte/dimensão com escala por dimensão (4x)
+    - binary:  1 bit/dimensão (sinal), distância de Hamming via popcount (32x)
+
+    A varredura usa só os códigos quantizados (que ficam na RAM); os `rescore * k`
+    melhores são pontuados de novo com a matriz float32, que fica sempre em memmap
+    (a do índice em disco ou uma cópia em QUANT_SPILL_DIR) e só tem essas linhas lidas.
+    """
+
+    def __init__(self, embeddings, mode: str, rescore: int = 10, normalized: bool = False,
+                 spill_dir: str = None):
+        if mode not in MODES:
+            raise ValueError(f"Modo de quantização inválido: {mode}")
+        full, self._spill = _full_precision_store(embeddings, normalized, spill_dir)
+        self.full = full
+        self.mode = mode
+        self.rescore = rescore
+        self.scales = None
+
+        # Quantiza em blocos para não materializar cópias float32 do corpus inteiro
+        n, dim = full.shape
+        if mode == "float16":
+            self.codes = np.empty((n, dim), dtype=np.float16)
+            for start, block in _blocks(full):
+                self.codes[start:start + len(block)] = block
+        elif mode == "int8":
+            # Escala por dimensão: o maior |valor| de cada coluna vira 127
+            self.scales = np.zeros(dim, dtype=np.float32)
+            for _, block in _blocks(full):
+                np.maximum(self.scales, np.abs(block).max(axis=0), out=self.scales)
+            self.scales /= 127
+            self.scales[self.scales == 0] = 1.0
+            self.codes = np.empty((n, dim), dtype=np.int8)
+            for start, block in _blocks(full):
+                self.codes[start:start + len(block)] = np.clip(np.rint(block / self.scales), -127, 127)
+        else:
+            self.codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+            for start, block in _blocks(full):
+                self.codes[start:start + len(block)] = np.packbits(block > 0, axis=1)
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.full.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        if self.mode in ("float16", "int8"):
+            # int8: (codes * scales) · q == codes · (scales * q), a escala entra só na query
+            scaled_query = query * self.scales if self.scales is not None else query
+            scores = np.empty(len(self), dtype=np.float32)
+            for start, block in _blocks(self.codes, SCAN_BLOCK_ROWS):
+                scores[start:start + len(block)] = block @ scaled_query
+            return scores
+        # Menor distância de Hamming = maior score
+        query_bits = np.packbits(query > 0)
+        distances = np.bitwise_count(self.codes ^ query_bits).sum(axis=1, dtype=np.int32)
+        return -distances.astype(np.float32)
+
+    def search(self, query_embedding, k: int = 1):
+        if len(self) == 0:
+            return top_k(np.empty(0, dtype=np.float32), k)
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        scores = self.approximate_scores(query).astype(np.float32)
+        if not self.rescore:
+            return top_k(scores, k)
+
+        shortlist, _ = top_k(scores, k * self.rescore)
+        order = np.sort(shortlist)  # leitura sequencial do memmap
+        exact = np.asarray(self.full[order], dtype=np.float32) @ query
+        best, best_scores = top_k(exact, k)
+        return order[best], best_scores
+
+    def reconstruct(self, ids) -> np.ndarray:
+        return np.asarray(self.full[np.asarray(ids)], dtype=np.float32)
@@ -1,34 +1,182 @@
-import requests
-from sentence_transformers import util
-from app.utils.text_processing import model
+import asyncio
+import numpy as np
 from app import config
+from app.services import context_builder, llm_client, tracing
+from app.services.semantic_cache import answer_cache
+from app.services.exact_cache import embedding_cache, make_key
+from app.services.bm25 import HybridIndex
+from app.services.embedding_client import RemoteIndex
+from app.services.sharded_index import ShardedIndex
+from app.services.embedding_batcher import encode_queries, query_batcher
+from app.services.provider_router import router as provider_router
 
-def search_best_document(query, documents, embeddings):
-    query_embedding = model.encode(query, convert_to_tensor=True)
-    best_doc, best_score = {}, float('-inf')
+def encode_query(query: str):
+    # Perguntas idênticas (retries da UI, dashboards) reaproveitam o embedding.
+    key = make_key("encode", query, config.EMBEDDING_MODEL)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    embedding = encode_queries([query])[0]
+    embedding_cache.set(key, embedding)
+    return embedding
 
-    for doc in documents:
-        score = util.cos_sim(query_embedding, embeddings[doc["id"]]).item()
-        if score > best_score:
-            best_score = score
-            best_doc = doc
-    return best_doc if best_doc else None
+async def aencode_query(query: str):
+    # Versão das rotas: o encode roda fora do event loop e, com batching ligado,
+    # junto com as outras perguntas que chegaram nos mesmos milissegundos.
+    key = make_key("encode", query, config.EMBEDDING_MODEL)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    with tracing.stage("encode"):
+        if config.QUERY_BATCHING_ENABLED:
+            embedding = await asyncio.wrap_future(query_batcher.submit(query))
+        else:
+            embedding = (await asyncio.to_thread(encode_queries, [query]))[0]
+    embedding_cache.set(key, embedding)
+    return embedding
 
-def call_groq(messages, temperature=0.2):
+async def aencode_queries(queries):
+    # Lote explícito (/query/batch): todas as perguntas fora do cache num único model.encode
+    keys = [make_key("encode", query, config.EMBEDDING_MODEL) for query in queries]
+    embeddings = [None] * len(queries)
+    missing = {}
+    for i, key in enumerate(keys):
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            embeddings[i] = cached[0]
+        else:
+            missing.setdefault(queries[i], []).append(i)
+    if missing:
+        with tracing.stage("encode"):
+            encoded = await asyncio.to_thread(encode_queries, list(missing))
+        for (query, positions), embedding in zip(missing.items(), encoded):
+            for i in positions:
+                embeddings[i] = embedding
+            embedding_cache.set(keys[positions[0]], embedding)
+    return np.stack(embeddings) if embeddings else np.empty((0, 0), dtype=np.float32)
+
+def retrieve_batch(queries, index, k, query_embeddings):
+    # Lista de (posições, scores) por pergunta; índices exatos usam um produto de matrizes
+    with tracing.stage("retrieve"):
+        if isinstance(index, (HybridIndex, RemoteIndex)):
+            return index.search_batch(query_embeddings, k, query_texts=queries)
+        if hasattr(index, "search_batch"):
+            return list(zip(*index.search_batch(query_embeddings, k)))
+        return [index.search(embedding, k) for embedding in query_embeddings]
+
+def _sharded(index) -> bool:
+    # Busca por shards, sozinha ou como parte densa do híbrido (o padrão com RETRIEVAL_MODE="hybrid")
+    return isinstance(index.dense if isinstance(index, HybridIndex) else index, ShardedIndex)
+
+async def aretrieve_batch(queries, index, k, query_embeddings):
+    # Versão das rotas: a busca fica fora do event loop (no modo remoto ela espera o
+    # socket do servidor de embeddings). Shards respondem por Futures: nem thread ocupa.
+    if _sharded(index):
+        with tracing.stage("retrieve"):
+            if isinstance(index, HybridIndex):
+                return await index.asearch_batch(query_embeddings, k, query_texts=queries)
+            return list(zip(*await index.asearch_batch(query_embeddings, k)))
+    return await asyncio.to_thread(retrieve_batch, queries, index, k, query_embeddings)
+
+def retrieve(query, index, k=config.TOP_K, query_embedding=None):
+    # (posições, scores) dos k chunks mais relevantes
+    if query_embedding is None:
+        query_embedding = encode_query(query)
+    with tracing.stage("retrieve"):
+        if isinstance(index, (HybridIndex, RemoteIndex)):
+            return index.search(query_embedding, k, query_text=query)
+        return index.search(query_embedding, k)
+
+def search_documents(query, documents, index, k=config.TOP_K, query_embedding=None):
+    # Pontua todos os chunks de uma vez e devolve os k melhores, com score.
+    indices, scores = retrieve(query, index, k, query_embedding)
+    return [
+        {**documents[i], "score": float(score)}
+        for i, score in zip(indices.tolist(), scores.tolist())
+    ]
+
+def search_best_document(query, documents, index, query_embedding=None):
+    results = search_documents(query, documents, index, k=1, query_embedding=query_embedding)
+    return results[0] if results else None
+
+def cached_answer(namespace, query_embedding):
+    if not config.SEMANTIC_CACHE_ENABLED:
+        return None
+    return answer_cache.lookup(namespace, query_embedding)
+
+def remember_answer(namespace, query_embedding, answer):
+    if config.SEMANTIC_CACHE_ENABLED and answer:
+        answer_cache.store(namespace, query_embedding, answer)
+
+async def remember_stream(deltas, namespace, query_embedding):
+    # Repassa o stream e guarda a resposta completa no cache ao final.
+    parts = []
+    async for delta in deltas:
+        parts.append(delta)
+        yield delta
+    remember_answer(namespace, query_embedding, "".join(parts))
+
+async def replay(answer):
+    yield answer
+
+def build_context(docs):
+    return "\n\n".join(doc["text"] for doc in docs)
+
+def assemble_context(query, documents, index, query_embedding=None, hits=None):
+    # Contexto do prompt: candidatos da busca, sem quase-duplicatas, com os vizinhos da
+    # mesma página juntados e cortado no orçamento de tokens. Retorna (texto, passagens).
+    # `hits` = (posições, scores) já recuperados (ex.: por retrieve_batch).
+    indices, scores = hits if hits is not None else retrieve(query, index, config.CONTEXT_CANDIDATES, query_embedding)
+    with tracing.stage("prompt"):
+        context, passages = context_builder.assemble(documents, index, indices, scores)
+    tracing.annotate(
+        context_ids=[passage["ids"] for passage in passages],
+        context_tokens=sum(passage["tokens"] for passage in passages),
+    )
+    return context, passages
+
+async def aassemble_context(query, documents, index, query_embedding=None, hits=None):
+    # Versão das rotas: busca e leitura dos chunks (RemoteDocuments.prefetch no modo
+    # remoto) rodam fora do event loop
+    if hits is None and query_embedding is not None and _sharded(index):
+        hits = (await aretrieve_batch([query], index, config.CONTEXT_CANDIDATES, [query_embedding]))[0]
+    return await asyncio.to_thread(assemble_context, query, documents, index, query_embedding, hits)
+
+async def call_llm(route, messages, temperature):
+    # Provedor escolhido pelo roteador (config.LLM_ROUTES), com hedge e failover
+    return await provider_router.complete(route, messages, temperature)
+
+def stream_llm(route, messages, temperature):
+    return provider_router.stream(route, messages, temperature)
+
+async def call_groq(messages, temperature=0.2):
     payload = {
         "model": config.GROQ_MODEL,
         "messages": messages,
         "temperature": temperature
     }
-    response = requests.post(config.GROQ_URL, headers=config.GROQ_HEADERS, json=payload)
-    return response.json()
+    return await llm_client.chat_completion("groq", payload)
 
-def call_openai(messages, model="gpt-4o-mini", temperature=0.4):
+async def call_openai(messages, model="gpt-4o-mini", temperature=0.4):
     payload = {
         "model": model,
         "messages": messages,
         "temperature": temperature
     }
-    response = requests.post(config.OPENAI_URL, headers=config.OPENAI_HEADERS, json=payload)
-    return response.json()
+    return await llm_client.chat_completion("openai", payload)
 
+def stream_groq(messages, temperature=0.2):
+    payload = {
+        "model": config.GROQ_MODEL,
+        "messages": messages,
+        "temperature": temperature
+    }
+    return llm_client.stream_chat_completion("groq", payload)
+
+def stream_openai(messages, model="gpt-4o-mini", temperature=0.4):
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature
+    }
+    return llm_client.stream_chat_completion("openai", payload)
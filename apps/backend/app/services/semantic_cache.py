@@ -0,0 +1,127 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app import config
+
+
+class _Block:
+    # Embeddings de um namespace numa matriz pré-alocada (dobra quando enche): a busca é
+    # um único produto matriz-vetor, sem montar a matriz a cada consulta. Remoção troca a
+    # linha pela última, para as linhas vivas ficarem sempre contíguas.
+
+    def __init__(self, dim: int, capacity: int = 16):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.keys = []  # linha -> id da entrada
+        self.rows = {}  # id da entrada -> linha
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, embedding: np.ndarray):
+        n = len(self.keys)
+        if n == self.matrix.shape[0]:
+            grown = np.empty((2 * n, self.matrix.shape[1]), dtype=np.float32)
+            grown[:n] = self.matrix
+            self.matrix = grown
+        self.matrix[n] = embedding
+        self.keys.append(key)
+        self.rows[key] = n
+
+    def remove(self, key):
+        row, last = self.rows.pop(key), len(self.keys) - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.keys[row] = self.keys[last]
+            self.rows[self.keys[row]] = row
+        self.keys.pop()
+
+    def scores(self, embedding: np.ndarray) -> np.ndarray:
+        return self.matrix[:len(self.keys)] @ embedding
+
+
+class SemanticCache:
+    """Cache de respostas indexado pelo embedding da pergunta.
+
+    Uma consulta é "hit" quando o cosseno entre o embedding dela e o de uma pergunta
+    já respondida, no mesmo namespace (corpus + rota + versão do índice), passa de
+    `threshold`. Evicção por LRU (limite de entradas) e por TTL.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, ttl: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # id -> (namespace, answer, created_at)
+        self._blocks = {}  # namespace -> _Block com os embeddings das entradas
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def _remove(self, key):
+        namespace = self._entries.pop(key)[0]
+        block = self._blocks[namespace]
+        block.remove(key)
+        if not block:
+            del self._blocks[namespace]
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry[2] > self.ttl]
+        for key in expired:
+            self._remove(key)
+        self.evictions += len(expired)
+
+    def lookup(self, namespace: tuple, embedding: np.ndarray):
+        with self._lock:
+            self._expire(time.monotonic())
+            block = self._blocks.get(namespace)
+            if block is not None:
+                scores = block.scores(np.asarray(embedding, dtype=np.float32))
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = block.keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][1]
+            self.misses += 1
+            return None
+
+    def store(self, namespace: tuple, embedding: np.ndarray, answer: str):
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            key = next(self._ids)
+            self._entries[key] = (namespace, answer, time.monotonic())
+            block = self._blocks.get(namespace)
+            if block is None:
+                block = self._blocks[namespace] = _Block(embedding.shape[0])
+            block.add(key, embedding)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, corpus: str = None):
+        # Descarta as respostas de um corpus (ou todas), ex.: quando o índice é recriado.
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if corpus is None or entry[0][0] == corpus]
+            for key in keys:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "threshold": self.threshold,
+            }
+
+
+answer_cache = SemanticCache(
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=config.SEMANTIC_CACHE_TTL,
+)
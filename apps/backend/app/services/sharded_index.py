@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import mmap
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+from app import config
+from app.services.vector_index import normalize_rows, top_k_rows
+
+# Busca exata particionada entre processos (scatter-gather):
+#   - as linhas do corpus são divididas em N faixas contíguas, uma por processo
+#   - cada processo abre só a sua faixa: direto do arquivo do índice (memmap, nada é
+#     copiado) ou de um bloco de memória compartilhada quando o corpus não vem do disco
+#   - a pergunta vai para todos, cada um devolve o seu top-k e o pai junta os resultados
+# Cada processo usa o próprio núcleo, então a latência cai com o nº de shards enquanto
+# houver núcleos livres, e nenhum processo precisa do corpus inteiro na memória.
+
+BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def _open_rows(source: dict, start: int, end: int):
+    # (matriz da faixa, bloco de memória compartilhada a fechar depois ou None)
+    dim = source["dim"]
+    if source["kind"] == "file":
+        if start == end:
+            return np.empty((0, dim), dtype=np.float32), None
+        offset = source["offset"] + start * dim * 4
+        return np.memmap(source["path"], dtype=np.float32, mode="r", offset=offset, shape=(end - start, dim)), None
+    shm = shared_memory.SharedMemory(name=source["name"])
+    matrix = np.ndarray((source["rows"], dim), dtype=np.float32, buffer=shm.buf)
+    return matrix[start:end], shm
+
+
+def _scan(matrix, queries, k: int, block_rows: int):
+    # top-k exato da faixa, em blocos de linhas (limita a matriz de scores)
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, matrix.shape[0], block_rows):
+        ids, scores = top_k_rows(queries @ matrix[start:start + block_rows].T, k)
+        best_ids = np.concatenate([best_ids, ids + start], axis=1)
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        if best_ids.shape[1] > k:
+            order, best_scores = top_k_rows(best_scores, k)
+            best_ids = np.take_along_axis(best_ids, order, axis=1)
+    return best_ids, best_scores
+
+
+def _shard_main(conn, source: dict, start: int, end: int, block_rows: int):
+    # Processo de um shard: recebe (id, perguntas, k), devolve (id, posições globais, scores)
+    matrix, shm = _open_rows(source, start, end)
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                return
+            request_id, queries, k = message
+            try:
+                ids, scores = _scan(matrix, queries, k, block_rows)
+                conn.send((request_id, ids + start, scores, None))
+            except Exception as e:
+                conn.send((request_id, None, None, f"{type(e).__name__}: {e}"))
+    except (EOFError, KeyboardInterrupt):
+        return
+    finally:
+        del matrix
+        if shm is not None:
+            shm.close()
+
+
+def _source_for(embeddings, normalized: bool):
+    # Índice em disco (memmap do arquivo inteiro) já normalizado: os shards abrem o arquivo.
+    # Qualquer outra coisa é copiada, normalizada, para memória compartilhada.
+    if normalized and isinstance(embeddings, np.memmap) and isinstance(embeddings.base, mmap.mmap) \
+            and embeddings.dtype == np.float32 and embeddings.flags.c_contiguous:
+        source = {"kind": "file", "path": embeddings.filename, "offset": embeddings.offset,
+                  "rows": embeddings.shape[0], "dim": embeddings.shape[1]}
+        return source, embeddings, None
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    rows, dim = matrix.shape
+    shm = shared_memory.SharedMemory(create=True, size=max(1, rows * dim * 4))
+    shared = np.ndarray((rows, dim), dtype=np.float32, buffer=shm.buf)
+    for start in range(0, rows, 65536):
+        block = matrix[start:start + 65536]
+        shared[start:start + 65536] = block if normalized else normalize_rows(block)
+    return {"kind": "shm", "name": shm.name, "rows": rows, "dim": dim}, shared, shm
+
+
+def _read_results(shard: int, conn, pending: dict, lock):
+    # Thread do pai, uma por shard: entrega cada resposta ao Future da requisição
+    while True:
+        try:
+            request_id, ids, scores, error = conn.recv()
+        except (EOFError, OSError):
+            break
+        with lock:
+            future = pending.pop((request_id, shard), None)
+        if future is None:
+            continue  # requisição que já desistiu (timeout)
+        if error:
+            future.set_exception(RuntimeError(f"shard {shard}: {error}"))
+        else:
+            future.set_result((ids, scores))
+    # Processo do shard morreu ou o índice foi fechado: falha o que estava esperando
+    with lock:
+        futures = [pending.pop(key) for key in [key for key in pending if key[1] == shard]]
+    for future in futures:
+        future.set_exception(RuntimeError(f"shard {shard} indisponível"))
+
+
+def _shutdown(processes, connections, shm):
+    for conn in connections:
+        try:
+            conn.send(None)
+        except (OSError, ValueError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    for conn in connections:
+        conn.close()
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # ainda há views no pai (close() explícito); o mapeamento some com elas
+        shm.unlink()
+
+
+class ShardedIndex:
+    """Busca exata com o corpus particionado entre `shards` processos."""
+
+    def __init__(self, embeddings, shards: int = None, normalized: bool = False,
+                 block_rows: int = None, threads_per_shard: int = None, timeout: float = None):
+        if np.ndim(embeddings) != 2:
+            raise ValueError("Embeddings precisam ser uma matriz 2D (n_chunks, dim)")
+        shards = shards or config.SHARD_COUNT
+        block_rows = block_rows or config.SHARD_BLOCK_ROWS
+        threads_per_shard = threads_per_shard or config.SHARD_THREADS
+        self.timeout = config.SHARD_TIMEOUT if timeout is None else timeout
+        source, self.matrix, shm = _source_for(embeddings, normalized)
+        bounds = np.linspace(0, source["rows"], shards + 1).astype(np.int64)
+        self.ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+        self._pending = {}  # (id da requisição, shard) -> Future
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._connections, self._send_locks, processes = [], [], []
+
+        # spawn: seguro com as threads do servidor; BLAS com poucas threads por shard,
+        # senão N shards disputam os mesmos núcleos
+        context = multiprocessing.get_context("spawn")
+        saved = {name: os.environ.get(name) for name in BLAS_THREAD_VARS}
+        os.environ.update({name: str(threads_per_shard) for name in BLAS_THREAD_VARS})
+        try:
+            for start, end in self.ranges:
+                parent, child = context.Pipe()
+                process = context.Process(target=_shard_main, args=(child, source, start, end, block_rows),
+                                          name=f"search-shard-{start}", daemon=True)
+                process.start()
+                child.close()
+                processes.append(process)
+                self._connections.append(parent)
+                self._send_locks.append(threading.Lock())
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        for shard, conn in enumerate(self._connections):
+            # A thread não guarda referência ao índice, senão ele nunca seria liberado
+            threading.Thread(target=_read_results, args=(shard, conn, self._pending, self._pending_lock),
+                             name=f"search-shard-reader-{shard}", daemon=True).start()
+        # Processos e memória compartilhada são liberados quando o índice sai de uso
+        self._finalizer = weakref.finalize(self, _shutdown, processes, self._connections, shm)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def shards(self) -> int:
+        return len(self.ranges)
+
+    def _queries(self, query_embeddings):
+        return normalize_rows(np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim))
+
+    def _empty(self, n: int):
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+
+    def _scatter(self, queries, k: int):
+        # Envia a pergunta a todos os shards; devolve (id da requisição, um Future por shard)
+        request_id = next(self._request_ids)
+        futures = []
+        for shard, conn in enumerate(self._connections):
+            future = Future()
+            with self._pending_lock:
+                self._pending[(request_id, shard)] = future
+            with self._send_locks[shard]:
+                conn.send((request_id, queries, k))
+            futures.append(future)
+        return request_id, futures
+
+    def _forget(self, request_id: int):
+        with self._pending_lock:
+            for shard in range(len(self._connections)):
+                self._pending.pop((request_id, shard), None)
+
+    @staticmethod
+    def _merge(parts, k: int):
+        # Junta os top-k locais e escolhe o top-k global
+        ids = np.concatenate([part[0] for part in parts], axis=1)
+        scores = np.concatenate([part[1] for part in parts], axis=1)
+        order, scores = top_k_rows(scores, k)
+        return np.take_along_axis(ids, order, axis=1), scores
+
+    def search_batch(self, query_embeddings, k: int = 1):
+        queries = self._queries(query_embeddings)
+        if len(queries) == 0 or len(self) == 0 or k <= 0:
+            return self._empty(len(queries))
+        request_id, futures = self._scatter(queries, k)
+        try:
+            parts = [future.result(timeout=self.timeout) for future in futures]
+        finally:
+            self._forget(request_id)
+        return self._merge(parts, k)
+
+    async def asearch_batch(self, query_embeddings, k: int = 1):
+        """search_batch para as rotas: espera os shards sem bloquear o event loop
+        nem ocupar uma thread durante a busca."""
+        queries = self._queries(query_embeddings)
+        if len(queries) == 0 or len(self) == 0 or k <= 0:
+            return self._empty(len(queries))
+        request_id, futures = self._scatter(queries, k)
+        try:
+            parts = await asyncio.wait_for(asyncio.gather(*map(asyncio.wrap_future, futures)), self.timeout)
+        finally:
+            self._forget(request_id)
+        return self._merge(parts, k)
+
+    def search(self, query_embedding, k: int = 1):
+        ids, scores = self.search_batch(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1), k)
+        return ids[0], scores[0]
+
+    def reconstruct(self, ids) -> np.ndarray:
+        return np.asarray(self.matrix[np.asarray(ids)], dtype=np.float32)
+
+    def close(self):
+        self._finalizer()
@@ -0,0 +1,159 @@
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app import config
+from app.services import metrics
+
+logger = logging.getLogger("app.requests")
+_current = ContextVar("trace", default=None)
+
+# Rotas de infraestrutura: entram nas métricas, mas não geram log por requisição
+UNLOGGED_PATHS = {"/healthz", "/readyz", "/metrics"}
+UNMATCHED = "unmatched"  # rótulo das requisições sem rota (404 de caminho inexistente)
+
+
+class Trace:
+    """Tempos de cada etapa de uma requisição, mais atributos livres para o log."""
+
+    def __init__(self, request_id: str, route: str, method: str, scope=None):
+        self.request_id = request_id
+        self.method = method
+        self.started = time.perf_counter()
+        self.stages = {}  # etapa -> segundos (somados se a etapa repetir)
+        self.attrs = {}
+        self.path = scope["path"] if scope is not None else route
+        self._route = route
+        self._scope = scope
+
+    @property
+    def route(self) -> str:
+        # Template da rota ("/corpora/{name}/reindex") assim que o roteamento rodou; antes
+        # disso, o rótulo fixo passado na criação. Nunca o caminho cru: cada URL viraria
+        # uma série nova nas métricas.
+        route = self._scope.get("route") if self._scope is not None else None
+        return getattr(route, "path", None) or self._route
+
+
+_active = set()  # Traces das requisições em andamento
+
+
+def _in_flight() -> dict:
+    counts = {}
+    for trace in list(_active):
+        counts[(trace.route,)] = counts.get((trace.route,), 0) + 1
+    return counts
+
+
+# Calculado na leitura: o rótulo de uma requisição muda quando ela é roteada
+metrics.Callback("rag_http_in_flight_requests", "Requisições HTTP em andamento.", _in_flight, ("route",))
+
+
+def current():
+    return _current.get()
+
+
+def record(name: str, seconds: float):
+    trace = _current.get()
+    route = trace.route if trace is not None else "-"
+    metrics.STAGE_LATENCY.observe(seconds, route=route, stage=name)
+    if trace is not None:
+        trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def annotate(**attrs):
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def configure_logging():
+    # Uma linha JSON por requisição no logger "app.requests"
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    app_logger = logging.getLogger("app")
+    app_logger.handlers[:] = [handler]
+    app_logger.setLevel(config.LOG_LEVEL)
+    app_logger.propagate = False
+
+
+def _log(trace: Trace, status: int, duration: float):
+    if trace.route in UNLOGGED_PATHS or not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info(json.dumps({
+        "ts": round(time.time(), 3),
+        "event": "request",
+        "request_id": trace.request_id,
+        "method": trace.method,
+        "route": trace.route,
+        "path": trace.path,
+        "status": status,
+        "duration_ms": round(duration * 1000, 2),
+        "stages_ms": {name: round(seconds * 1000, 2) for name, seconds in trace.stages.items()},
+        **trace.attrs,
+    }, ensure_ascii=False, default=str))
+
+
+class TraceMiddleware:
+    """Middleware ASGI: abre um Trace por requisição e, quando o último byte do corpo
+    sai (inclusive em respostas em stream), registra métricas e a linha de log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        # Antes do roteamento (ex.: fila de admissão) só as rotas de config.ADMISSION_LIMITS,
+        # que não têm parâmetros, usam o próprio caminho como rótulo
+        path = scope["path"]
+        trace = Trace(request_id, path if path in config.ADMISSION_LIMITS else UNMATCHED, scope["method"], scope)
+        token = _current.set(trace)
+        state = {"status": 500, "done": False}
+        _active.add(trace)
+
+        def finish():
+            if state["done"]:
+                return
+            state["done"] = True
+            _active.discard(trace)
+            duration = time.perf_counter() - trace.started
+            route = trace.route
+            metrics.HTTP_REQUESTS.inc(route=route, method=trace.method, status=state["status"])
+            metrics.HTTP_LATENCY.observe(duration, route=route)
+            if "cache" in trace.attrs:
+                metrics.HTTP_CACHE.inc(route=route, result=trace.attrs["cache"])
+            _log(trace, state["status"], duration)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                response_headers = list(message.get("headers") or [])
+                for name, value in response_headers:
+                    if name.lower() == b"x-cache":
+                        trace.attrs["cache"] = value.decode("latin-1")
+                response_headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message = {**message, "headers": response_headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _current.reset(token)
@@ -0,0 +1,104 @@
+import numpy as np
+from app import config
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    # Normaliza cada linha para norma 1 (cosseno vira produto interno).
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores: np.ndarray, k: int):
+    # Seleciona os k maiores scores com argpartition (O(n)) e ordena só esses k.
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    order = np.argsort(-scores[candidates], kind="stable")
+    indices = candidates[order]
+    return indices, scores[indices]
+
+
+def top_k_rows(scores: np.ndarray, k: int):
+    # top_k linha a linha de uma matriz (n_queries, n_chunks)
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64), np.empty((scores.shape[0], 0), dtype=np.float32)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else \
+        np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class FlatIndex:
+    """Busca exata: o corpus inteiro fica numa única matriz float32 normalizada
+    e todos os chunks são pontuados com um único produto matriz-vetor."""
+
+    def __init__(self, embeddings, normalized: bool = False):
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("Embeddings precisam ser uma matriz 2D (n_chunks, dim)")
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def search(self, query_embedding, k: int = 1):
+        # Retorna (indices, scores) dos k chunks mais similares, em ordem decrescente.
+        if len(self) == 0:
+            return top_k(np.empty(0, dtype=np.float32), k)
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        scores = self.matrix @ query
+        return top_k(scores, k)
+
+    def search_batch(self, query_embeddings, k: int = 1, block_size: int = 64):
+        # Várias queries com um produto matriz-matriz por bloco (o bloco limita a
+        # matriz de scores a block_size x n_chunks)
+        queries = normalize_rows(np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim))
+        results = [top_k_rows(queries[start:start + block_size] @ self.matrix.T, k)
+                   for start in range(0, len(queries), block_size)]
+        if not results:
+            return np.empty((0, 0), dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+    def reconstruct(self, ids) -> np.ndarray:
+        # Embeddings (normalizados) dos chunks pedidos
+        return np.asarray(self.matrix[np.asarray(ids)], dtype=np.float32)
+
+
+def build_index(embeddings, normalized: bool = False, index_type: str = None, lexical=None):
+    # "flat" = busca exata; "ivf" = aproximada; "sharded" = exata dividida entre processos;
+    # "auto" escolhe entre flat e ivf pelo tamanho do corpus.
+    # Com um índice BM25 (lexical) e RETRIEVAL_MODE == "hybrid", combina os dois.
+    index_type = index_type or config.INDEX_TYPE
+    if index_type == "auto":
+        index_type = "ivf" if len(embeddings) >= config.IVF_MIN_VECTORS else "flat"
+
+    if index_type == "flat" and config.INDEX_QUANTIZATION != "none":
+        from app.services.quantization import QuantizedIndex
+        index = QuantizedIndex(embeddings, config.INDEX_QUANTIZATION, rescore=config.QUANT_RESCORE, normalized=normalized)
+    elif index_type == "flat":
+        index = FlatIndex(embeddings, normalized=normalized)
+    elif index_type == "sharded":
+        from app.services.sharded_index import ShardedIndex
+        index = ShardedIndex(embeddings, shards=config.SHARD_COUNT, normalized=normalized)
+    elif index_type == "ivf":
+        from app.services.ann_index import IVFIndex
+        index = IVFIndex(embeddings, nlist=config.IVF_NLIST, nprobe=config.IVF_NPROBE, normalized=normalized)
+    else:
+        raise ValueError(f"Tipo de índice inválido: {index_type}")
+
+    if lexical is not None and config.RETRIEVAL_MODE == "hybrid":
+        from app.services.bm25 import HybridIndex
+        index = HybridIndex(index, lexical, candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K)
+    return index
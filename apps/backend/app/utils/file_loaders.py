@@ -1,15 +1,58 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import fitz
 from pptx import Presentation
+from app import config
 
 def extract_text_from_pdf(pdf_path: str) -> str:
-    doc = fitz.open(pdf_path)
-    return "\n".join([page.get_text() for page in doc])
+    return "\n".join(text for _, text in iter_pdf_pages(pdf_path))
 
 def ppt_to_text(file_path: str) -> str:
+    return "\n".join(text for _, text in iter_pptx_slides(file_path))
+
+def _extract_pdf_range(pdf_path: str, start: int, end: int):
+    # Roda no processo filho: cada processo abre o próprio documento (PyMuPDF não
+    # compartilha objetos entre processos, mas é seguro um documento por processo).
+    with fitz.open(pdf_path) as doc:
+        return [(number + 1, doc[number].get_text()) for number in range(start, end)]
+
+def iter_pdf_pages(pdf_path: str, workers: int = None):
+    # (nº da página, texto), em ordem, uma página por vez.
+    # PDFs grandes são extraídos por um pool de processos, com no máximo
+    # 2 * workers lotes em andamento para a memória não crescer com o arquivo.
+    workers = config.PDF_EXTRACT_WORKERS if workers is None else workers
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count < config.PDF_EXTRACT_MIN_PAGES_FOR_POOL:
+            for number, page in enumerate(doc, start=1):
+                yield number, page.get_text()
+            return
+
+    step = config.PDF_EXTRACT_PAGES_PER_TASK
+    ranges = iter([(start, min(start + step, page_count)) for start in range(0, page_count, step)])
+    # "spawn": o processo pai pode ter threads do PyTorch, e fork com threads pode travar
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = deque()
+        for start, end in ranges:
+            in_flight.append(pool.submit(_extract_pdf_range, pdf_path, start, end))
+            if len(in_flight) >= 2 * workers:
+                break
+        while in_flight:
+            yield from in_flight.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(_extract_pdf_range, pdf_path, *next_range))
+
+def iter_pptx_slides(file_path: str):
+    # (nº do slide, texto), um slide por vez
     prs = Presentation(file_path)
-    text_list = []
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text_list.append(shape.text)
-    return "\n".join(text_list)
+    for number, slide in enumerate(prs.slides, start=1):
+        yield number, "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
+
+def iter_pages(file_path: str, source_type: str):
+    if source_type == "pdf":
+        return iter_pdf_pages(file_path)
+    if source_type == "pptx":
+        return iter_pptx_slides(file_path)
+    raise ValueError("Tipo de arquivo inválido")
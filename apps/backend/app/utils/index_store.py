@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import time
+from array import array
+import numpy as np
+
+# Formato do índice em disco (um diretório por corpus):
+#   header.json     -> versão do formato, modelo (e backend), dimensão, chunk size, nº de chunks
+#   embeddings.f32  -> matriz float32 (n_chunks, dim) normalizada, crua, aberta com memmap
+#   texts.bin       -> texto dos chunks em UTF-8, concatenado
+#   offsets.npy     -> int64 (n_chunks + 1), início/fim de cada chunk em texts.bin
+#   pages.npy       -> int32 (n_chunks), página/slide onde cada chunk começa
+FORMAT_VERSION = 2
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.f32"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+PAGES_FILE = "pages.npy"
+
+
+class ChunkStore:
+    """Sequência somente-leitura de chunks apoiada nos arquivos memmap.
+
+    Os textos são decodificados sob demanda, então vários workers compartilham
+    a mesma cópia em page cache e nada é carregado na inicialização.
+    """
+
+    def __init__(self, texts: np.ndarray, offsets: np.ndarray, id_prefix: str, version: str = "", pages=None):
+        self.texts = texts
+        self.offsets = offsets
+        self.pages = pages
+        self.id_prefix = id_prefix
+        self.version = version  # muda a cada reconstrução do índice
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        doc = {"id": f"{self.id_prefix}_{i}", "text": self.texts[start:end].tobytes().decode("utf-8")}
+        if self.pages is not None:
+            doc["page"] = int(self.pages[i])
+        return doc
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def build_header(model_name: str, dim: int, chunk_size: int, count: int, source: str, id_prefix: str,
+                 backend: str = "torch", quantization: str = "none") -> dict:
+    return {
+        "format_version": FORMAT_VERSION,
+        "model": model_name,
+        "embedding_backend": backend,
+        "embedding_quantization": quantization,
+        "dim": dim,
+        "chunk_size": chunk_size,
+        "count": count,
+        "source": source,
+        "id_prefix": id_prefix,
+        "built_at": time.time(),
+    }
+
+
+def read_header(index_dir: str):
+    path = os.path.join(index_dir, HEADER_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_stale(header, model_name: str, chunk_size: int, backend: str = "torch", quantization: str = "none") -> bool:
+    # Cache inválido se o formato, o modelo, o backend/quantização do modelo (int8 gera
+    # vetores diferentes do float) ou o tamanho de chunk mudaram. Headers antigos, sem
+    # esses campos, foram gerados com torch.
+    return (
+        header is None
+        or header.get("format_version") != FORMAT_VERSION
+        or header.get("model") != model_name
+        or header.get("embedding_backend", "torch") != backend
+        or header.get("embedding_quantization", "none") != quantization
+        or header.get("chunk_size") != chunk_size
+    )
+
+
+class IndexWriter:
+    """Escreve o índice incrementalmente, lote a lote, sem manter o corpus em memória.
+
+    Tudo vai para um diretório temporário; `commit` troca pelo definitivo de uma vez,
+    para nunca expor um índice pela metade.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._texts = open(os.path.join(self.tmp_dir, TEXTS_FILE), "wb")
+        self._embeddings = open(os.path.join(self.tmp_dir, EMBEDDINGS_FILE), "wb")
+        self._offsets = array("q", [0])
+        self._pages = array("i")
+        self.count = 0
+        self.dim = None
+
+    def add(self, texts, embeddings: np.ndarray, pages=None):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        for text in texts:
+            b = text.encode("utf-8")
+            self._texts.write(b)
+            self._offsets.append(self._offsets[-1] + len(b))
+        self._embeddings.write(embeddings.tobytes())
+        self._pages.extend(pages if pages is not None else [0] * len(texts))
+        self.count += len(texts)
+
+    def commit(self, header: dict):
+        self._texts.close()
+        self._embeddings.close()
+        np.save(os.path.join(self.tmp_dir, OFFSETS_FILE), np.frombuffer(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.tmp_dir, PAGES_FILE), np.frombuffer(self._pages, dtype=np.int32))
+        with open(os.path.join(self.tmp_dir, HEADER_FILE), "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2)
+
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+        os.replace(self.tmp_dir, self.index_dir)
+
+    def abort(self):
+        self._texts.close()
+        self._embeddings.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def write_index(index_dir: str, texts, embeddings: np.ndarray, header: dict, pages=None):
+    writer = IndexWriter(index_dir)
+    writer.add(texts, embeddings, pages)
+    writer.commit(header)
+
+
+def open_index(index_dir: str, header: dict):
+    # Abre o índice via memmap: nenhum dado é copiado para a memória do processo.
+    shape = (header["count"], header["dim"])
+    embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+    if os.path.getsize(embeddings_path) != shape[0] * shape[1] * 4:
+        raise ValueError(f"Índice corrompido em {index_dir}: tamanho de {EMBEDDINGS_FILE} não confere")
+    if shape[0] > 0:
+        embeddings = np.memmap(embeddings_path, dtype=np.float32, mode="r", shape=shape)
+    else:
+        embeddings = np.empty(shape, dtype=np.float32)
+
+    offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+    pages = np.load(os.path.join(index_dir, PAGES_FILE), mmap_mode="r")
+    texts_path = os.path.join(index_dir, TEXTS_FILE)
+    if os.path.getsize(texts_path) > 0:
+        texts = np.memmap(texts_path, dtype=np.uint8, mode="r")
+    else:
+        texts = np.empty(0, dtype=np.uint8)
+
+    documents = ChunkStore(texts, offsets, header["id_prefix"], str(header.get("built_at", "")), pages)
+    return documents, embeddings
@@ -1,19 +1,92 @@
 import os
 import re
-import pickle
+import threading
 import nltk
-from sentence_transformers import SentenceTransformer
-from .file_loaders import extract_text_from_pdf, ppt_to_text
+import numpy as np
+from itertools import islice
 from app import config
 from nltk.tokenize import sent_tokenize
 
-# Baixa o tokenizador de sentenças do NLTK (apenas 1x)
-nltk.download("punkt", quiet=True)
-
-
-# modelo anterios: all-MiniLM-L6-v2
-# Modelo de melhor qualidade e suporte multi-idioma
-model = SentenceTransformer("paraphrase-multilingual-mpnet-base-v2")
+# Fim de frase: pontuação final, opcionalmente seguida de aspas/parênteses
+SENTENCE_END = re.compile(r"[.!?…][\"'”’»)\]]*$")
+# Página que continua a frase da anterior: começa em minúscula ou pontuação de meio de frase
+CONTINUATION = re.compile(r"[a-zà-ÿ,;:)\]”’»–-]")
+
+_model = None
+_punkt_ready = False
+_lock = threading.Lock()
+
+
+def get_model():
+    # Carrega o modelo só no primeiro uso (o import do app fica instantâneo).
+    # modelo anterior: all-MiniLM-L6-v2
+    # Modelo de melhor qualidade e suporte multi-idioma
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+
+def load_model(backend: str = None, quantization: str = None, threads: int = None):
+    # Mesma interface (model.encode) nos dois backends: o resto do código não muda.
+    from sentence_transformers import SentenceTransformer
+    backend = backend or config.EMBEDDING_BACKEND
+    threads = config.EMBEDDING_THREADS if threads is None else threads
+    if backend == "torch":
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(config.EMBEDDING_MODEL)
+    if backend != "onnx":
+        raise ValueError(f"Backend de embeddings inválido: {backend}")
+
+    import onnxruntime
+    quantization = quantization or config.EMBEDDING_ONNX_QUANTIZATION
+    model_dir = os.path.join(config.EMBEDDING_ONNX_DIR, config.EMBEDDING_MODEL)
+    file_name = "onnx/model.onnx" if quantization == "none" else f"onnx/model_qint8_{quantization}.onnx"
+    if not os.path.exists(os.path.join(model_dir, file_name)):
+        _export_onnx(model_dir, quantization)
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads > 0:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return SentenceTransformer(
+        model_dir,
+        backend="onnx",
+        model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider", "session_options": options},
+    )
+
+
+def embedding_backend():
+    # (backend, quantização) que geram os embeddings; gravados no header dos índices
+    backend = config.EMBEDDING_BACKEND
+    return backend, config.EMBEDDING_ONNX_QUANTIZATION if backend == "onnx" else "none"
+
+
+def _export_onnx(model_dir: str, quantization: str):
+    # Exporta o modelo do Hugging Face para ONNX (e opcionalmente int8) uma única vez
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    if not os.path.exists(os.path.join(model_dir, "onnx", "model.onnx")):
+        print(f"Exportando {config.EMBEDDING_MODEL} para ONNX em {model_dir}...")
+        SentenceTransformer(config.EMBEDDING_MODEL, backend="onnx").save_pretrained(model_dir)
+    if quantization != "none":
+        print(f"Quantizando o modelo ONNX para int8 ({quantization})...")
+        model = SentenceTransformer(model_dir, backend="onnx", model_kwargs={"file_name": "onnx/model.onnx"})
+        export_dynamic_quantized_onnx_model(model, quantization, model_dir)
+
+
+def ensure_punkt():
+    # Baixa o tokenizador de sentenças do NLTK (apenas 1x)
+    # nltk >= 3.9 carrega o "punkt_tab" em vez do "punkt" antigo
+    global _punkt_ready
+    if not _punkt_ready:
+        nltk.download("punkt", quiet=True)
+        nltk.download("punkt_tab", quiet=True)
+        _punkt_ready = True
 
 
 
@@ -24,6 +97,7 @@ def clean_text(text: str) -> str:
 
 def chunk_text(text: str, chunk_size: int):
     #Divide o texto em chunks completos, sem cortar frases pela metade.
+    ensure_punkt()
     sentences = sent_tokenize(text)
     chunks, current = [], ""
 
@@ -38,46 +112,91 @@ def chunk_text(text: str, chunk_size: int):
 
     return chunks
 
-def load_or_create_embeddings(file_path: str, cache_path: str, source_type: str):
-    #Carrega embeddings do cache ou cria novos se não existirem.
-    if os.path.exists(cache_path):
-        with open(cache_path, "rb") as f:
-            return pickle.load(f)
-
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
-
-    # Extração do texto
-    if source_type == "pdf":
-        text = extract_text_from_pdf(file_path)
-    elif source_type == "pptx":
-        text = ppt_to_text(file_path)
-    else:
-        raise ValueError("Tipo de arquivo inválido")
-
-    # Limpeza e chunking
-    text = clean_text(text)
-    chunks = chunk_text(text, config.CHUNK_SIZE)
-
-    documents = [
-        {"id": f"{source_type}_{i}", "text": chunk}
-        for i, chunk in enumerate(chunks)
-    ]
-
-    # Geração dos embeddings com normalização
-    doc_embeddings = {
-        doc["id"]: model.encode(
-            doc["text"],
-            convert_to_tensor=True,
+def _iter_sentences(pages, max_carry: int, join_pages: bool):
+    #Frases com a página onde começam. Com join_pages, a última frase de uma página que
+    #não termina em pontuação final é juntada à próxima, se esta começa no meio da frase.
+    carry, carry_page = "", None
+    for page_no, text in pages:
+        text = clean_text(text)
+        if not text:
+            continue
+        if carry and not CONTINUATION.match(text):
+            yield carry_page, carry
+            carry = ""
+        first_page = carry_page if carry else page_no
+        sentences = sent_tokenize(f"{carry} {text}" if carry else text)
+        carry = ""
+        # Frase maior que um chunk não vira "resto": evita juntar páginas inteiras sem pontuação
+        if join_pages and not SENTENCE_END.search(sentences[-1]) and len(sentences[-1]) < max_carry:
+            carry_page = first_page if len(sentences) == 1 else page_no
+            carry = sentences.pop()
+        for i, sentence in enumerate(sentences):
+            yield first_page if i == 0 else page_no, sentence
+    if carry:
+        yield carry_page, carry
+
+def iter_chunks(pages, chunk_size: int, join_pages: bool = True):
+    #Pipeline em streaming: página -> limpeza -> frases -> chunks.
+    #Cada chunk guarda a página/slide onde começa; só uma página fica em memória por vez.
+    #join_pages=False (slides) nunca junta frases de páginas diferentes.
+    current, current_page = "", None
+    ensure_punkt()
+
+    for page_no, sentence in _iter_sentences(pages, chunk_size, join_pages):
+        if current_page is None:
+            current_page = page_no
+        if len(current) + len(sentence) <= chunk_size:
+            current += " " + sentence
+        else:
+            if current.strip():
+                yield {"text": current.strip(), "page": current_page}
+            current, current_page = sentence, page_no
+    if current.strip():
+        yield {"text": current.strip(), "page": current_page}
+
+def iter_windows(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        window = list(islice(iterator, size))
+        if not window:
+            return
+        yield window
+
+def encode_chunks(texts, batch_size: int = None, workers: int = None, pool=None) -> np.ndarray:
+    #Gera os embeddings em lotes de verdade, ordenados por tamanho para reduzir padding.
+    model = get_model()
+    batch_size = batch_size or config.EMBED_BATCH_SIZE
+    workers = config.EMBED_WORKERS if workers is None else workers
+    dim = model.get_sentence_embedding_dimension()
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+    if not texts:
+        return embeddings
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    sorted_texts = [texts[i] for i in order]
+
+    if pool is not None or workers > 1:
+        # Distribui os lotes entre processos (um modelo por processo, só CPU)
+        own_pool = pool is None
+        if own_pool:
+            pool = model.start_multi_process_pool(["cpu"] * workers)
+        try:
+            encoded = model.encode_multi_process(
+                sorted_texts, pool, batch_size=batch_size, normalize_embeddings=True
+            )
+        finally:
+            if own_pool:
+                model.stop_multi_process_pool(pool)
+        embeddings[order] = encoded
+        return embeddings
+
+    for start in range(0, len(sorted_texts), batch_size):
+        batch = sorted_texts[start:start + batch_size]
+        embeddings[order[start:start + batch_size]] = model.encode(
+            batch,
+            convert_to_numpy=True,
             normalize_embeddings=True,
-            batch_size=32,
-            show_progress_bar=True
+            batch_size=batch_size,
+            show_progress_bar=False
         )
-        for doc in documents
-    }
-
-    # Cache para evitar processamento repetido
-    with open(cache_path, "wb") as f:
-        pickle.dump((documents, doc_embeddings), f)
-
-    return documents, doc_embeddings
+    return embeddings
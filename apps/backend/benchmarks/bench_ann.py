@@ -0,0 +1,63 @@
+"""Recall@k e latência do IVFIndex comparado à busca exata (FlatIndex).
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_ann --sizes 10000,100000,1000000 --dim 256 --nprobe 1,4,8,16,32
+"""
+import argparse
+import time
+import numpy as np
+from app.services.vector_index import FlatIndex, normalize_rows
+from app.services.ann_index import IVFIndex
+
+
+def synthetic_corpus(n: int, dim: int, n_topics: int, rng) -> np.ndarray:
+    # Mistura de gaussianas: embeddings reais se agrupam por assunto, ruído puro não.
+    topics = normalize_rows(rng.standard_normal((n_topics, dim), dtype=np.float32))
+    labels = rng.integers(0, n_topics, n)
+    vectors = topics[labels] + rng.standard_normal((n, dim), dtype=np.float32) / np.sqrt(dim)
+    return normalize_rows(vectors)
+
+
+def run(n: int, dim: int, k: int, n_queries: int, nprobes, seed: int):
+    rng = np.random.default_rng(seed)
+    corpus = synthetic_corpus(n, dim, n_topics=max(16, n // 500), rng=rng)
+    queries = normalize_rows(corpus[rng.choice(n, n_queries, replace=False)]
+                             + 0.05 * rng.standard_normal((n_queries, dim), dtype=np.float32))
+
+    flat = FlatIndex(corpus, normalized=True)
+    start = time.perf_counter()
+    truth = [set(flat.search(q, k)[0].tolist()) for q in queries]
+    flat_ms = (time.perf_counter() - start) / n_queries * 1000
+
+    start = time.perf_counter()
+    ivf = IVFIndex(corpus, normalized=True, seed=seed)
+    build_s = time.perf_counter() - start
+
+    print(f"\nn={n:,} dim={dim} k={k} nlist={ivf.nlist} build={build_s:.1f}s")
+    print(f"  flat     recall@{k}=1.000  {flat_ms:8.3f} ms/query")
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [set(ivf.search(q, k, nprobe=nprobe)[0].tolist()) for q in queries]
+        ivf_ms = (time.perf_counter() - start) / n_queries * 1000
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"  nprobe={nprobe:<3} recall@{k}={recall:.3f}  {ivf_ms:8.3f} ms/query  "
+              f"({flat_ms / ivf_ms:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", default="1,4,8,16,32")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    nprobes = [int(p) for p in args.nprobe.split(",")]
+    for n in (int(s) for s in args.sizes.split(",")):
+        run(n, args.dim, args.k, args.queries, nprobes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Backends do embedder na CPU: PyTorch vs. ONNX Runtime (fp32 e int8 dinâmico).
+
+Cada backend roda num processo próprio, para o RSS de um não contaminar o outro.
+Reporta latência de uma pergunta (p50/p99), throughput em lotes de chunks, RSS
+depois do carregamento e a concordância de cosseno com os embeddings do PyTorch
+(paridade: o índice em disco foi criado com o PyTorch e continua válido).
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_embedding_backend --backends torch,onnx,onnx:avx2 --threads 4
+"""
+import argparse
+import multiprocessing
+import time
+import numpy as np
+import psutil
+
+WORDS = ("mana trample flying deathtouch graveyard sacrifice token counter combat damage "
+         "commander library exile planeswalker instant sorcery regra turno criatura").split()
+
+
+def make_texts(n: int, min_words: int, max_words: int, seed: int):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(min_words, max_words))) for _ in range(n)]
+
+
+def run_backend(spec: str, threads: int, queries, chunks, batch_size: int):
+    # Roda no processo filho
+    from app.utils.text_processing import load_model
+    backend, _, quantization = spec.partition(":")
+    model = load_model(backend, quantization or "none", threads)
+    model.encode(queries[:4], convert_to_numpy=True)  # aquecimento
+    rss = psutil.Process().memory_info().rss
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    embeddings = model.encode(chunks, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "rss_mib": rss / 2**20,
+        "p50": np.percentile(latencies, 50),
+        "p99": np.percentile(latencies, 99),
+        "chunks_per_s": len(chunks) / elapsed,
+        "embeddings": embeddings.astype(np.float32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", default="torch,onnx,onnx:avx2")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="falha se algum backend ficar abaixo")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = make_texts(args.queries, 4, 14, args.seed)
+    chunks = make_texts(args.chunks, 30, 70, args.seed + 1)
+    context = multiprocessing.get_context("spawn")
+
+    results = {}
+    for spec in args.backends.split(","):
+        with context.Pool(1) as pool:
+            results[spec] = pool.apply(run_backend, (spec, args.threads, queries, chunks, args.batch_size))
+
+    reference = results.get("torch")
+    failed = []
+    print(f"{args.queries} perguntas, {args.chunks} chunks, threads={args.threads or 'padrão'}")
+    for spec, result in results.items():
+        parity = ""
+        if reference is not None and spec != "torch":
+            cosines = np.sum(result["embeddings"] * reference["embeddings"], axis=1)
+            parity = f"  cos vs torch: min={cosines.min():.4f} mean={cosines.mean():.4f}"
+            if cosines.min() < args.min_cosine:
+                failed.append(spec)
+        print(f"  {spec:<18} RSS={result['rss_mib']:7.1f} MiB  p50={result['p50']:6.2f}ms  "
+              f"p99={result['p99']:6.2f}ms  {result['chunks_per_s']:7.1f} chunks/s{parity}")
+    if failed:
+        raise SystemExit(f"Paridade abaixo de {args.min_cosine}: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""N workers com modelo próprio vs. N workers usando o servidor de embeddings.
+
+Cada worker é um processo que faz o que um worker do uvicorn faria: carrega o que
+precisa (modelo, ou só a conexão com o servidor) e codifica perguntas avulsas com
+algumas threads concorrentes. Reporta o RSS de cada modo (workers + servidor) e o
+throughput total de perguntas/s.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_embedding_server --workers 4 --queries 500 --threads 4
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import psutil
+from benchmarks.bench_embedding_backend import make_texts
+from benchmarks.results import write_results
+
+
+def run_worker(socket_path, queries, threads: int, barrier, results):
+    # Processo filho: configura o modo antes de importar o app
+    if socket_path:
+        os.environ["EMBEDDING_SERVER_SOCKET"] = socket_path
+    os.environ["QUERY_BATCHING_ENABLED"] = "true"
+    from app.services import query_service
+    from app.services.embedding_batcher import encode_queries
+    encode_queries(["aquecimento"])
+    rss = psutil.Process().memory_info().rss
+    barrier.wait()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(query_service.encode_query, queries))
+    results.put({"rss": rss, "elapsed": time.perf_counter() - start, "queries": len(queries)})
+
+
+def start_server(socket_path: str):
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    server = subprocess.Popen([sys.executable, "-m", "app.services.embedding_server", "--socket", socket_path], env=env)
+    os.environ["EMBEDDING_SERVER_SOCKET"] = socket_path
+    from app.services.embedding_client import get_client
+    client = get_client()
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError("o servidor de embeddings terminou durante o carregamento")
+        try:
+            if client.status()["status"] == "ready":
+                break
+        except OSError:
+            pass
+        time.sleep(1)
+    del os.environ["EMBEDDING_SERVER_SOCKET"]
+    return server, client
+
+
+def run_mode(label: str, socket_path, args, server_rss: int = 0):
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(args.workers), context.Queue()
+    processes = []
+    for worker in range(args.workers):
+        queries = make_texts(args.queries, 4, 16, seed=args.seed + worker)
+        process = context.Process(target=run_worker, args=(socket_path, queries, args.threads, barrier, results))
+        process.start()
+        processes.append(process)
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    worker_rss = sum(report["rss"] for report in reports)
+    elapsed = max(report["elapsed"] for report in reports)
+    total = sum(report["queries"] for report in reports)
+    result = {
+        "name": label,
+        "workers": args.workers,
+        "worker_rss_mib": worker_rss / 2**20 / args.workers,
+        "total_rss_mib": (worker_rss + server_rss) / 2**20,
+        "queries_per_s": total / elapsed,
+    }
+    print(f"  {label:<8} RSS/worker {result['worker_rss_mib']:8.0f} MiB   RSS total {result['total_rss_mib']:8.0f} MiB"
+          f"   {result['queries_per_s']:8.1f} perguntas/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500, help="perguntas por worker")
+    parser.add_argument("--threads", type=int, default=4, help="requisições concorrentes por worker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="salva os resultados em JSON")
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.threads} threads cada")
+    results = [run_mode("local", None, args)]
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+    server, client = start_server(socket_path)
+    try:
+        server_rss = psutil.Process(server.pid).memory_info().rss
+        results.append(run_mode("servidor", socket_path, args, server_rss))
+        batching = client.status()["query_batching"]
+        print(f"  lotes no servidor: {batching['batches']}, média {batching['avg_batch']} perguntas")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        write_results(args.output, "embedding_server", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
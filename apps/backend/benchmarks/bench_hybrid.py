@@ -0,0 +1,76 @@
+"""Qualidade de recuperação e latência: denso vs. BM25 vs. híbrido (RRF).
+
+As perguntas são geradas a partir do próprio corpus: para cada chunk sorteado,
+uma pergunta com o número de regra que ele contém (ex.: "702.19b") ou um trecho
+literal dele. O chunk de origem é a resposta esperada.
+
+Uso (a partir de apps/backend, com o índice já criado):
+    python -m benchmarks.bench_hybrid --corpus pdf --queries 300 --k 3
+"""
+import argparse
+import random
+import re
+import time
+import numpy as np
+from app import config
+from app.services.bm25 import BM25Index, HybridIndex
+from app.services.corpora import CORPORA, load_or_create_embeddings
+from app.services.query_service import encode_query
+
+RULE_RE = re.compile(r"\b\d{3}\.\d+[a-z]?\b")
+
+
+def make_queries(documents, n: int, rng):
+    queries = []
+    for i in rng.sample(range(len(documents)), min(n, len(documents))):
+        text = documents[i]["text"]
+        rules = RULE_RE.findall(text)
+        if rules:
+            queries.append(("rule", f"What does rule {rng.choice(rules)} say?", i))
+        else:
+            words = text.split()
+            start = rng.randrange(max(1, len(words) - 6))
+            queries.append(("phrase", " ".join(words[start:start + 6]), i))
+    return queries
+
+
+def evaluate(name, search, queries, k):
+    hits, reciprocal_ranks, latencies = {}, [], []
+    for kind, query, expected in queries:
+        start = time.perf_counter()
+        found = search(query).tolist()
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = found.index(expected) + 1 if expected in found else None
+        hits.setdefault(kind, []).append(rank is not None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    by_kind = "  ".join(f"recall@{k}[{kind}]={np.mean(v):.3f} (n={len(v)})" for kind, v in sorted(hits.items()))
+    print(f"  {name:<8} MRR={np.mean(reciprocal_ranks):.3f}  {by_kind}  "
+          f"p50={np.percentile(latencies, 50):.2f}ms p99={np.percentile(latencies, 99):.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", default="pdf", choices=sorted(CORPORA))
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=config.TOP_K)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    file_path, cache_path, source_type, _ = CORPORA[args.corpus]
+    documents, index = load_or_create_embeddings(file_path, cache_path, source_type)
+    dense = index.dense if isinstance(index, HybridIndex) else index
+    lexical = index.lexical if isinstance(index, HybridIndex) else BM25Index.from_texts(d["text"] for d in documents)
+    hybrid = HybridIndex(dense, lexical, candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K)
+
+    queries = make_queries(documents, args.queries, random.Random(args.seed))
+    embeddings = {query: encode_query(query) for _, query, _ in queries}  # encode fora da medição
+    print(f"{len(documents)} chunks, {len(queries)} perguntas, k={args.k}")
+
+    evaluate("dense", lambda q: dense.search(embeddings[q], args.k)[0], queries, args.k)
+    evaluate("bm25", lambda q: lexical.search(q, args.k)[0], queries, args.k)
+    evaluate("hybrid", lambda q: hybrid.search(embeddings[q], args.k, query_text=q)[0], queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Throughput de geração de embeddings na ingestão (chunks/s).
+
+Compara o caminho antigo (um model.encode por chunk) com encode_chunks em lotes
+e, opcionalmente, com um pool de processos.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_ingest --file app/docs/MAGIC_RULES.pdf --workers 1,4
+    python -m benchmarks.bench_ingest --synthetic 2000
+"""
+import argparse
+import random
+import time
+from app import config
+from app.utils.text_processing import get_model, clean_text, chunk_text, encode_chunks
+from app.utils.file_loaders import extract_text_from_pdf, ppt_to_text
+
+
+def load_chunks(args):
+    if args.file:
+        text = extract_text_from_pdf(args.file) if args.file.endswith(".pdf") else ppt_to_text(args.file)
+        return chunk_text(clean_text(text), config.CHUNK_SIZE)
+
+    # Chunks sintéticos com tamanhos variados, como num documento real
+    rng = random.Random(0)
+    words = "the player casts a spell creature attacks blocks damage mana card turn phase".split()
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(10, 60)))
+        for _ in range(args.synthetic)
+    ]
+
+
+def measure(label: str, fn, n_chunks: int):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed:8.2f}s  {n_chunks / elapsed:8.1f} chunks/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--file", help="PDF ou PPTX para extrair os chunks")
+    parser.add_argument("--synthetic", type=int, default=1000, help="nº de chunks sintéticos (sem --file)")
+    parser.add_argument("--batch-size", type=int, default=config.EMBED_BATCH_SIZE)
+    parser.add_argument("--workers", default="1", help="lista de nº de processos, ex.: 1,4")
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args)
+    print(f"{len(chunks)} chunks, modelo {config.EMBEDDING_MODEL}")
+
+    model = get_model()
+    if not args.skip_baseline:
+        measure("por chunk (antigo)", lambda: [
+            model.encode(chunk, convert_to_numpy=True, normalize_embeddings=True) for chunk in chunks
+        ], len(chunks))
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        measure(f"em lotes (workers={workers})",
+                lambda: encode_chunks(chunks, batch_size=args.batch_size, workers=workers), len(chunks))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Requisições/s contra o mock de LLM: requests bloqueante vs. llm_client assíncrono.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_llm_client --requests 200 --concurrency 50 --latency-ms 200
+"""
+import argparse
+import asyncio
+import os
+import time
+
+PORT = 9011
+os.environ.setdefault("OPENAI_URL", f"http://127.0.0.1:{PORT}/v1/chat/completions")
+
+import requests  # noqa: E402
+from app import config  # noqa: E402
+from app.services import llm_client  # noqa: E402
+from benchmarks import mock_llm_server  # noqa: E402
+
+PAYLOAD = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "ping"}], "temperature": 0.0}
+
+
+async def blocking_requests(n: int, concurrency: int):
+    # Como era antes: requests.post dentro de corrotinas trava o event loop.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            requests.post(config.OPENAI_URL, headers=config.OPENAI_HEADERS, json=PAYLOAD).json()
+
+    await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def async_client(n: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await llm_client.chat_completion("openai", PAYLOAD)
+
+    await asyncio.gather(*(one() for _ in range(n)))
+    await llm_client.aclose()
+
+
+def measure(label: str, coro_fn, n: int, concurrency: int):
+    start = time.perf_counter()
+    asyncio.run(coro_fn(n, concurrency))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {n:5d} req  {elapsed:7.2f}s  {n / elapsed:8.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock_llm_server.start_in_thread(port=PORT, latency_ms=args.latency_ms, jitter_ms=0.0, error_rate=args.error_rate)
+    print(f"concorrência {args.concurrency}, latência {args.latency_ms:.0f} ms")
+    # O caminho bloqueante é serial, então roda com menos requisições
+    measure("requests (bloqueante)", blocking_requests, min(args.requests, 20), args.concurrency)
+    measure("llm_client (async)", async_client, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
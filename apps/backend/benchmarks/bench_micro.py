@@ -0,0 +1,147 @@
+"""Micro-benchmarks do pipeline em vários tamanhos de corpus, com saída em JSON.
+
+- chunk_text: texto sintético de N caracteres (MB/s)
+- load_or_create_embeddings: PDF sintético de N páginas, índice criado do zero
+  (cold) e reaberto do disco (warm); precisa do modelo de embeddings
+- search_best_document: N chunks com embeddings sintéticos, no modo de busca
+  configurado (flat/IVF, denso ou híbrido); não precisa do modelo
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_micro --output micro.json
+    python -m benchmarks.bench_micro --skip-ingest --search-sizes 1000,100000,1000000
+    python -m benchmarks.results micro-antes.json micro.json
+"""
+import argparse
+import random
+import tempfile
+import time
+import numpy as np
+from app import config
+from app.services.bm25 import BM25Index
+from app.services.corpora import load_or_create_embeddings
+from app.services.query_service import search_best_document
+from app.services.vector_index import build_index, normalize_rows
+from app.utils.text_processing import chunk_text
+from benchmarks.bench_ann import synthetic_corpus
+from benchmarks.results import write_results
+
+WORDS = ("the player casts a spell creature attacks blocks damage mana card turn phase "
+         "combat trample flying graveyard library exile counter token sacrifice").split()
+
+
+def synthetic_text(n_chars: int, rng) -> str:
+    sentences, size = [], 0
+    while size < n_chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))).capitalize() + "."
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def timed(fn, repeat: int = 1):
+    # Menor tempo entre as repetições (menos ruído de outros processos)
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_chunk_text(sizes, rng):
+    results = []
+    for n_chars in sizes:
+        text = synthetic_text(n_chars, rng)
+        seconds, chunks = timed(lambda: chunk_text(text, config.CHUNK_SIZE), repeat=3)
+        results.append({
+            "name": f"chunk_text/{n_chars}",
+            "seconds": seconds,
+            "mb_per_s": len(text) / seconds / 1e6,
+            "chunks": len(chunks),
+        })
+        print(f"  chunk_text       {n_chars:>10,} chars  {seconds * 1000:9.2f} ms  {results[-1]['mb_per_s']:6.2f} MB/s")
+    return results
+
+
+def bench_ingest(page_counts, rng):
+    import fitz
+    results = []
+    for pages in page_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = f"{tmp}/corpus.pdf"
+            with fitz.open() as doc:
+                for _ in range(pages):
+                    doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), synthetic_text(2500, rng), fontsize=8)
+                doc.save(pdf_path)
+
+            cold, (documents, _) = timed(lambda: load_or_create_embeddings(pdf_path, f"{tmp}/index", "pdf"))
+            warm, _ = timed(lambda: load_or_create_embeddings(pdf_path, f"{tmp}/index", "pdf"), repeat=3)
+        results.append({
+            "name": f"load_or_create_embeddings/{pages}p",
+            "cold_seconds": cold,
+            "warm_seconds": warm,
+            "chunks": len(documents),
+            "chunks_per_s": len(documents) / cold,
+        })
+        print(f"  ingest           {pages:>10,} pages  cold={cold:8.2f}s  warm={warm * 1000:8.2f} ms  "
+              f"{len(documents):,} chunks")
+    return results
+
+
+def bench_search(sizes, dim: int, n_queries: int, rng_np, rng):
+    results = []
+    for n in sizes:
+        corpus = synthetic_corpus(n, dim, n_topics=max(16, n // 500), rng=rng_np)
+        texts = [" ".join(rng.choice(WORDS) for _ in range(40)) for _ in range(n)]
+        documents = [{"id": f"doc_{i}", "text": text, "page": 1} for i, text in enumerate(texts)]
+        lexical = BM25Index.from_texts(texts) if config.RETRIEVAL_MODE == "hybrid" else None
+        build_s, index = timed(lambda: build_index(corpus, normalized=True, lexical=lexical))
+
+        queries = normalize_rows(corpus[rng_np.choice(n, n_queries)]
+                                 + 0.05 * rng_np.standard_normal((n_queries, dim), dtype=np.float32))
+        query_texts = [" ".join(rng.choice(WORDS) for _ in range(8)) for _ in range(n_queries)]
+        latencies = []
+        for text, embedding in zip(query_texts, queries):
+            start = time.perf_counter()
+            search_best_document(text, documents, index, query_embedding=embedding)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.append({
+            "name": f"search_best_document/{n}",
+            "index": type(index).__name__,
+            "build_seconds": build_s,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+        })
+        print(f"  search           {n:>10,} chunks {type(index).__name__:<12} "
+              f"p50={results[-1]['p50_ms']:7.3f} ms  p99={results[-1]['p99_ms']:7.3f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-sizes", default="10000,100000,1000000", help="tamanhos do texto em caracteres")
+    parser.add_argument("--ingest-pages", default="10,100")
+    parser.add_argument("--search-sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--skip-ingest", action="store_true", help="não carrega o modelo de embeddings")
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = bench_chunk_text([int(s) for s in args.chunk_sizes.split(",") if s], rng)
+    if not args.skip_ingest:
+        results += bench_ingest([int(p) for p in args.ingest_pages.split(",") if p], rng)
+    results += bench_search([int(s) for s in args.search_sizes.split(",") if s], args.dim, args.queries,
+                            np.random.default_rng(args.seed), rng)
+
+    if args.output:
+        params = {**vars(args), "index_type": config.INDEX_TYPE, "retrieval_mode": config.RETRIEVAL_MODE,
+                  "quantization": config.INDEX_QUANTIZATION, "embedding_backend": config.EMBEDDING_BACKEND}
+        write_results(args.output, "micro", params, results)
+
+
+if __name__ == "__main__":
+    main()
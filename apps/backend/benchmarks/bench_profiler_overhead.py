@@ -0,0 +1,66 @@
+"""Custo do profiler por amostragem sobre um trabalho de CPU em Python puro.
+
+Mede o throughput de algumas threads fazendo trabalho fixo sem profiler e com o
+amostrador (app.services.profiler.sample) rodando em várias frequências. Com os
+núcleos ocupados, a perda de throughput é o custo do amostrador. Acima de ~200 Hz
+o GIL limita a taxa real (sys.getswitchinterval), veja a coluna de amostras.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_profiler_overhead --seconds 5 --hz 10,100,1000
+"""
+import argparse
+import threading
+import time
+from app.services import profiler
+from benchmarks.results import write_results
+
+
+def workload(stop: threading.Event, done: list):
+    count = 0
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+        count += 1
+    done.append(count)
+
+
+def run(seconds: float, threads: int, hz: int = 0):
+    stop, done = threading.Event(), []
+    workers = [threading.Thread(target=workload, args=(stop, done)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    samples = 0
+    if hz:
+        samples = sum(profiler.sample(seconds, 1 / hz).values())
+    else:
+        time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return sum(done) / seconds, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--hz", default="10,100,1000")
+    parser.add_argument("--output", help="salva os resultados em JSON")
+    args = parser.parse_args()
+
+    baseline, _ = run(args.seconds, args.threads)
+    results = [{"name": "sem profiler", "hz": 0, "ops_per_s": baseline, "overhead": 0.0, "samples": 0}]
+    for hz in (int(h) for h in args.hz.split(",")):
+        ops, samples = run(args.seconds, args.threads, hz)
+        results.append({"name": f"{hz} Hz", "hz": hz, "ops_per_s": ops, "overhead": 1 - ops / baseline,
+                        "samples": samples})
+
+    print(f"  {'modo':<14} {'ops/s':>10} {'custo':>7} {'amostras':>9}")
+    for result in results:
+        print(f"  {result['name']:<14} {result['ops_per_s']:10.0f} {result['overhead']:7.1%} {result['samples']:9d}")
+
+    if args.output:
+        write_results(args.output, "profiler_overhead", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Memória, recall@k e latência dos modos de quantização (float16 / int8 / binary).
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_quantization --sizes 100000,1000000 --dim 768 --rescore 0,10,40
+"""
+import argparse
+import time
+import numpy as np
+from app.services.quantization import MODES, QuantizedIndex
+from app.services.vector_index import FlatIndex, normalize_rows
+from benchmarks.bench_ann import synthetic_corpus
+
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    results = [set(index.search(q, k)[0].tolist()) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run(n: int, dim: int, k: int, n_queries: int, rescores, seed: int):
+    rng = np.random.default_rng(seed)
+    corpus = synthetic_corpus(n, dim, n_topics=max(16, n // 500), rng=rng)
+    queries = normalize_rows(corpus[rng.choice(n, n_queries, replace=False)]
+                             + 0.05 * rng.standard_normal((n_queries, dim), dtype=np.float32))
+
+    truth, flat_ms = timed_search(FlatIndex(corpus, normalized=True), queries, k)
+    print(f"\nn={n:,} dim={dim} k={k}")
+    print(f"  {'float32':<8} {'':<10} {corpus.nbytes / 2**20:9.1f} MiB  1.0x  recall@{k}=1.000  {flat_ms:8.3f} ms/query")
+
+    for mode in MODES:
+        for rescore in rescores:
+            index = QuantizedIndex(corpus, mode, rescore=rescore, normalized=True)
+            found, ms = timed_search(index, queries, k)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(f"  {mode:<8} rescore={rescore:<3} {index.nbytes / 2**20:9.1f} MiB "
+                  f"{corpus.nbytes / index.nbytes:4.1f}x  recall@{k}={recall:.3f}  {ms:8.3f} ms/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--rescore", default="0,10,40")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rescores = [int(r) for r in args.rescore.split(",")]
+    for n in (int(s) for s in args.sizes.split(",")):
+        run(n, args.dim, args.k, args.queries, rescores, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Carga concorrente no encode de perguntas: um forward por pergunta vs. micro-batching.
+
+Cada cliente virtual manda perguntas distintas (sem cache) em sequência; mede-se a
+latência de cada encode e o throughput total.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_query_batching --requests 2000 --concurrency 1,8,32,64
+    python -m benchmarks.bench_query_batching --max-batch 64 --max-wait-ms 5
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from app import config
+from app.services.embedding_batcher import EmbeddingBatcher, encode_queries
+from app.utils.text_processing import get_model
+
+WORDS = ("mana trample flying deathtouch graveyard sacrifice token counter combat "
+         "damage commander library exile planeswalker instant sorcery").split()
+
+
+def make_queries(n: int, rng):
+    return [
+        f"{i}: how does {' '.join(rng.choice(WORDS, size=rng.integers(4, 14)))} work?"
+        for i in range(n)
+    ]
+
+
+async def run(encode_async, queries, concurrency: int):
+    latencies = []
+    pending = iter(queries)
+
+    async def client():
+        for query in pending:
+            start = time.perf_counter()
+            await encode_async(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--max-batch", type=int, default=config.QUERY_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=config.QUERY_BATCH_MAX_WAIT_MS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = get_model()
+    model.encode(["aquecimento"], convert_to_numpy=True)
+    queries = make_queries(args.requests, np.random.default_rng(args.seed))
+    batcher = EmbeddingBatcher(encode_queries, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000)
+
+    async def unbatched(query):
+        # Como era antes: um model.encode por requisição (aqui ao menos fora do event loop)
+        return await asyncio.to_thread(model.encode, query, convert_to_numpy=True, normalize_embeddings=True)
+
+    async def batched(query):
+        return await asyncio.wrap_future(batcher.submit(query))
+
+    print(f"{args.requests} perguntas, max_batch={args.max_batch}, max_wait={args.max_wait_ms}ms")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        for name, encode_async in (("unbatched", unbatched), ("batched", batched)):
+            qps, p50, p99 = asyncio.run(run(encode_async, queries, concurrency))
+            print(f"  c={concurrency:<4} {name:<10} {qps:8.1f} q/s  p50={p50:7.2f}ms  p99={p99:7.2f}ms")
+    print(f"  lotes: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
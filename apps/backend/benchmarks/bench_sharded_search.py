@@ -0,0 +1,99 @@
+"""Busca exata num processo (FlatIndex) vs. scatter-gather entre N shards (ShardedIndex).
+
+O corpus sintético é gravado num arquivo e aberto com memmap, como o índice em disco;
+os shards abrem só a sua faixa do arquivo. Reporta latência de uma pergunta (p50/p99),
+throughput em lotes e o recall@k contra a busca exata (deve ser 1.0).
+A escala com o nº de shards depende de haver núcleos livres: use --shards até os núcleos da máquina.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_sharded_search --chunks 1000000 --dim 768 --shards 1,2,4,8
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from app.services.sharded_index import ShardedIndex
+from app.services.vector_index import FlatIndex, normalize_rows
+from benchmarks.bench_ann import synthetic_corpus
+from benchmarks.results import write_results
+
+
+def write_corpus(path: str, n: int, dim: int, seed: int, block: int = 100_000):
+    # Gera em blocos direto no arquivo: a memória não depende do tamanho do corpus
+    rng = np.random.default_rng(seed)
+    corpus = np.memmap(path, dtype=np.float32, mode="w+", shape=(n, dim))
+    for start in range(0, n, block):
+        rows = min(block, n - start)
+        corpus[start:start + rows] = synthetic_corpus(rows, dim, n_topics=max(16, rows // 500), rng=rng)
+    corpus.flush()
+    del corpus
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(n, dim))
+
+
+def measure(index, queries, k: int, batch: int):
+    index.search(queries[0], k)  # aquecimento (páginas do memmap, processos)
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        ids, _ = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(set(ids.tolist()))
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch):
+        index.search_batch(queries[offset:offset + batch], k)
+    throughput = len(queries) / (time.perf_counter() - start)
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "batch_queries_per_s": throughput,
+    }, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--shards", default="1,2,4,8")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="salva os resultados em JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.f32")
+        start = time.perf_counter()
+        corpus = write_corpus(path, args.chunks, args.dim, args.seed)
+        print(f"corpus {args.chunks:,} x {args.dim} ({corpus.nbytes / 2**30:.1f} GiB) gerado em "
+              f"{time.perf_counter() - start:.1f}s; {os.cpu_count()} núcleos")
+
+        rng = np.random.default_rng(args.seed + 1)
+        picks = np.sort(rng.choice(args.chunks, args.queries, replace=False))
+        queries = normalize_rows(np.asarray(corpus[picks])
+                                 + 0.05 * rng.standard_normal((args.queries, args.dim), dtype=np.float32))
+
+        flat_result, truth = measure(FlatIndex(corpus, normalized=True), queries, args.k, args.batch)
+        results = [{"name": "flat", "shards": 0, "recall": 1.0, **flat_result}]
+        for shards in (int(s) for s in args.shards.split(",")):
+            index = ShardedIndex(corpus, shards=shards, normalized=True)
+            try:
+                result, found = measure(index, queries, args.k, args.batch)
+            finally:
+                index.close()
+            recall = float(np.mean([len(f & t) / len(t) for f, t in zip(found, truth)]))
+            results.append({"name": f"sharded-{shards}", "shards": shards, "recall": recall, **result})
+
+        print(f"  {'índice':<12} {'p50 ms':>9} {'p99 ms':>9} {'lote q/s':>10} {'recall':>7}")
+        for result in results:
+            print(f"  {result['name']:<12} {result['p50_ms']:9.2f} {result['p99_ms']:9.2f} "
+                  f"{result['batch_queries_per_s']:10.1f} {result['recall']:7.3f}")
+        del corpus
+
+    if args.output:
+        write_results(args.output, "sharded_search", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
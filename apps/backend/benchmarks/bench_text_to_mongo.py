@@ -0,0 +1,127 @@
+"""/text-to-mongo: tradução local (regras e templates) vs. chamada ao LLM (mock).
+
+Mede a latência de cada caminho e a taxa de acerto local num conjunto de perguntas
+típicas: parte é resolvida pelas regras, parte por templates aprendidos de respostas
+anteriores do LLM e o resto cai no LLM.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.bench_text_to_mongo --latency-ms 400 --output t2m.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+PORT = 9012
+os.environ.setdefault("OPENAI_URL", f"http://127.0.0.1:{PORT}/v1/chat/completions")
+os.environ.setdefault("GROQ_URL", f"http://127.0.0.1:{PORT}/openai/v1/chat/completions")
+
+import numpy as np  # noqa: E402
+from app.services import llm_client  # noqa: E402
+from app.services.mongo_translator import MongoTranslator, parse_rules, validate  # noqa: E402
+from app.services.provider_router import router  # noqa: E402
+from benchmarks import mock_llm_server  # noqa: E402
+from benchmarks.results import write_results  # noqa: E402
+
+RULE_QUESTIONS = [
+    "orders where amount > {n} and created_at after {d}",
+    "find all orders where status is shipped sorted by total desc limit {n}",
+    "count products where stock < {n}",
+    "users where age between {n} and 60, country in (BR, US)",
+    "top 5 orders where total >= {n} sorted by total desc",
+    "customers where name contains \"silva\" and signup_date since {d}",
+]
+# Perguntas livres demais para as regras: o LLM responde a primeira vez, o template as seguintes
+TEMPLATE_QUESTIONS = [
+    ("find all orders above {n} dollars placed after {d}",
+     'db.orders.find({{"amount": {{"$gt": {n}}}, "date": {{"$gt": ISODate("{d}")}}}})'),
+    ("how many invoices were paid late by more than {n} days",
+     'db.invoices.countDocuments({{"days_late": {{"$gt": {n}}}, "status": "paid"}})'),
+]
+LLM_QUESTIONS = [
+    "which customers bought something in the last week",
+    "average order value per region",
+]
+
+
+def sample_values(rng):
+    return {"n": rng.randint(1, 10_000), "d": f"20{rng.randint(20, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}
+
+
+def time_us(fn, *args, repeat: int = 200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(timings)), float(np.percentile(timings, 99))
+
+
+async def llm_latency_ms(n: int):
+    messages = [{"role": "user", "content": "Convert to a MongoDB query: orders above 100"}]
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await router.complete("/text-to-mongo", messages, temperature=0.0)
+        timings.append((time.perf_counter() - start) * 1000)
+    await llm_client.aclose()
+    return float(np.median(timings)), float(np.percentile(timings, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=1000, help="perguntas na mistura para a taxa de acerto")
+    parser.add_argument("--llm-requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="salva os resultados em JSON")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # Latência de cada caminho
+    rule_question = RULE_QUESTIONS[0].format(**sample_values(rng))
+    rule_us = time_us(parse_rules, rule_question)
+
+    translator = MongoTranslator(max_templates=100)
+    template, answer = TEMPLATE_QUESTIONS[0]
+    values = sample_values(rng)
+    translator.accept_llm(template.format(**values), answer.format(**values))
+    template_us = time_us(translator.translate_local, template.format(**sample_values(rng)))
+    validate_us = time_us(validate, answer.format(**values))
+
+    mock_llm_server.start_in_thread(port=PORT, latency_ms=args.latency_ms, jitter_ms=args.latency_ms * 0.25)
+    llm_ms = asyncio.run(llm_latency_ms(args.llm_requests))
+
+    # Taxa de acerto numa mistura: a resposta do LLM é simulada com o template "verdadeiro"
+    translator = MongoTranslator(max_templates=100)
+    pool = [(q, None) for q in RULE_QUESTIONS] + TEMPLATE_QUESTIONS + [(q, None) for q in LLM_QUESTIONS]
+    for _ in range(args.questions):
+        question, answer = rng.choice(pool)
+        values = sample_values(rng)
+        question = question.format(**values) if "{" in question else question
+        if translator.translate_local(question) is None:
+            translator.accept_llm(question, answer.format(**values) if answer else
+                                  '"Unable to generate a valid MongoDB query from the input."')
+    stats = translator.stats()
+
+    results = [
+        {"name": "rule", "p50_us": rule_us[0], "p99_us": rule_us[1]},
+        {"name": "template", "p50_us": template_us[0], "p99_us": template_us[1]},
+        {"name": "validate", "p50_us": validate_us[0], "p99_us": validate_us[1]},
+        {"name": "llm_mock", "p50_us": llm_ms[0] * 1000, "p99_us": llm_ms[1] * 1000},
+        {"name": "mix", **stats},
+    ]
+    print(f"latência simulada do LLM: {args.latency_ms:.0f} ms")
+    for result in results[:4]:
+        print(f"  {result['name']:<10} p50 {result['p50_us']:>12.1f} µs   p99 {result['p99_us']:>12.1f} µs")
+    print(f"  mistura de {args.questions} perguntas: regras {stats['rule']}, templates {stats['template']}, "
+          f"LLM {stats['llm']} -> {stats['local_hit_rate']:.1%} resolvidas localmente")
+    print(f"  speedup local vs. LLM (p50): {llm_ms[0] * 1000 / max(rule_us[0], template_us[0]):,.0f}x")
+
+    if args.output:
+        write_results(args.output, "text_to_mongo", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
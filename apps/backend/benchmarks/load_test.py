@@ -0,0 +1,185 @@
+"""Gerador de carga assíncrono para /query, /ppt-search e /text-to-mongo.
+
+Mantém `--concurrency` requisições em andamento por `--duration` segundos (ou até
+`--requests`) e reporta, por rota: QPS, p50/p95/p99, taxa de erro, status HTTP e
+resultado do cache (header X-Cache). Com --stream, mede também o tempo até o
+primeiro evento SSE.
+
+Com --serve, sobe no mesmo processo o mock de LLM e o backend apontando para ele,
+sem nenhuma chamada ao Groq/OpenAI (o modelo de embeddings e os índices reais
+ainda são carregados).
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.load_test --serve --duration 30 --concurrency 32 --output load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --routes /query --unique 1.0
+    python -m benchmarks.results load-antes.json load.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import Counter
+import httpx
+import numpy as np
+from benchmarks.results import write_results
+
+QUESTIONS = {
+    "/query": [
+        "How does trample work?",
+        "What happens when a creature with deathtouch blocks?",
+        "Como funciona a fase de combate?",
+        "What does rule 702.19b say?",
+        "Can I respond to a spell with an instant?",
+    ],
+    "/ppt-search": [
+        "What is the main topic of the presentation?",
+        "Resuma os principais pontos.",
+        "What are the next steps?",
+    ],
+    "/text-to-mongo": [
+        "find all orders above 100 dollars",
+        "users created in the last 7 days",
+        "count products where stock is zero",
+    ],
+}
+
+
+def start_servers(mock_port: int, backend_port: int, latency_ms: float, token_ms: float, error_rate: float):
+    # As URLs precisam estar no ambiente antes do import de app.config
+    mock_url = f"http://127.0.0.1:{mock_port}/v1/chat/completions"
+    os.environ["OPENAI_URL"] = os.environ["GROQ_URL"] = mock_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")  # sem uma linha de log por requisição
+    import uvicorn
+    from benchmarks import mock_llm_server
+    mock_llm_server.start_in_thread("127.0.0.1", mock_port, latency_ms=latency_ms,
+                                    token_ms=token_ms, error_rate=error_rate)
+    from app.main import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=backend_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    return f"http://127.0.0.1:{backend_port}"
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(1)
+    raise SystemExit("Backend não ficou pronto a tempo (/readyz)")
+
+
+async def one_request(client, route: str, query: str, stream: bool, stats: dict):
+    start = time.perf_counter()
+    first_event = None
+    body = {"query": query, "stream": stream and route != "/text-to-mongo"}
+    try:
+        async with client.stream("POST", route, json=body) as response:
+            async for _ in response.aiter_bytes():
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+            status = response.status_code
+            cache = response.headers.get("X-Cache", "-")
+    except httpx.HTTPError as e:
+        status, cache = type(e).__name__, "-"
+    elapsed = time.perf_counter() - start
+
+    stats["latencies"].append(elapsed * 1000)
+    stats["status"][str(status)] += 1
+    stats["cache"][cache] += 1
+    if first_event is not None and body["stream"]:
+        stats["ttfb"].append(first_event * 1000)
+    if not (isinstance(status, int) and status < 400):
+        stats["errors"] += 1
+
+
+async def run_load(args, base_url: str):
+    rng = random.Random(args.seed)
+    routes = args.routes.split(",")
+    stats = {route: {"latencies": [], "ttfb": [], "status": Counter(), "cache": Counter(), "errors": 0}
+             for route in routes}
+    counter = iter(range(args.requests or 10**12))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        if args.serve:
+            await wait_ready(client, args.ready_timeout)
+        deadline = time.monotonic() + args.duration
+
+        async def worker():
+            for i in counter:
+                if time.monotonic() >= deadline:
+                    return
+                route = rng.choice(routes)
+                query = rng.choice(QUESTIONS[route])
+                if rng.random() < args.unique:
+                    query = f"{query} (#{i})"  # pergunta inédita: passa direto pelos caches
+                await one_request(client, route, query, args.stream, stats[route])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    results = []
+    for route, route_stats in stats.items():
+        latencies = route_stats["latencies"]
+        if not latencies:
+            continue
+        result = {
+            "name": route,
+            "requests": len(latencies),
+            "qps": len(latencies) / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "error_rate": route_stats["errors"] / len(latencies),
+            "status": dict(route_stats["status"]),
+            "cache": dict(route_stats["cache"]),
+        }
+        if route_stats["ttfb"]:
+            result["ttfb_p50_ms"] = float(np.percentile(route_stats["ttfb"], 50))
+            result["ttfb_p99_ms"] = float(np.percentile(route_stats["ttfb"], 99))
+        results.append(result)
+        print(f"  {route:<15} {result['requests']:>6} req  {result['qps']:8.1f} q/s  "
+              f"p50={result['p50_ms']:8.1f}ms  p95={result['p95_ms']:8.1f}ms  p99={result['p99_ms']:8.1f}ms  "
+              f"erros={result['error_rate']:.1%}  status={result['status']}  cache={result['cache']}")
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--routes", default="/query,/ppt-search,/text-to-mongo")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos")
+    parser.add_argument("--requests", type=int, default=0, help="para antes, se > 0")
+    parser.add_argument("--unique", type=float, default=0.5, help="fração de perguntas inéditas (sem cache)")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--serve", action="store_true", help="sobe mock de LLM + backend neste processo")
+    parser.add_argument("--mock-port", type=int, default=9021)
+    parser.add_argument("--backend-port", type=int, default=8021)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="latência do mock (com --serve)")
+    parser.add_argument("--token-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--output", help="arquivo JSON com os resultados")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base_url = args.url
+    if args.serve:
+        base_url = start_servers(args.mock_port, args.backend_port, args.latency_ms, args.token_ms, args.error_rate)
+
+    print(f"{base_url}  rotas={args.routes}  concorrência={args.concurrency}  duração={args.duration}s")
+    elapsed, results = asyncio.run(run_load(args, base_url))
+    print(f"  total: {sum(r['requests'] for r in results)} requisições em {elapsed:.1f}s")
+    if args.output:
+        write_results(args.output, "load", {**vars(args), "url": base_url}, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Servidor local compatível com a API de chat completions da OpenAI/Groq.
+
+Responde com latência configurável e, opcionalmente, com uma taxa de erros 429/503
+para exercitar o retry do llm_client. Não faz nenhuma chamada externa.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.mock_llm_server --port 9000 --latency-ms 300
+    OPENAI_URL=http://127.0.0.1:9000/v1/chat/completions \\
+    GROQ_URL=http://127.0.0.1:9000/v1/chat/completions uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# latency_ms = tempo até o primeiro token; token_ms = intervalo entre tokens no modo stream;
+# error_statuses/retry_after = respostas de erro sorteadas com probabilidade error_rate;
+# overrides = {caminho: {configuração}} para simular provedores diferentes (um por caminho)
+settings = {"latency_ms": 200.0, "jitter_ms": 50.0, "token_ms": 20.0, "error_rate": 0.0,
+            "error_statuses": (429, 503), "retry_after": "0", "overrides": {}}
+# Contadores para os testes: requisições recebidas (total e por caminho) e pico simultâneo
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "by_path": {}}
+app = FastAPI()
+
+
+def completion_body(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-mock-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 100, "completion_tokens": len(content.split()), "total_tokens": 100 + len(content.split())},
+    }
+
+
+async def stream_body(model: str, content: str, include_usage: bool = False):
+    # Mesmo formato de chunks da OpenAI: um "delta" por palavra e "[DONE]" no fim.
+    # Com stream_options.include_usage, um último chunk sem choices traz o "usage".
+    for i, word in enumerate(content.split(" ")):
+        if i:
+            await asyncio.sleep(settings["token_ms"] / 1000)
+        chunk = {
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    if include_usage:
+        usage = completion_body(model, content)["usage"]
+        yield f"data: {json.dumps({'object': 'chat.completion.chunk', 'model': model, 'choices': [], 'usage': usage})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def mock_answer(payload: dict) -> str:
+    question = payload["messages"][-1]["content"].strip().splitlines()[-1].strip()
+    return f"Mock answer for: {question}"
+
+
+def setting(path: str, name: str):
+    return settings["overrides"].get(path, {}).get(name, settings[name])
+
+
+async def simulate_latency(path: str):
+    delay = max(0.0, random.gauss(setting(path, "latency_ms"), setting(path, "jitter_ms"))) / 1000
+    await asyncio.sleep(delay)
+
+
+@app.post("/v1/chat/completions")
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    path = request.url.path
+    stats["requests"] += 1
+    stats["by_path"][path] = stats["by_path"].get(path, 0) + 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await simulate_latency(path)
+    finally:
+        stats["in_flight"] -= 1
+
+    if random.random() < setting(path, "error_rate"):
+        status = random.choice(setting(path, "error_statuses"))
+        return JSONResponse({"error": {"message": "mock error"}}, status_code=status,
+                            headers={"Retry-After": setting(path, "retry_after")})
+
+    if payload.get("stream"):
+        include_usage = (payload.get("stream_options") or {}).get("include_usage", False)
+        return StreamingResponse(stream_body(payload.get("model", "mock"), mock_answer(payload), include_usage),
+                                 media_type="text/event-stream")
+    return completion_body(payload.get("model", "mock"), mock_answer(payload))
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 9000, **overrides) -> uvicorn.Server:
+    # Sobe o servidor numa thread daemon (para benchmarks no mesmo processo).
+    # port=0 escolhe uma porta livre: a real fica em server_port(server)
+    settings.update(overrides)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def server_port(server: uvicorn.Server) -> int:
+    return server.servers[0].sockets[0].getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"])
+    parser.add_argument("--token-ms", type=float, default=settings["token_ms"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    args = parser.parse_args()
+
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                    token_ms=args.token_ms, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
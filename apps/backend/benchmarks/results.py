@@ -0,0 +1,66 @@
+"""Resultados dos benchmarks em JSON, para comparar execuções.
+
+Cada arquivo tem metadados (commit, data, máquina, parâmetros) e uma lista de
+resultados com um "name" único; métricas numéricas são comparadas por nome.
+
+Uso (a partir de apps/backend):
+    python -m benchmarks.results antes.json depois.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, benchmark: str, params: dict, results: list):
+    report = {
+        "benchmark": benchmark,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {path}")
+
+
+def compare(old: dict, new: dict):
+    old_results = {result["name"]: result for result in old["results"]}
+    print(f"{old['benchmark']}: {old.get('git_commit')} -> {new.get('git_commit')}")
+    for result in new["results"]:
+        before = old_results.get(result["name"])
+        if before is None:
+            print(f"  {result['name']}: (novo)")
+            continue
+        print(f"  {result['name']}")
+        for metric, value in result.items():
+            previous = before.get(metric)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+                continue
+            change = f"{(value - previous) / previous * 100:+.1f}%" if previous else "n/a"
+            print(f"    {metric:<24} {previous:>12.3f} -> {value:>12.3f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    with open(args.old, encoding="utf-8") as f_old, open(args.new, encoding="utf-8") as f_new:
+        compare(json.load(f_old), json.load(f_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import time
+import pytest
+from benchmarks import mock_llm_server
+
+
+@pytest.fixture(scope="session")
+def _mock_server():
+    server = mock_llm_server.start_in_thread(port=0)
+    yield f"http://127.0.0.1:{mock_llm_server.server_port(server)}"
+    server.should_exit = True
+
+
+@pytest.fixture
+def mock_llm(_mock_server):
+    # URL base do servidor local, com configuração e contadores zerados a cada teste
+    defaults = dict(mock_llm_server.settings)
+    mock_llm_server.settings.update(latency_ms=10.0, jitter_ms=0.0, token_ms=0.0, error_rate=0.0, overrides={})
+    mock_llm_server.stats.update(requests=0, in_flight=0, max_in_flight=0, by_path={})
+    yield _mock_server
+    # Requisições abandonadas pelo cliente (timeout) não podem contar no próximo teste
+    deadline = time.monotonic() + 5
+    while mock_llm_server.stats["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    mock_llm_server.settings.clear()
+    mock_llm_server.settings.update(defaults)
@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from app import config
+from app.services import admission
+from app.services.admission import AdmissionController, Rejected, TokenBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refill():
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=2.0, burst=3, max_clients=10, clock=clock)
+    assert [buckets.take("a") for _ in range(3)] == [0.0, 0.0, 0.0]  # rajada inicial
+    assert buckets.take("a") == pytest.approx(0.5)  # sem token: próximo em 1/rate
+    clock.now += 0.25
+    assert buckets.take("a") == pytest.approx(0.25)
+    clock.now += 0.25
+    assert buckets.take("a") == 0.0
+    assert buckets.take("b") == 0.0  # cada cliente tem o seu balde
+
+    clock.now += 60  # parado por muito tempo: enche só até o burst
+    assert [buckets.take("a") for _ in range(4)][-1] == pytest.approx(0.5)
+
+
+def test_token_bucket_forgets_least_recent_clients():
+    buckets = TokenBuckets(rate=1.0, burst=1, max_clients=2, clock=FakeClock())
+    for client in ("a", "b", "c"):
+        assert buckets.take(client) == 0.0
+    assert buckets.take("a") == 0.0  # "a" foi descartado e voltou com o balde cheio
+    assert buckets.take("c") == pytest.approx(1.0)
+
+
+def test_priority_order_and_fifo_within_priority():
+    async def scenario():
+        controller = AdmissionController("/query", max_in_flight=1, max_queue=10, max_wait=5.0)
+        await controller.acquire(1)  # ocupa o único slot
+        served = []
+
+        async def request(name, priority):
+            await controller.acquire(priority)
+            served.append(name)
+
+        tasks = [asyncio.create_task(request(name, priority))
+                 for name, priority in [("low", 2), ("normal-1", 1), ("high", 0), ("normal-2", 1)]]
+        await asyncio.sleep(0)
+        assert controller.waiting == 4
+        for _ in tasks:
+            controller.release(0.01)
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return served, controller
+
+    served, controller = asyncio.run(scenario())
+    assert served == ["high", "normal-1", "normal-2", "low"]
+    assert controller.in_flight == 1 and controller.waiting == 0
+
+
+def test_rejects_when_queue_full_or_over_slo():
+    async def scenario():
+        controller = AdmissionController("/query", max_in_flight=1, max_queue=1, max_wait=5.0)
+        await controller.acquire(1)
+        queued = asyncio.create_task(controller.acquire(1))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await controller.acquire(1)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+        controller.service_time = 10.0  # cada slot leva 10 s: a espera passaria do max_wait
+        with pytest.raises(Rejected) as slo:
+            await controller.acquire(1)
+        return full.value, slo.value
+
+    full, slo = asyncio.run(scenario())
+    assert full.reason == "queue_full"
+    assert slo.reason == "slo" and slo.retry_after == pytest.approx(10.0)
+
+
+async def call(app, path="/query", headers=()):
+    messages = []
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers), "client": ("10.0.0.1", 1)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+    await app(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_middleware_sheds_with_429_and_retry_after(monkeypatch):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        monkeypatch.setattr(admission, "controllers", {"/query": AdmissionController("/query", 1, 1, 5.0)})
+        monkeypatch.setattr(config, "ADMISSION_ENABLED", True)
+        middleware = admission.AdmissionMiddleware(app)
+        running = asyncio.create_task(call(middleware))
+        queued = asyncio.create_task(call(middleware))
+        await asyncio.sleep(0)
+        shed = await call(middleware)  # slot ocupado e fila cheia: recusada na hora
+        release.set()
+        return shed, await running, await queued
+
+    (status, headers), running, queued = asyncio.run(scenario())
+    assert status == 429 and int(headers[b"retry-after"]) >= 1
+    assert running[0] == queued[0] == 200
+
+
+def test_middleware_rate_limit(monkeypatch):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    clock = FakeClock()
+    monkeypatch.setattr(admission, "controllers", {"/query": AdmissionController("/query", 4, 4, 5.0)})
+    monkeypatch.setattr(admission, "buckets", TokenBuckets(rate=0.5, burst=1, max_clients=10, clock=clock))
+    monkeypatch.setattr(config, "ADMISSION_ENABLED", True)
+    middleware = admission.AdmissionMiddleware(app)
+    key = [(b"x-api-key", b"team-a")]
+
+    assert asyncio.run(call(middleware, headers=key))[0] == 200
+    status, headers = asyncio.run(call(middleware, headers=key))
+    assert status == 429 and headers[b"retry-after"] == b"2"
+    assert asyncio.run(call(middleware, headers=[(b"x-api-key", b"team-b")]))[0] == 200
+    clock.now += 2
+    assert asyncio.run(call(middleware, headers=key))[0] == 200
@@ -0,0 +1,47 @@
+import numpy as np
+from app.services.ann_index import IVFIndex
+from app.services.vector_index import FlatIndex
+
+
+def clustered(n, dim=32, centers=50, seed=0):
+    # Dados com estrutura de clusters, como embeddings de texto (ruído uniforme não tem);
+    # os centros são sempre os mesmos, o seed só muda os pontos
+    means = np.random.default_rng(dim).normal(size=(centers, dim))
+    rng = np.random.default_rng(seed)
+    return (means[rng.integers(centers, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_empty_corpus():
+    index = IVFIndex(np.empty((0, 16), dtype=np.float32))
+    assert len(index) == 0 and index.dim == 16
+    indices, scores = index.search(np.ones(16), 5)
+    assert indices.size == scores.size == 0
+
+
+def test_fewer_points_than_nlist():
+    embeddings = clustered(5, dim=8)
+    index = IVFIndex(embeddings, nlist=64, nprobe=64)
+    assert index.nlist == 5
+    indices, scores = index.search(embeddings[2], 10)
+    expected_indices, expected_scores = FlatIndex(embeddings).search(embeddings[2], 10)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_recall_against_flat_index():
+    embeddings = clustered(20_000)
+    queries = clustered(200, seed=1)
+    flat, ivf = FlatIndex(embeddings), IVFIndex(embeddings, nprobe=8)
+    k, hits = 10, 0
+    for query in queries:
+        expected, _ = flat.search(query, k)
+        found, _ = ivf.search(query, k)
+        hits += len(set(expected.tolist()) & set(found.tolist()))
+    assert hits / (k * len(queries)) >= 0.9
+
+
+def test_all_lists_probed_is_exact():
+    embeddings = clustered(2_000, seed=2)
+    flat, ivf = FlatIndex(embeddings), IVFIndex(embeddings, nlist=20)
+    for query in clustered(20, seed=3):
+        np.testing.assert_array_equal(ivf.search(query, 5, nprobe=20)[0], flat.search(query, 5)[0])
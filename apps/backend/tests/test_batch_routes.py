@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import json
+import warnings
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routes import query_routes
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Só o LLM é substituído: a demora depende da pergunta e "boom" falha
+    async def generate(question, cache_key):
+        if question == "boom":
+            raise RuntimeError("provider down")
+        await asyncio.sleep(float(question.split()[-1]))
+        return f"db.q.find({{n: {question.split()[-1]}}})"
+
+    monkeypatch.setattr(query_routes, "local_mongo_query", lambda question: None)
+    monkeypatch.setattr(query_routes, "generate_mongo_query", generate)
+    app = FastAPI()
+    app.include_router(query_routes.router)
+    return TestClient(app)
+
+
+def test_text_to_mongo_batch_streams_in_completion_order(client):
+    queries = ["slow 0.3", "boom", "fast 0.0", "mid 0.1"]
+    response = client.post("/text-to-mongo/batch", json={"queries": queries})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert sorted(line["index"] for line in lines) == [0, 1, 2, 3]
+    assert lines[-1]["index"] == 0  # o mais lento chega por último
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[1] == {"index": 1, "error": "provider down"}  # erro fica só na linha dele
+    assert by_index[2] == {"index": 2, "query": "fast 0.0", "response": "db.q.find({n: 0.0})", "cache": "MISS"}
+
+
+def test_batch_request_is_validated(client):
+    assert client.post("/text-to-mongo/batch", json={"queries": []}).status_code == 422
+
+
+def test_disconnect_leaves_no_unawaited_coroutines():
+    started = []
+
+    async def job(i):
+        started.append(i)
+        await asyncio.sleep(0.01 * i)
+        return {"n": i}
+
+    async def consume_one_and_disconnect():
+        response = query_routes.ndjson_response([lambda i=i: job(i) for i in range(50)], concurrency=2)
+        lines = response.body_iterator
+        first = json.loads(await lines.__anext__())
+        await lines.aclose()
+        return first
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        first = asyncio.run(consume_one_and_disconnect())
+        gc.collect()
+    assert first == {"index": 0, "n": 0}
+    assert len(started) < 50  # os que esperavam vaga nem criaram a corrotina
+    assert not [w for w in caught if "never awaited" in str(w.message)]
@@ -0,0 +1,55 @@
+import math
+import numpy as np
+import pytest
+from app.services.bm25 import BM25Index, HybridIndex, reciprocal_rank_fusion
+from app.services.vector_index import FlatIndex
+
+DOCS = ["The cat sat", "the dog", "cat cat dog runs"]  # tamanhos 3, 2, 4 (média 3)
+
+
+def test_bm25_scores_by_hand():
+    # k1 = 1.5, b = 0.75; "cat" e "dog" aparecem em 2 dos 3 docs:
+    # idf = ln(1 + (3 - 2 + 0.5) / (2 + 0.5)) = ln(1.6)
+    # tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / 3))
+    index = BM25Index.from_texts(DOCS)
+    idf = math.log(1.6)
+    cat = {0: 1 * 2.5 / (1 + 1.5 * (0.25 + 0.75 * 3 / 3)),
+           2: 2 * 2.5 / (2 + 1.5 * (0.25 + 0.75 * 4 / 3))}
+    dog = {1: 1 * 2.5 / (1 + 1.5 * (0.25 + 0.75 * 2 / 3)),
+           2: 1 * 2.5 / (1 + 1.5 * (0.25 + 0.75 * 4 / 3))}
+
+    ids, scores = index.search("cat", 10)
+    assert ids.tolist() == [2, 0]
+    np.testing.assert_allclose(scores, [idf * cat[2], idf * cat[0]], rtol=1e-6)
+
+    ids, scores = index.search("Dog CAT?", 10)
+    assert ids.tolist() == [2, 1, 0]
+    np.testing.assert_allclose(scores, [idf * (cat[2] + dog[2]), idf * dog[1], idf * cat[0]], rtol=1e-6)
+
+    assert index.search("unicorn", 10)[0].size == 0
+
+
+def test_rrf_when_rankings_disagree():
+    # 0: 1/61   1: 1/62   2: 1/63 + 1/62   3: 1/64 + 1/61   5: 1/63
+    docs, scores = reciprocal_rank_fusion([np.array([0, 1, 2, 3]), np.array([3, 2, 5])], k=60)
+    assert docs.tolist() == [3, 2, 0, 1, 5]
+    np.testing.assert_allclose(scores, [1 / 64 + 1 / 61, 1 / 63 + 1 / 62, 1 / 61, 1 / 62, 1 / 63], rtol=1e-6)
+
+
+@pytest.fixture
+def hybrid():
+    # Denso prefere os docs na ordem 0 > 1 > 2 > 3; só o doc 3 tem o termo exato da query
+    texts = ["general rules overview", "combat basics", "turn structure", "rule 702.19b trample"]
+    embeddings = np.array([[1.0, 0.0], [0.9, 0.2], [0.7, 0.7], [0.1, 1.0]], dtype=np.float32)
+    return HybridIndex(FlatIndex(embeddings), BM25Index.from_texts(texts), candidates=4, rrf_k=60)
+
+
+def test_hybrid_promotes_lexical_match(hybrid):
+    query = np.array([1.0, 0.0])
+    assert hybrid.search(query, 4)[0].tolist() == [0, 1, 2, 3]  # sem texto: só o denso
+    ids, scores = hybrid.search(query, 2, query_text="702.19b")
+    assert ids.tolist() == [3, 0]  # 1/64 + 1/61 > 1/61
+    np.testing.assert_allclose(scores, [1 / 64 + 1 / 61, 1 / 61], rtol=1e-6)
+
+    batch = hybrid.search_batch(np.stack([query, query]), 2, query_texts=["702.19b", None])
+    assert [ids.tolist() for ids, _ in batch] == [[3, 0], [0, 1]]
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import numpy as np
+import pytest
+from app import config
+from app.services import corpus_registry
+from app.services.corpus_registry import CorpusRegistry
+from app.utils import text_processing
+
+DIM = 16
+
+
+def embed(texts):
+    # Vetor aleatório fixo por texto: a busca pelo embedding de um chunk acha ele mesmo
+    vectors = [np.random.default_rng(int(hashlib.sha1(t.encode()).hexdigest()[:8], 16)).standard_normal(DIM)
+               for t in texts]
+    vectors = np.array(vectors, dtype=np.float32).reshape(-1, DIM)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class FakeModel:
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+
+def iter_txt_pages(path):
+    # Páginas separadas por form feed, numeradas a partir de 1
+    with open(path, encoding="utf-8") as f:
+        return list(enumerate(f.read().split("\f"), start=1))
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_registry, "SUPPORTED_EXTENSIONS", {".txt": iter_txt_pages})
+    monkeypatch.setattr(corpus_registry, "get_model", FakeModel)
+    monkeypatch.setattr(corpus_registry, "encode_chunks", embed)
+    monkeypatch.setattr(text_processing, "ensure_punkt", lambda: None)
+    monkeypatch.setattr(text_processing, "sent_tokenize", lambda text: [text])  # uma página = um chunk
+    monkeypatch.setattr(config, "EMBEDDING_BACKEND", "torch")
+    monkeypatch.setattr(config, "RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(config, "INDEX_TYPE", "flat")
+    monkeypatch.setattr(config, "INDEX_QUANTIZATION", "none")
+    monkeypatch.setattr(config, "REGISTRY_COMPACT_MIN_DEAD", 0)
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    return source_dir
+
+
+def write(path, *pages):
+    path.write_text("\f".join(pages), encoding="utf-8")
+    # mtime explícito: reescritas no mesmo tick do relógio também contam como mudança
+    stamp = os.stat(path).st_mtime + write.bump
+    write.bump += 10
+    os.utime(path, (stamp, stamp))
+
+
+write.bump = 10
+
+
+def search(registry, text):
+    documents, index = registry.snapshot()
+    ids, _ = index.search(embed([text])[0], k=max(1, len(documents)), query_text=text)
+    return [documents[int(i)]["text"] for i in ids]
+
+
+def check(registry, live, dead):
+    documents, _ = registry.snapshot()
+    assert sorted(doc["text"] for doc in documents) == sorted(live)
+    for text in live:
+        assert search(registry, text)[0] == text
+    for text in live + dead:
+        # Nem o vetor nem as palavras de um chunk morto trazem ele de volta
+        assert set(search(registry, text)) <= set(live)
+
+
+def test_add_modify_delete_then_compact(source, tmp_path):
+    registry = CorpusRegistry("docs", str(source), str(tmp_path / "index"))
+    write(source / "a.txt", "alpha apples page one.", "alpha avocados page two.")
+    write(source / "b.txt", "bravo bananas.", "bravo blueberries.")
+    assert registry.sync()
+    check(registry, ["alpha apples page one.", "alpha avocados page two.", "bravo bananas.", "bravo blueberries."], [])
+
+    # Uma página alterada, um arquivo removido e um novo: tombstones, sem compactar ainda
+    write(source / "a.txt", "alpha apples page one.", "alpha apricots page two.")
+    os.remove(source / "b.txt")
+    write(source / "c.txt", "charlie cherries.")
+    assert registry.sync()
+    assert registry.status()["rows"] == 6 and registry.status()["live_rows"] == 3
+    assert registry.manifest["segment"] == 0
+    live = ["alpha apples page one.", "alpha apricots page two.", "charlie cherries."]
+    dead = ["alpha avocados page two.", "bravo bananas.", "bravo blueberries."]
+    check(registry, live, dead)
+
+    # Mais linhas mortas que vivas: compacta num segmento novo e apaga o antigo
+    write(source / "a.txt", "alpha almonds page one.", "alpha apricots page two.")
+    assert registry.sync()
+    dead.append(live.pop(0))
+    live.append("alpha almonds page one.")
+    assert registry.manifest["segment"] == 1
+    assert registry.status()["rows"] == registry.status()["live_rows"] == 3
+    assert sorted(os.listdir(tmp_path / "index")) == ["manifest.json", "rows-1.bin", "texts-1.bin", "vectors-1.f32"]
+    check(registry, live, dead)
+
+    # Reaberto do disco: mesmo conteúdo, e nada muda sem alterar arquivos
+    reopened = CorpusRegistry("docs", str(source), str(tmp_path / "index"))
+    assert not reopened.sync()
+    check(reopened, live, dead)
@@ -0,0 +1,60 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import config
+from app.routes import query_routes
+from app.services import query_service
+from app.services.exact_cache import ExactCache, make_key
+from app.services.mongo_translator import mongo_translator
+
+
+def test_key_normalizes_whitespace_only():
+    key = make_key("/text-to-mongo", "cartas  de\nfogo", "openai:gpt", 0.0)
+    assert key == make_key("/text-to-mongo", " cartas de fogo ", "openai:gpt", 0.0)
+    assert key != make_key("/text-to-mongo", "Cartas de fogo", "openai:gpt", 0.0)  # caixa importa
+    assert key != make_key("/text-to-mongo", "cartas de fogo", "openai:gpt", 0.2)
+
+
+def test_key_changes_with_any_route_model(monkeypatch):
+    monkeypatch.setitem(config.LLM_ROUTES, "/text-to-mongo", [("openai", "gpt-3.5-turbo"), ("groq", "llama")])
+    before = make_key("/text-to-mongo", "q", query_routes.route_models("/text-to-mongo"), 0.0)
+    # Troca só o modelo de failover: a resposta antiga pode ter vindo dele
+    monkeypatch.setitem(config.LLM_ROUTES, "/text-to-mongo", [("openai", "gpt-3.5-turbo"), ("groq", "mixtral")])
+    assert make_key("/text-to-mongo", "q", query_routes.route_models("/text-to-mongo"), 0.0) != before
+    # Mesmos modelos em outra ordem também é outro roteamento
+    monkeypatch.setitem(config.LLM_ROUTES, "/text-to-mongo", [("groq", "llama"), ("openai", "gpt-3.5-turbo")])
+    assert make_key("/text-to-mongo", "q", query_routes.route_models("/text-to-mongo"), 0.0) != before
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def call_llm(route, messages, temperature):
+        calls.append(route)
+        model = config.LLM_ROUTES[route][0][1]
+        return {"choices": [{"message": {"content": f"db.{model}.find()"}}]}
+
+    monkeypatch.setattr(query_service, "call_llm", call_llm)
+    monkeypatch.setattr(mongo_translator, "accept_llm", lambda question, query: (True, None))
+    monkeypatch.setattr(query_routes, "local_mongo_query", lambda question: None)
+    monkeypatch.setattr(query_routes, "response_cache", ExactCache(100, ttl=3600))
+    monkeypatch.setitem(config.LLM_ROUTES, "/text-to-mongo", [("openai", "gpt-3.5-turbo"), ("groq", "llama")])
+    app = FastAPI()
+    app.include_router(query_routes.router)
+    return TestClient(app), calls
+
+
+def test_route_change_misses_the_response_cache(client, monkeypatch):
+    client, calls = client
+    ask = lambda: client.post("/text-to-mongo", json={"query": "todas as cartas"})
+
+    first, second = ask(), ask()
+    assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json() == {"response": "db.gpt-3.5-turbo.find()"}
+
+    monkeypatch.setitem(config.LLM_ROUTES, "/text-to-mongo", [("openai", "gpt-4o-mini"), ("groq", "llama")])
+    third = ask()
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json() == {"response": "db.gpt-4o-mini.find()"}
+    assert len(calls) == 2
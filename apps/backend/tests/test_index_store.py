@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from app.utils import index_store
+
+MODEL = "paraphrase-multilingual-mpnet-base-v2"
+
+
+def header(**kwargs):
+    return index_store.build_header(MODEL, 768, 350, 10, "doc.pdf", "pdf", **kwargs)
+
+
+def test_same_settings_are_fresh():
+    assert not index_store.is_stale(header(), MODEL, 350)
+    assert not index_store.is_stale(header(backend="onnx", quantization="avx2"), MODEL, 350, "onnx", "avx2")
+
+
+@pytest.mark.parametrize("backend, quantization", [("onnx", "none"), ("onnx", "avx512_vnni"), ("torch", "avx2")])
+def test_embedder_change_is_stale(backend, quantization):
+    # Ex.: queries do ONNX int8 contra um índice gerado com torch em float
+    assert index_store.is_stale(header(), MODEL, 350, backend, quantization)
+    assert index_store.is_stale(header(backend=backend, quantization=quantization), MODEL, 350)
+
+
+def test_model_or_chunk_size_change_is_stale():
+    assert index_store.is_stale(None, MODEL, 350)
+    assert index_store.is_stale(header(), "all-MiniLM-L6-v2", 350)
+    assert index_store.is_stale(header(), MODEL, 500)
+
+
+def test_header_without_backend_was_built_with_torch():
+    legacy = {key: value for key, value in header().items() if not key.startswith("embedding_")}
+    assert not index_store.is_stale(legacy, MODEL, 350)
+    assert index_store.is_stale(legacy, MODEL, 350, "onnx", "none")
+
+
+def test_header_round_trip(tmp_path):
+    index_dir = str(tmp_path / "index")
+    embeddings = np.eye(3, dtype=np.float32)
+    written = index_store.build_header(MODEL, 3, 350, 3, "doc.pdf", "pdf", backend="onnx", quantization="arm64")
+    index_store.write_index(index_dir, ["a", "b", "c"], embeddings, written, pages=[1, 1, 2])
+    read = index_store.read_header(index_dir)
+    assert not index_store.is_stale(read, MODEL, 350, "onnx", "arm64")
+    documents, stored = index_store.open_index(index_dir, read)
+    assert [doc["text"] for doc in documents] == ["a", "b", "c"]
+    np.testing.assert_array_equal(stored, embeddings)
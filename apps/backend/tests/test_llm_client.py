@@ -0,0 +1,79 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app import config
+from app.services import llm_client
+from benchmarks import mock_llm_server
+
+PAYLOAD = {"model": "mock", "messages": [{"role": "user", "content": "ping"}]}
+
+
+@pytest.fixture
+def provider(mock_llm, monkeypatch):
+    # Provedor "mock" apontando para o servidor local; cliente e semáforos novos por
+    # teste (ficam presos ao event loop de cada asyncio.run)
+    monkeypatch.setitem(llm_client.PROVIDERS, "mock", {
+        "url": f"{mock_llm}/v1/chat/completions", "headers": {}, "max_concurrency": 2,
+    })
+    monkeypatch.setattr(llm_client, "_client", None)
+    monkeypatch.setattr(llm_client, "_semaphores", {})
+    monkeypatch.setattr(config, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(config, "LLM_BACKOFF_BASE", 0.001)
+    return "mock"
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await llm_client.aclose()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_and_honours_retry_after(provider, status):
+    mock_llm_server.settings.update(error_rate=1.0, error_statuses=(status,), retry_after="0.2")
+    start = time.perf_counter()
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        run(llm_client.chat_completion(provider, PAYLOAD))
+    assert error.value.response.status_code == status
+    assert mock_llm_server.stats["requests"] == config.LLM_MAX_RETRIES + 1
+    # Backoff sozinho seria ~1 ms: a espera vem do Retry-After, uma vez por retry
+    assert time.perf_counter() - start >= 0.2 * config.LLM_MAX_RETRIES
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_other_client_errors_are_not_retried(provider, status):
+    mock_llm_server.settings.update(error_rate=1.0, error_statuses=(status,))
+    with pytest.raises(httpx.HTTPStatusError):
+        run(llm_client.chat_completion(provider, PAYLOAD))
+    assert mock_llm_server.stats["requests"] == 1
+
+
+def test_recovers_after_transient_errors(provider, monkeypatch):
+    mock_llm_server.settings.update(error_rate=0.5, error_statuses=(429, 503))
+    monkeypatch.setattr(config, "LLM_MAX_RETRIES", 20)
+    data = run(llm_client.chat_completion(provider, PAYLOAD))
+    assert data["choices"][0]["message"]["content"] == "Mock answer for: ping"
+
+
+def test_semaphore_limits_concurrency_per_provider(provider):
+    mock_llm_server.settings.update(latency_ms=50.0)
+
+    async def burst():
+        return await asyncio.gather(*(llm_client.chat_completion(provider, PAYLOAD) for _ in range(8)))
+    assert len(run(burst())) == 8
+    assert mock_llm_server.stats["requests"] == 8
+    assert mock_llm_server.stats["max_in_flight"] == 2
+
+
+def test_timeout_raises_instead_of_hanging(provider, monkeypatch):
+    mock_llm_server.settings.update(latency_ms=1000.0)
+    monkeypatch.setattr(config, "LLM_TIMEOUT", 0.2)
+    monkeypatch.setattr(config, "LLM_MAX_RETRIES", 1)
+    start = time.perf_counter()
+    with pytest.raises(httpx.TimeoutException):
+        run(llm_client.chat_completion(provider, PAYLOAD))
+    assert time.perf_counter() - start < 2.0
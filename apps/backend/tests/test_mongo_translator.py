@@ -0,0 +1,99 @@
+import pytest
+from app.services.mongo_translator import REFUSAL, MongoTranslator, TemplateStore, parse_rules, validate
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("orders where amount > 100 after 2024-01-01",
+     'db.orders.find({"amount": {"$gt": 100}, "date": {"$gt": {"$date": "2024-01-01T00:00:00Z"}}})'),
+    ("find users where age >= 18 and country is BR",
+     'db.users.find({"age": {"$gte": 18}, "country": "BR"})'),
+    ("orders where status in (shipped, delivered) sorted by amount desc limit 5",
+     'db.orders.find({"status": {"$in": ["shipped", "delivered"]}}).sort({"amount": -1}).limit(5)'),
+    ("orders where created between 2024-01-01 and 2024-01-31",
+     'db.orders.find({"created": {"$gte": {"$date": "2024-01-01T00:00:00Z"}, '
+     '"$lte": {"$date": "2024-01-31T00:00:00Z"}}})'),
+    ("count orders before 2023-12-31",
+     'db.orders.countDocuments({"date": {"$lt": {"$date": "2023-12-31T00:00:00Z"}}})'),
+    ('customers where name contains "Smith"',
+     'db.customers.find({"name": {"$regex": "Smith", "$options": "i"}})'),
+])
+def test_rules(question, expected):
+    assert parse_rules(question) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "orders where amount > 100 or status is open",  # "or" fica com o LLM
+    "orders where amount > 100 after yesterday",
+    "what were our best months last year",
+])
+def test_rules_leave_unknown_questions_to_llm(question):
+    assert parse_rules(question) is None
+
+
+def test_template_reuses_literals():
+    store = TemplateStore(10)
+    assert store.learn("users older than 30 sorted by name",
+                       'db.users.find({age: {$gt: 30}}).sort({name: 1})')
+    assert store.apply("Users older than 45 sorted by name") == 'db.users.find({age: {$gt: 45}}).sort({name: 1})'
+    assert store.apply("users younger than 45") is None
+
+
+def test_template_keeps_literal_case():
+    store = TemplateStore(10)
+    assert store.learn('customers named "Ann Lee"', 'db.customers.find({"name": "Ann Lee"})')
+    assert store.apply('customers named "Mary Smith"') == 'db.customers.find({"name": "Mary Smith"})'
+
+
+@pytest.mark.parametrize("question, answer", [
+    # o limite superior vem do ano da pergunta, mas não é uma lacuna
+    ("orders from year 2023",
+     'db.orders.find({"date": {"$gte": {"$date": "2023-01-01T00:00:00Z"}, "$lt": {"$date": "2024-01-01T00:00:00Z"}}})'),
+    ("users created in the last 7 days",
+     'db.users.find({created: {$gte: new Date(Date.now() - 7*24*60*60*1000)}})'),
+    ("orders over 100", 'db.orders.find({"amount": {"$gt": 100}}).limit(20)'),
+])
+def test_template_rejects_literals_not_from_question(question, answer):
+    assert not TemplateStore(10).learn(question, answer)
+
+
+def test_template_date_slot_with_time_suffix():
+    store = TemplateStore(10)
+    assert store.learn("orders after 2023-05-01", 'db.orders.find({date: {$gt: ISODate("2023-05-01T00:00:00Z")}})')
+    assert store.apply("orders after 2020-02-02") == 'db.orders.find({date: {$gt: ISODate("2020-02-02T00:00:00Z")}})'
+
+
+@pytest.mark.parametrize("output", [
+    '{"amount": {"$gt": 100}}',
+    'db.orders.find({amount: {$gt: 100}}).sort({amount: -1}).limit(10);',
+    'db.orders.find({createdAt: {$gte: new Date(Date.now() - 30*24*60*60*1000)}})',
+    'db.orders.find({createdAt: {$gte: new Date(new Date().setDate(new Date().getDate() - 7))}}).count()',
+    '{"createdAt": {"$gte": ISODate("2024-01-01T00:00:00Z")}}',
+    'db.orders.aggregate([{$match: {status: "A"}}, {$group: {_id: "$cust_id", total: {$sum: "$amount"}}}])',
+    f'"{REFUSAL}"',
+])
+def test_validate_accepts(output):
+    assert validate(output)[0], validate(output)
+
+
+@pytest.mark.parametrize("output", [
+    'db.orders.find({$where: "this.a > this.b"})',
+    '{"$expr": {"$function": {"body": "function() { return true }", "args": [], "lang": "js"}}}',
+    'db.orders.aggregate([{$group: {_id: null, x: {$accumulator: {}}}}])',
+    'db.orders.find({date: {$gte: new Date(process.exit())}})',
+    'db.orders.deleteMany({})',
+    'db.orders.find({}).forEach(printjson)',
+    'db.orders.find({}); db.orders.drop()',
+    'db.orders.find({amount: {$bogus: 1}})',
+    'Here is your query: db.orders.find({})',
+])
+def test_validate_rejects(output):
+    assert not validate(output)[0]
+
+
+def test_translator_learns_only_valid_answers():
+    translator = MongoTranslator(10)
+    assert translator.accept_llm("products cheaper than 20", 'db.products.find({price: {$lt: 20}})') == (True, "shell")
+    assert translator.translate_local("products cheaper than 35") == ('db.products.find({price: {$lt: 35}})', "template")
+    assert not translator.accept_llm("products pricier than 20", 'db.products.find({$where: "this.price > 20"})')[0]
+    assert translator.translate_local("products pricier than 35") is None
+    assert translator.stats()["invalid"] == 1
@@ -0,0 +1,86 @@
+import asyncio
+import time
+import pytest
+from app import config
+from app.services import llm_client
+from app.services.provider_router import ProviderRouter
+from benchmarks import mock_llm_server
+
+# Dois "provedores" no mesmo servidor local, um por caminho
+PRIMARY, SECONDARY = "/v1/chat/completions", "/openai/v1/chat/completions"
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+@pytest.fixture
+def router(mock_llm, monkeypatch):
+    for name, path in (("primary", PRIMARY), ("secondary", SECONDARY)):
+        monkeypatch.setitem(llm_client.PROVIDERS, name, {"url": mock_llm + path, "headers": {}, "max_concurrency": 8})
+    monkeypatch.setattr(llm_client, "_client", None)
+    monkeypatch.setattr(llm_client, "_semaphores", {})
+    monkeypatch.setattr(config, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(config, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(config, "HEDGE_DEFAULT_DELAY", 0.1)
+    monkeypatch.setattr(config, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(config, "CIRCUIT_OPEN_SECONDS", 0.3)
+    return ProviderRouter({"/route": [("primary", "model-a"), ("secondary", "model-b")]})
+
+
+def complete(router, times=1):
+    async def main():
+        try:
+            return [await router.complete("/route", MESSAGES, 0.0) for _ in range(times)]
+        finally:
+            await llm_client.aclose()
+    return asyncio.run(main())
+
+
+def requests(path):
+    return mock_llm_server.stats["by_path"].get(path, 0)
+
+
+def test_fast_primary_needs_no_hedge(router):
+    assert complete(router)[0]["model"] == "model-a"
+    assert requests(SECONDARY) == 0
+
+
+def test_hedge_fires_when_primary_is_slow(router):
+    mock_llm_server.settings["overrides"] = {PRIMARY: {"latency_ms": 2000.0}}
+    start = time.perf_counter()
+    completion = complete(router)[0]
+    assert completion["model"] == "model-b"  # o hedge no secundário respondeu antes
+    assert time.perf_counter() - start < 1.0  # sem esperar o principal
+    assert requests(PRIMARY) == requests(SECONDARY) == 1
+
+
+def test_failover_on_error(router):
+    mock_llm_server.settings["overrides"] = {PRIMARY: {"error_rate": 1.0, "error_statuses": (500,)}}
+    assert complete(router)[0]["model"] == "model-b"
+    assert router.breakers["primary"].failures == 1
+    assert router.breakers["primary"].state == "closed"
+
+
+def test_circuit_opens_after_failures_and_resets_after_cooldown(router):
+    mock_llm_server.settings["overrides"] = {PRIMARY: {"error_rate": 1.0, "error_statuses": (500,)}}
+    assert [c["model"] for c in complete(router, 3)] == ["model-b"] * 3
+    assert router.breakers["primary"].state == "open"
+    assert requests(PRIMARY) == 3
+
+    # Aberto: o principal nem é chamado
+    assert complete(router, 2)[-1]["model"] == "model-b"
+    assert requests(PRIMARY) == 3
+
+    # Depois do cool-down uma chamada de teste passa; com sucesso o circuito fecha
+    mock_llm_server.settings["overrides"] = {}
+    time.sleep(config.CIRCUIT_OPEN_SECONDS)
+    assert complete(router)[0]["model"] == "model-a"
+    assert requests(PRIMARY) == 4
+    assert router.breakers["primary"].state == "closed"
+
+
+def test_failed_trial_reopens_circuit(router):
+    mock_llm_server.settings["overrides"] = {PRIMARY: {"error_rate": 1.0, "error_statuses": (500,)}}
+    complete(router, 3)
+    time.sleep(config.CIRCUIT_OPEN_SECONDS)
+    assert complete(router)[0]["model"] == "model-b"  # chamada de teste falhou: failover
+    assert requests(PRIMARY) == 4
+    assert router.breakers["primary"].state == "open"
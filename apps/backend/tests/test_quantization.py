@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from app.services.quantization import QuantizedIndex
+from app.services.vector_index import FlatIndex, normalize_rows
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    means = rng.normal(size=(40, 64))
+    embeddings = means[rng.integers(40, size=5000)] + 0.5 * rng.normal(size=(5000, 64))
+    queries = embeddings[rng.choice(5000, 100, replace=False)] + 0.1 * rng.normal(size=(100, 64))
+    return normalize_rows(embeddings), queries
+
+
+def recall(index, flat, queries, k=10):
+    hits = sum(len(set(index.search(q, k)[0].tolist()) & set(flat.search(q, k)[0].tolist())) for q in queries)
+    return hits / (k * len(queries))
+
+
+@pytest.mark.parametrize("mode, minimum", [("float16", 0.99), ("int8", 0.99), ("binary", 0.9)])
+def test_rescoring_recall_against_float32(corpus, tmp_path, mode, minimum):
+    embeddings, queries = corpus
+    flat = FlatIndex(embeddings, normalized=True)
+    index = QuantizedIndex(embeddings, mode, rescore=10, normalized=True, spill_dir=str(tmp_path))
+    assert recall(index, flat, queries) >= minimum
+    # Com rescoring, os scores devolvidos são os exatos em float32
+    ids, scores = index.search(queries[0], 5)
+    np.testing.assert_allclose(scores, embeddings[ids] @ normalize_rows(queries[0]), rtol=1e-5)
+
+
+def test_full_precision_copy_leaves_ram(corpus, tmp_path):
+    embeddings, queries = corpus
+    index = QuantizedIndex(embeddings * 3, "int8", normalized=False, spill_dir=str(tmp_path))
+    assert isinstance(index.full, np.memmap)
+    np.testing.assert_allclose(index.reconstruct([0, 7]), embeddings[[0, 7]], rtol=1e-5)
+
+
+def test_memmap_input_is_used_without_copy(corpus, tmp_path):
+    embeddings, _ = corpus
+    path = tmp_path / "embeddings.f32"
+    stored = np.memmap(path, dtype=np.float32, mode="w+", shape=embeddings.shape)
+    stored[:] = embeddings
+    index = QuantizedIndex(stored, "float16", normalized=True, spill_dir=str(tmp_path / "spill"))
+    assert index.full is stored
+    assert not (tmp_path / "spill").exists()
+
+
+def test_empty_corpus(tmp_path):
+    index = QuantizedIndex(np.empty((0, 8), dtype=np.float32), "int8", spill_dir=str(tmp_path))
+    assert len(index) == 0 and index.search(np.ones(8), 3)[0].size == 0
@@ -0,0 +1,41 @@
+import asyncio
+import numpy as np
+import pytest
+from app import config
+from app.services import query_service
+from app.services.bm25 import BM25Index, HybridIndex
+from app.services.sharded_index import ShardedIndex
+from app.services.vector_index import build_index
+
+TEXTS = [f"chunk {i} about {'dragons' if i % 7 == 0 else 'goblins'} and rule {i}" for i in range(200)]
+
+
+@pytest.fixture(scope="module")
+def hybrid_sharded():
+    # A pilha padrão das rotas: RETRIEVAL_MODE="hybrid" com INDEX_TYPE="sharded"
+    embeddings = np.random.default_rng(0).normal(size=(len(TEXTS), 16)).astype(np.float32)
+    saved = config.RETRIEVAL_MODE
+    config.RETRIEVAL_MODE = "hybrid"
+    try:
+        index = build_index(embeddings, index_type="sharded", lexical=BM25Index.from_texts(TEXTS))
+    finally:
+        config.RETRIEVAL_MODE = saved
+    yield index, embeddings
+    index.dense.close()
+
+
+def test_hybrid_sharded_uses_async_scatter_gather(hybrid_sharded, monkeypatch):
+    index, embeddings = hybrid_sharded
+    assert isinstance(index, HybridIndex) and isinstance(index.dense, ShardedIndex)
+    expected = index.search_batch(embeddings[:4], 5, query_texts=["dragons", "", "rule 3", None])
+
+    def blocking(*args, **kwargs):
+        raise AssertionError("a busca por shards não deveria ocupar uma thread esperando")
+    monkeypatch.setattr(query_service, "retrieve_batch", blocking)
+    monkeypatch.setattr(ShardedIndex, "search_batch", blocking)
+
+    results = asyncio.run(query_service.aretrieve_batch(["dragons", "", "rule 3", None], index, 5, embeddings[:4]))
+    assert len(results) == len(expected)
+    for (ids, scores), (expected_ids, expected_scores) in zip(results, expected):
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores)
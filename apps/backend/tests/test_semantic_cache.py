@@ -0,0 +1,50 @@
+import numpy as np
+from app.services.semantic_cache import SemanticCache
+
+DIM = 8
+PDF, PPT = ("pdf", "/query", 1), ("pptx", "/ppt-search", 1)
+
+
+def unit(i):
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[i % DIM] = 1.0
+    vector[(i // DIM) % DIM] += 0.5  # vizinhos distintos, mas nunca acima do threshold entre si
+    return vector / np.linalg.norm(vector)
+
+
+def test_namespaces_stay_isolated_while_matrix_grows():
+    cache = SemanticCache(threshold=0.99, max_entries=1000, ttl=3600)
+    for i in range(40):  # passa da capacidade inicial (16) duas vezes
+        cache.store(PDF, unit(i), f"pdf-{i}")
+        if i % 2 == 0:
+            cache.store(PPT, unit(i), f"ppt-{i}")
+
+    assert cache._blocks[PDF].matrix.shape[0] == 64
+    assert len(cache._blocks[PDF]) == 40 and len(cache._blocks[PPT]) == 20
+    for i in range(40):
+        assert cache.lookup(PDF, unit(i)) == f"pdf-{i}"
+        # Mesmo embedding, outro namespace: só acerta se foi guardado lá
+        assert cache.lookup(PPT, unit(i)) == (f"ppt-{i}" if i % 2 == 0 else None)
+    assert cache.lookup(("pdf", "/query", 2), unit(0)) is None  # índice recriado
+
+
+def test_eviction_keeps_rows_consistent():
+    cache = SemanticCache(threshold=0.99, max_entries=20, ttl=3600)
+    for i in range(30):
+        cache.store(PDF if i % 3 else PPT, unit(i), str(i))
+    # LRU: só as 20 últimas sobrevivem; a troca com a última linha não embaralha as respostas
+    for i in range(30):
+        assert cache.lookup(PDF if i % 3 else PPT, unit(i)) == (str(i) if i >= 10 else None)
+    for block in cache._blocks.values():
+        assert all(block.rows[key] == row for row, key in enumerate(block.keys))
+
+
+def test_invalidate_one_corpus():
+    cache = SemanticCache(threshold=0.99, max_entries=100, ttl=3600)
+    for i in range(20):
+        cache.store(PDF, unit(i), "pdf")
+        cache.store(PPT, unit(i), "ppt")
+    cache.invalidate("pdf")
+    assert PDF not in cache._blocks
+    assert cache.lookup(PDF, unit(3)) is None
+    assert cache.lookup(PPT, unit(3)) == "ppt"
@@ -0,0 +1,41 @@
+import re
+import pytest
+from app.utils import text_processing
+
+
+@pytest.fixture(autouse=True)
+def simple_tokenizer(monkeypatch):
+    # Divisor de frases determinístico: o teste é da lógica de páginas, não do punkt
+    monkeypatch.setattr(text_processing, "ensure_punkt", lambda: None)
+    monkeypatch.setattr(text_processing, "sent_tokenize",
+                        lambda text: [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s])
+
+
+def test_pdf_sentence_continues_on_next_page():
+    pages = [(1, "First sentence. The rule continues"), (2, "on the next page. Another one.")]
+    chunks = list(text_processing.iter_chunks(pages, 40))
+    assert chunks == [
+        {"text": "First sentence.", "page": 1},
+        {"text": "The rule continues on the next page.", "page": 1},
+        {"text": "Another one.", "page": 2},
+    ]
+
+
+def test_pdf_heading_is_not_glued_to_next_page():
+    pages = [(1, "Intro text. Chapter 2"), (2, "New section starts here.")]
+    chunks = list(text_processing.iter_chunks(pages, 20))
+    assert chunks == [
+        {"text": "Intro text.", "page": 1},
+        {"text": "Chapter 2", "page": 1},
+        {"text": "New section starts here.", "page": 2},
+    ]
+
+
+def test_pptx_slides_are_never_joined():
+    slides = [(1, "Quarterly results\nrevenue up"), (2, "growth in all regions"), (3, "Next steps")]
+    chunks = list(text_processing.iter_chunks(slides, 30, join_pages=False))
+    assert chunks == [
+        {"text": "Quarterly results revenue up", "page": 1},
+        {"text": "growth in all regions", "page": 2},
+        {"text": "Next steps", "page": 3},
+    ]
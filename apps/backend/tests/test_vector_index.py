@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from app.services.vector_index import FlatIndex, normalize_rows, top_k, top_k_rows
+
+
+def reference(scores, k):
+    # Força bruta: ordenação completa, empates na ordem dos índices
+    order = np.argsort(-scores, kind="stable")[:k]
+    return order, scores[order]
+
+
+@pytest.mark.parametrize("n, k", [(100, 1), (100, 10), (100, 99), (100, 100), (100, 500), (1, 3)])
+def test_top_k_matches_argsort(n, k):
+    scores = np.random.default_rng(n + k).normal(size=n).astype(np.float32)
+    indices, values = top_k(scores, k)
+    expected_indices, expected_values = reference(scores, k)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_array_equal(values, expected_values)
+
+
+@pytest.mark.parametrize("k", [3, 7, 12])
+def test_top_k_with_ties(k):
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.9, 0.5, 0.2, 0.9, 0.5, 0.5, 0.3, 0.1], dtype=np.float32)
+    indices, values = top_k(scores, k)
+    _, expected_values = reference(scores, k)
+    # Entre empatados qualquer escolha vale, mas os scores e a ordem decrescente não mudam
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(scores[indices], values)
+    assert len(set(indices.tolist())) == len(indices)
+
+
+def test_top_k_rows_matches_top_k():
+    scores = np.random.default_rng(1).normal(size=(5, 40)).astype(np.float32)
+    for k in (1, 39, 40, 60):
+        indices, values = top_k_rows(scores, k)
+        for row in range(scores.shape[0]):
+            expected_indices, expected_values = reference(scores[row], k)
+            np.testing.assert_array_equal(indices[row], expected_indices)
+            np.testing.assert_array_equal(values[row], expected_values)
+
+
+def test_flat_index_matches_brute_force():
+    rng = np.random.default_rng(2)
+    embeddings = rng.normal(size=(300, 16)).astype(np.float32)
+    queries = rng.normal(size=(20, 16)).astype(np.float32)
+    index = FlatIndex(embeddings)
+    matrix = normalize_rows(embeddings)
+    for query in queries:
+        for k in (1, 5, 299, 300, 1000):
+            indices, values = index.search(query, k)
+            expected_indices, expected_values = reference(matrix @ normalize_rows(query), k)
+            np.testing.assert_array_equal(indices, expected_indices)
+            np.testing.assert_allclose(values, expected_values, rtol=1e-5)
+
+
+def test_flat_index_search_batch_matches_search():
+    rng = np.random.default_rng(3)
+    index = FlatIndex(rng.normal(size=(200, 8)))
+    queries = rng.normal(size=(130, 8))  # mais de um bloco de 64
+    indices, values = index.search_batch(queries, 7)
+    assert indices.shape == values.shape == (130, 7)
+    for row, query in enumerate(queries):
+        expected_indices, expected_values = index.search(query, 7)
+        np.testing.assert_array_equal(indices[row], expected_indices)
+        np.testing.assert_allclose(values[row], expected_values, rtol=1e-5)
+
+
+def test_flat_index_empty_corpus():
+    index = FlatIndex(np.empty((0, 8), dtype=np.float32))
+    assert len(index) == 0
+    indices, values = index.search(np.ones(8), 5)
+    assert indices.size == values.size == 0
+    indices, values = index.search_batch(np.ones((3, 8)), 5)
+    assert indices.shape == values.shape == (3, 0)
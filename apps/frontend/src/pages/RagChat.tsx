@@ -1,7 +1,7 @@
 import { useState } from "react";
-import axios from "axios";
 import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
+import { streamQuery } from "../services/streamQuery";
 
 interface ChatMessage {
   role: "user" | "assistant";
@@ -22,20 +22,19 @@ export default function RagChat() {
     setMessages((prev) => [...prev, newUserMessage]);
     setQuestion("");
 
-    try {
-      const res = await axios.post("http://127.0.0.1:8000/query", {
-        query: question,
+    // Mensagem do assistente vazia, preenchida conforme os tokens chegam
+    setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+    const appendToAnswer = (delta: string) =>
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: last.content + delta }];
       });
-      const newAssistantMessage: ChatMessage = {
-        role: "assistant",
-        content: res.data.response,
-      };
 
-      // Adiciona a resposta ao histórico
-      setMessages((prev) => [...prev, newAssistantMessage]);
+    try {
+      await streamQuery("http://127.0.0.1:8000/query", question, appendToAnswer);
     } catch (error) {
       setMessages((prev) => [
-        ...prev,
+        ...prev.slice(0, -1),
         {
           role: "assistant",
           content: "Erro ao obter resposta.",
@@ -0,0 +1,45 @@
+// Consome a resposta em Server-Sent Events do backend ({ query, stream: true }).
+// Chama onDelta a cada pedaço de texto recebido e resolve quando chega o evento "done".
+export async function streamQuery(
+  url: string,
+  query: string,
+  onDelta: (delta: string) => void
+): Promise<void> {
+  const res = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ query, stream: true }),
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`HTTP ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Cada evento SSE termina com uma linha em branco
+    let separator = buffer.indexOf("\n\n");
+    while (separator !== -1) {
+      const rawEvent = buffer.slice(0, separator);
+      buffer = buffer.slice(separator + 2);
+      separator = buffer.indexOf("\n\n");
+
+      let event = "message";
+      let data = "";
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+
+      if (event === "done") return;
+      if (event === "error") throw new Error(JSON.parse(data).detail);
+      onDelta(JSON.parse(data).delta);
+    }
+  }
+}